@@ -0,0 +1,18 @@
+"""
+Benchmarks for ldaptor.
+
+These are not installed with ldaptor. Run them from the top of a source
+checkout::
+
+    python -m benchmarks                 # all of them
+    python -m benchmarks search codec    # those whose name contains a word
+    python -m benchmarks -o results.json # also record the results as JSON
+    python -m benchmarks.codec           # a single module
+
+or, with pytest-benchmark installed::
+
+    python -m pytest benchmarks
+
+The JSON file follows the layout of the one written by pytest-benchmark,
+so results can be compared across releases with the same tools.
+"""
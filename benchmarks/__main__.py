@@ -0,0 +1,3 @@
+from benchmarks._runner import main
+
+main()
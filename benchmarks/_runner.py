@@ -0,0 +1,181 @@
+"""
+Time benchmarks and report the results.
+
+A benchmark is a function whose name starts with ``bench_`` and which
+takes a single argument, a timer called with the function to measure
+and its arguments. That is the signature of the ``benchmark`` fixture
+of pytest-benchmark, so the same functions run under pytest with that
+plugin installed, or under the plain Timer below when it is not.
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import sys
+import time
+
+import twisted
+
+import ldaptor
+
+MODULES = ["header", "codec", "filters", "dn", "search", "roundtrip"]
+
+
+class Timer:
+    """
+    Call a function repeatedly and keep the time of each round.
+
+    The first call is a warm-up and is not recorded. Then the function is
+    called until minTime has passed, at least minRounds and at most
+    maxRounds times.
+
+    Like the fixture of pytest-benchmark, extra_info holds values the
+    benchmark wants reported alongside the timings. An ``items`` value
+    is the number of items processed by each call, and is used to report
+    a rate.
+    """
+
+    def __init__(self, minTime=1.0, minRounds=3, maxRounds=1000):
+        self.minTime = minTime
+        self.minRounds = minRounds
+        self.maxRounds = maxRounds
+        self.extra_info = {}
+        self.timings = []
+
+    def __call__(self, f, *args, **kwargs):
+        result = f(*args, **kwargs)
+        timings = []
+        deadline = time.perf_counter() + self.minTime
+        while len(timings) < self.maxRounds:
+            start = time.perf_counter()
+            result = f(*args, **kwargs)
+            end = time.perf_counter()
+            timings.append(end - start)
+            if end >= deadline and len(timings) >= self.minRounds:
+                break
+        self.timings = timings
+        return result
+
+    def stats(self):
+        timings = sorted(self.timings)
+        mean = sum(timings) / len(timings)
+        return {
+            "min": timings[0],
+            "max": timings[-1],
+            "mean": mean,
+            "median": timings[len(timings) // 2],
+            "rounds": len(timings),
+            "ops": 1 / mean,
+        }
+
+
+def collect(module):
+    """
+    Return the benchmark functions of module, in definition order.
+    """
+    return [
+        f
+        for name, f in vars(module).items()
+        if name.startswith("bench_") and callable(f)
+    ]
+
+
+def benchmarkName(f):
+    """
+    Return the name of a benchmark function, e.g. codec.decode_bind for
+    benchmarks.codec.bench_decode_bind.
+    """
+    return "{}.{}".format(f.__module__.rpartition(".")[2], f.__name__[len("bench_") :])
+
+
+def machineInfo():
+    return {
+        "python_implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "ldaptor_version": ldaptor.__version__,
+        "twisted_version": twisted.__version__,
+    }
+
+
+def run(benchmarks, out=sys.stdout, **timerArgs):
+    """
+    Run benchmarks, print a line for each to out and return the results.
+    """
+    results = []
+    for f in benchmarks:
+        name = benchmarkName(f)
+        timer = Timer(**timerArgs)
+        f(timer)
+        stats = timer.stats()
+        line = "{:<40} {:>12.3f} ms".format(name, stats["mean"] * 1000)
+        items = timer.extra_info.get("items")
+        if items:
+            stats["items_per_second"] = items / stats["mean"]
+            line += " {:>12.0f} items/s".format(stats["items_per_second"])
+        print(line, file=out)
+        out.flush()
+        results.append(
+            {
+                "name": name,
+                "group": name.partition(".")[0],
+                "fullname": "{}.{}".format(f.__module__, f.__name__),
+                "extra_info": timer.extra_info,
+                "stats": stats,
+            }
+        )
+    return results
+
+
+def main(argv=None, modules=None):
+    """
+    Run the benchmarks in the named modules of this package, or in all.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run the ldaptor benchmarks."
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help="only run the benchmarks whose name contains one of these",
+    )
+    parser.add_argument(
+        "-o",
+        "--json",
+        metavar="FILE",
+        help="also write the results to FILE as JSON, - for standard output",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="time each benchmark for at least this long (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    benchmarks = []
+    for module in modules or MODULES:
+        for f in collect(importlib.import_module("benchmarks." + module)):
+            name = benchmarkName(f)
+            if not args.names or any(n in name for n in args.names):
+                benchmarks.append(f)
+
+    out = sys.stderr if args.json == "-" else sys.stdout
+    results = run(benchmarks, out=out, minTime=args.min_time)
+
+    if args.json:
+        report = {
+            "machine_info": machineInfo(),
+            "datetime": datetime.datetime.utcnow().isoformat(),
+            "benchmarks": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=4)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=4)
@@ -0,0 +1,198 @@
+"""
+Encode and decode representative LDAP messages.
+
+Messages are built anew for every encoding, so the encoding benchmarks
+include building the objects as a client or server does.
+"""
+
+from ldaptor.protocols import pureber, pureldap
+
+COUNT = 1000
+
+FILTER = (
+    "(&(objectClass=inetOrgPerson)"
+    "(|(uid=jdoe%d*)(mail=*@example.com)(cn=*Doe*))"
+    "(!(employeeType=contractor))"
+    "(uidNumber>=1000))"
+)
+
+
+def decoder():
+    return pureldap.LDAPBERDecoderContext_TopLevel(
+        inherit=pureldap.LDAPBERDecoderContext_LDAPMessage(
+            fallback=pureldap.LDAPBERDecoderContext(
+                fallback=pureber.BERDecoderContext()
+            ),
+            inherit=pureldap.LDAPBERDecoderContext(
+                fallback=pureber.BERDecoderContext()
+            ),
+        )
+    )
+
+
+def decodeAll(data):
+    """
+    Decode the concatenated messages in data, and return how many there were.
+    """
+    d = decoder()
+    data = memoryview(data)
+    count = offset = 0
+    while offset < len(data):
+        o, length = pureber.berDecodeObject(d, data[offset:])
+        offset += length
+        count += 1
+        # Clients look at every attribute of every entry.
+        if isinstance(o.value, pureldap.LDAPSearchResultEntry):
+            for type, values in o.value.attributes:
+                pass
+    return count
+
+
+def bindRequest(id):
+    return pureldap.LDAPMessage(
+        pureldap.LDAPBindRequest(
+            dn=b"uid=jdoe%d,ou=People,dc=example,dc=com" % id, auth=b"secret"
+        ),
+        id=id,
+    )
+
+
+def assertion(cls, type, value):
+    return cls(
+        attributeDesc=pureldap.LDAPAttributeDescription(type),
+        assertionValue=pureldap.LDAPAssertionValue(value),
+    )
+
+
+def nestedFilter(i):
+    """
+    Return the filter FILTER would parse to, for user jdoe<i>.
+    """
+    return pureldap.LDAPFilter_and(
+        [
+            assertion(
+                pureldap.LDAPFilter_equalityMatch, b"objectClass", b"inetOrgPerson"
+            ),
+            pureldap.LDAPFilter_or(
+                [
+                    pureldap.LDAPFilter_substrings(
+                        type=b"uid",
+                        substrings=[
+                            pureldap.LDAPFilter_substrings_initial(b"jdoe%d" % i)
+                        ],
+                    ),
+                    pureldap.LDAPFilter_substrings(
+                        type=b"mail",
+                        substrings=[
+                            pureldap.LDAPFilter_substrings_final(b"@example.com")
+                        ],
+                    ),
+                    pureldap.LDAPFilter_substrings(
+                        type=b"cn",
+                        substrings=[pureldap.LDAPFilter_substrings_any(b"Doe")],
+                    ),
+                ]
+            ),
+            pureldap.LDAPFilter_not(
+                assertion(
+                    pureldap.LDAPFilter_equalityMatch,
+                    b"employeeType",
+                    b"contractor",
+                )
+            ),
+            assertion(pureldap.LDAPFilter_greaterOrEqual, b"uidNumber", b"1000"),
+        ]
+    )
+
+
+def searchRequest(id, filter):
+    return pureldap.LDAPMessage(
+        pureldap.LDAPSearchRequest(
+            baseObject=b"ou=People,dc=example,dc=com",
+            filter=filter,
+            attributes=[b"cn", b"mail", b"uidNumber"],
+        ),
+        id=id,
+    )
+
+
+def searchResultEntry(id, i):
+    uid = b"jdoe%d" % i
+    return pureldap.LDAPMessage(
+        pureldap.LDAPSearchResultEntry(
+            objectName=b"uid=" + uid + b",ou=People,dc=example,dc=com",
+            attributes=[
+                (b"objectClass", [b"top", b"person", b"inetOrgPerson"]),
+                (b"uid", [uid]),
+                (b"cn", [b"John Doe " + uid]),
+                (b"sn", [b"Doe"]),
+                (b"mail", [uid + b"@example.com"]),
+                (b"uidNumber", [b"%d" % (1000 + i)]),
+            ],
+        ),
+        id=id,
+    )
+
+
+def resultStream(id, count=COUNT):
+    """
+    Return the encoding of count search result entries and the search
+    result done that follows them.
+    """
+    messages = [searchResultEntry(id, i) for i in range(count)]
+    messages.append(pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=id))
+    return b"".join(m.toWire() for m in messages)
+
+
+def encodeBinds():
+    for id in range(1, COUNT + 1):
+        bindRequest(id).toWire()
+
+
+def encodeSearches():
+    for id in range(1, COUNT + 1):
+        searchRequest(id, nestedFilter(id)).toWire()
+
+
+def encodeResults():
+    return resultStream(1)
+
+
+def bench_encode_bind(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(encodeBinds)
+
+
+def bench_decode_bind(benchmark):
+    data = b"".join(bindRequest(id).toWire() for id in range(1, COUNT + 1))
+    benchmark.extra_info["items"] = COUNT
+    assert benchmark(decodeAll, data) == COUNT
+
+
+def bench_encode_search_request(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(encodeSearches)
+
+
+def bench_decode_search_request(benchmark):
+    data = b"".join(
+        searchRequest(id, nestedFilter(id)).toWire() for id in range(1, COUNT + 1)
+    )
+    benchmark.extra_info["items"] = COUNT
+    assert benchmark(decodeAll, data) == COUNT
+
+
+def bench_encode_result_stream(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(encodeResults)
+
+
+def bench_decode_result_stream(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    assert benchmark(decodeAll, resultStream(1)) == COUNT + 1
+
+
+if __name__ == "__main__":
+    from benchmarks._runner import main
+
+    main(modules=["codec"])
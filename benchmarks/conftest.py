@@ -0,0 +1,26 @@
+"""
+Collect the benchmarks with pytest.
+
+pytest-benchmark provides the benchmark fixture when it is installed.
+Otherwise each benchmark is run once with the plain timer, which keeps
+them usable as smoke tests.
+"""
+
+import importlib.util
+
+import pytest
+
+from benchmarks._runner import MODULES, Timer
+
+
+def pytest_configure(config):
+    for module in MODULES:
+        config.addinivalue_line("python_files", module + ".py")
+    config.addinivalue_line("python_functions", "bench_*")
+
+
+if importlib.util.find_spec("pytest_benchmark") is None:
+
+    @pytest.fixture
+    def benchmark():
+        return Timer(minTime=0, minRounds=1, maxRounds=1)
@@ -0,0 +1,66 @@
+"""
+Parse, compare and test the containment of distinguished names.
+"""
+
+from ldaptor.protocols.ldap.distinguishedname import DistinguishedName
+
+COUNT = 1000
+
+
+def texts(count=COUNT):
+    return [
+        "uid=jdoe%d,ou=unit%d,dc=example,dc=com" % (i, i % 10) for i in range(count)
+    ]
+
+
+def parse(texts):
+    for text in texts:
+        DistinguishedName(stringValue=text)
+
+
+def compare(dns, others):
+    equal = 0
+    for a, b in zip(dns, others):
+        if a == b:
+            equal += 1
+    return equal
+
+
+def contains(base, dns):
+    contained = 0
+    for dn in dns:
+        if base.contains(dn):
+            contained += 1
+    return contained
+
+
+def bench_parse(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(parse, texts())
+
+
+def bench_compare(benchmark):
+    dns = [DistinguishedName(stringValue=text) for text in texts()]
+    # The same names, differently cased, as clients send them.
+    others = [DistinguishedName(stringValue=text.upper()) for text in texts()]
+    benchmark.extra_info["items"] = COUNT
+    assert benchmark(compare, dns, others) == COUNT
+
+
+def bench_sort(benchmark):
+    dns = [DistinguishedName(stringValue=text) for text in texts()]
+    benchmark.extra_info["items"] = COUNT
+    benchmark(sorted, dns)
+
+
+def bench_contains(benchmark):
+    base = DistinguishedName(stringValue="ou=unit3,dc=example,dc=com")
+    dns = [DistinguishedName(stringValue=text) for text in texts()]
+    benchmark.extra_info["items"] = COUNT
+    assert benchmark(contains, base, dns) == COUNT // 10
+
+
+if __name__ == "__main__":
+    from benchmarks._runner import main
+
+    main(modules=["dn"])
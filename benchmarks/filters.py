@@ -0,0 +1,66 @@
+"""
+Parse search filters and match entries against them.
+"""
+
+from ldaptor import inmemory, ldapfilter
+
+from benchmarks.search import person
+
+COUNT = 1000
+
+FILTERS = [
+    "(uid=jdoe42)",
+    "(objectClass=*)",
+    "(cn=*Doe jdoe42*)",
+    "(uidNumber>=100500)",
+    "(&(objectClass=person)(departmentNumber=legal))",
+    "(|(uid=jdoe1)(uid=jdoe2)(uid=jdoe3)(mail=jdoe4@example.com))",
+    "(!(departmentNumber=sales))",
+    "(&(objectClass=inetOrgPerson)"
+    "(|(uid=jdoe42*)(mail=*@example.com)(cn=*Doe*))"
+    "(!(employeeType=contractor))"
+    "(uidNumber>=101000))",
+]
+
+
+def entries(count=COUNT):
+    result = []
+    for i in range(count):
+        rdn, attributes = person(i)
+        result.append(
+            inmemory.ReadOnlyInMemoryLDAPEntry(
+                dn=rdn + ",ou=People,dc=example,dc=com", attributes=attributes
+            )
+        )
+    return result
+
+
+def parse(filters):
+    for text in filters:
+        ldapfilter.parseFilter(text)
+
+
+def match(entries, filters):
+    matches = 0
+    for f in filters:
+        for e in entries:
+            if e.match(f):
+                matches += 1
+    return matches
+
+
+def bench_parseFilter(benchmark):
+    benchmark.extra_info["items"] = len(FILTERS)
+    benchmark(parse, FILTERS)
+
+
+def bench_match(benchmark):
+    filters = [ldapfilter.parseFilter(text) for text in FILTERS]
+    benchmark.extra_info["items"] = COUNT * len(filters)
+    benchmark(match, entries(), filters)
+
+
+if __name__ == "__main__":
+    from benchmarks._runner import main
+
+    main(modules=["filters"])
@@ -0,0 +1,70 @@
+"""
+Encode and decode the headers of LDAP messages.
+
+Every message carries an id and a length, and every result an
+enumerated result code, so this measures int2ber(), int2berlen() and
+ber2int() as a server and client see them.
+"""
+
+from ldaptor.protocols import pureber, pureldap
+
+from benchmarks.codec import decoder
+
+COUNT = 100000
+
+
+def ids(count=COUNT):
+    # Spread the ids over small and large values, as a long-running
+    # connection would.
+    return [i * 7919 % 2 ** 31 for i in range(1, count + 1)]
+
+
+def encode(ids):
+    for id in ids:
+        pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=id).toWire()
+
+
+def decode(messages):
+    d = decoder()
+    for message in messages:
+        pureber.berDecodeObject(d, message)
+
+
+def encodeIntegers(ids):
+    for id in ids:
+        pureber.int2berlen(len(pureber.int2ber(id)))
+
+
+def decodeIntegers(encoded):
+    for e in encoded:
+        pureber.ber2int(e)
+
+
+def bench_int2ber(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(encodeIntegers, ids())
+
+
+def bench_ber2int(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(decodeIntegers, [pureber.int2ber(id) for id in ids()])
+
+
+def bench_encode(benchmark):
+    benchmark.extra_info["items"] = COUNT
+    benchmark(encode, ids())
+
+
+def bench_decode(benchmark):
+    messages = [
+        pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=id).toWire()
+        for id in ids()
+    ]
+    benchmark.extra_info["items"] = COUNT
+    benchmark(decode, messages)
+
+
+if __name__ == "__main__":
+    from benchmarks._runner import main
+
+    main(modules=["header"])
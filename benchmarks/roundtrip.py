@@ -0,0 +1,89 @@
+"""
+Search an LDAPServer through an LDAPClient connected to it in memory.
+
+This measures both protocols and the in-memory directory together,
+without the cost of sockets. The transports are pumped synchronously.
+"""
+
+from twisted.test import iosim
+
+from ldaptor.protocols import pureldap
+from ldaptor.protocols.ldap import ldapclient, ldapserver
+
+from benchmarks.search import tree
+
+SIZE = 10000
+
+COUNT = 100
+
+
+def connect(root):
+    def server():
+        server = ldapserver.LDAPServer()
+        server.factory = root
+        return server
+
+    client, server, pump = iosim.connectedServerAndClient(server, ldapclient.LDAPClient)
+    return client, pump
+
+
+def search(client, pump, baseObject, filter, scope):
+    """
+    Send a search request, and return the number of entries it found.
+    """
+    entries = []
+
+    def handle(response):
+        if isinstance(response, pureldap.LDAPSearchResultDone):
+            assert response.resultCode == 0, response
+            return True
+        entries.append(response)
+        return False
+
+    client.send_multiResponse(
+        pureldap.LDAPSearchRequest(baseObject=baseObject, scope=scope, filter=filter),
+        handle,
+    )
+    pump.flush()
+    assert not client.onwire
+    return len(entries)
+
+
+def lookups(client, pump, dns):
+    for dn in dns:
+        assert search(client, pump, dn, None, pureldap.LDAP_SCOPE_baseObject) == 1
+
+
+def bench_search(benchmark):
+    client, pump = connect(tree(SIZE))
+    benchmark.extra_info["items"] = SIZE // 5
+    assert (
+        benchmark(
+            search,
+            client,
+            pump,
+            b"dc=example,dc=com",
+            pureldap.LDAPFilter_equalityMatch(
+                attributeDesc=pureldap.LDAPAttributeDescription(b"departmentNumber"),
+                assertionValue=pureldap.LDAPAssertionValue(b"legal"),
+            ),
+            pureldap.LDAP_SCOPE_wholeSubtree,
+        )
+        == SIZE // 5
+    )
+
+
+def bench_lookup(benchmark):
+    client, pump = connect(tree(SIZE))
+    dns = [
+        b"uid=jdoe%d,ou=unit%d,dc=example,dc=com" % (i, i % 10)
+        for i in range(0, SIZE, SIZE // COUNT)
+    ]
+    benchmark.extra_info["items"] = COUNT
+    benchmark(lookups, client, pump, dns)
+
+
+if __name__ == "__main__":
+    from benchmarks._runner import main
+
+    main(modules=["roundtrip"])
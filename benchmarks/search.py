@@ -0,0 +1,234 @@
+"""
+Search in-memory directory trees of 10k and 100k entries.
+
+The people in a tree are spread over ten organizational units. Building
+a tree is not timed, and each size is built once per process.
+"""
+
+import functools
+
+from ldaptor import attributeindex, entryhelpers, inmemory
+
+UNITS = 10
+
+INDEXES = {
+    "objectClass": {},
+    "uid": {},
+    "cn": {"substring": True},
+    "mail": {"substring": True},
+    "departmentNumber": {},
+    "uidNumber": {"equality": False, "ordering": True},
+}
+
+SYNTAXES = {"uidNumber": attributeindex.INTEGER}
+
+DEPARTMENTS = ["sales", "engineering", "support", "finance", "legal"]
+
+
+def person(i):
+    """
+    Return the RDN and attributes of the i-th person of a tree.
+    """
+    uid = "jdoe%d" % i
+    return (
+        "uid=" + uid,
+        {
+            "objectClass": ["top", "person", "inetOrgPerson"],
+            "uid": [uid],
+            "cn": ["John Doe " + uid],
+            "sn": ["Doe"],
+            "mail": [uid + "@example.com"],
+            "uidNumber": ["%d" % (100000 + i)],
+            "departmentNumber": [DEPARTMENTS[i % len(DEPARTMENTS)]],
+        },
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def tree(size, indexed=False):
+    """
+    Return the root of a tree of size people with SYNTAXES, and with
+    INDEXES if indexed.
+    """
+    root = inmemory.ReadOnlyInMemoryLDAPEntry(
+        dn="dc=example,dc=com",
+        attributes={"objectClass": ["dcObject"], "dc": ["example"]},
+    )
+    units = [
+        root.addChild(
+            rdn="ou=unit%d" % u,
+            attributes={
+                "objectClass": ["organizationalUnit"],
+                "ou": ["unit%d" % u],
+            },
+        )
+        for u in range(UNITS)
+    ]
+    for i in range(size):
+        rdn, attributes = person(i)
+        units[i % UNITS].addChild(rdn=rdn, attributes=attributes)
+    for attributeType, syntax in SYNTAXES.items():
+        root.setSyntax(attributeType, syntax)
+    if indexed:
+        for attributeType, options in INDEXES.items():
+            root.addIndex(attributeType, **options)
+    return root
+
+
+def search(root, filterText):
+    """
+    Search the subtree of root and return the number of matching entries.
+    """
+    results = []
+    d = root.search(filterText=filterText)
+    d.addCallback(results.extend)
+    return len(results)
+
+
+def benchSearch(benchmark, size, filterText, expected, indexed=False):
+    root = tree(size, indexed)
+    benchmark.extra_info["entries"] = size
+    assert benchmark(search, root, filterText) == expected
+
+
+def bench_equality_10k(benchmark):
+    benchSearch(benchmark, 10000, "(uid=jdoe4242)", 1)
+
+
+def bench_equality_100k(benchmark):
+    benchSearch(benchmark, 100000, "(uid=jdoe4242)", 1)
+
+
+def bench_equality_indexed_100k(benchmark):
+    benchSearch(benchmark, 100000, "(uid=jdoe4242)", 1, indexed=True)
+
+
+def bench_or_indexed_100k(benchmark):
+    benchSearch(
+        benchmark,
+        100000,
+        "(|(uid=jdoe4242)(mail=jdoe4243@example.com)(uid=nobody))",
+        2,
+        indexed=True,
+    )
+
+
+def bench_and_10k(benchmark):
+    benchSearch(
+        benchmark, 10000, "(&(objectClass=person)(departmentNumber=legal))", 2000
+    )
+
+
+def bench_and_100k(benchmark):
+    benchSearch(
+        benchmark, 100000, "(&(objectClass=person)(departmentNumber=legal))", 20000
+    )
+
+
+def bench_and_indexed_100k(benchmark):
+    benchSearch(
+        benchmark,
+        100000,
+        "(&(objectClass=person)(departmentNumber=legal))",
+        20000,
+        indexed=True,
+    )
+
+
+def bench_substring_10k(benchmark):
+    benchSearch(benchmark, 10000, "(cn=*Doe jdoe42*)", 111)
+
+
+def bench_substring_100k(benchmark):
+    benchSearch(benchmark, 100000, "(cn=*Doe jdoe42*)", 1111)
+
+
+def bench_substring_indexed_100k(benchmark):
+    benchSearch(benchmark, 100000, "(cn=*Doe jdoe42*)", 1111, indexed=True)
+
+
+def bench_initial_indexed_100k(benchmark):
+    benchSearch(benchmark, 100000, "(mail=jdoe420*)", 111, indexed=True)
+
+
+def bench_range_10k(benchmark):
+    benchSearch(benchmark, 10000, "(uidNumber>=108000)", 2000)
+
+
+def bench_range_100k(benchmark):
+    benchSearch(benchmark, 100000, "(uidNumber>=198000)", 2000)
+
+
+def bench_range_indexed_100k(benchmark):
+    benchSearch(benchmark, 100000, "(uidNumber>=198000)", 2000, indexed=True)
+
+
+def top(root, sortKeys, count):
+    entries = root.searchEntries(
+        filterText="(objectClass=inetOrgPerson)", sortKeys=sortKeys, limit=count
+    )
+    return [e for _, e in zip(range(count), entries)]
+
+
+def benchTop(benchmark, sortKeys, indexed=False):
+    """
+    Find the first 100 people in the order of sortKeys.
+    """
+    root = tree(100000, indexed)
+    benchmark.extra_info["items"] = 100
+    assert len(benchmark(top, root, sortKeys, 100)) == 100
+
+
+def bench_sorted_top_100k(benchmark):
+    benchTop(benchmark, [("uidNumber", "integerOrderingMatch", False)])
+
+
+def bench_sorted_top_indexed_100k(benchmark):
+    benchTop(benchmark, [("uidNumber", None, False)], indexed=True)
+
+
+def scroll(view, values):
+    """
+    Take a window of 20 entries of view around each of values.
+    """
+    for value in values:
+        assert len(view.window(view.find(value), 5, 14)) == 20
+
+
+def bench_listView_indexed_100k(benchmark):
+    sortKeys = [("uidNumber", None, False)]
+    root = tree(100000, indexed=True)
+    view = entryhelpers.ListView(
+        root.searchEntries(filterText="(objectClass=inetOrgPerson)", sortKeys=sortKeys),
+        sortKeys,
+        root,
+    )
+    values = [b"%d" % (100000 + i) for i in range(1000, 99000, 980)]
+    benchmark.extra_info["items"] = len(values)
+    benchmark(scroll, view, values)
+
+
+def lookups(root, dns):
+    for dn in dns:
+        results = []
+        root.lookup(dn).addCallback(results.append)
+        assert results, dn
+
+
+def bench_lookup_100k(benchmark):
+    """
+    Look entries up by DN, under units of 10k entries each.
+    """
+    root = tree(100000)
+    dns = [
+        "uid=jdoe%d,ou=unit%d,dc=example,dc=com" % (i, i % UNITS)
+        for i in range(0, 100000, 1000)
+    ]
+    benchmark.extra_info["items"] = len(dns)
+    benchmark(lookups, root, dns)
+
+
+if __name__ == "__main__":
+    from benchmarks._runner import main
+
+    main(modules=["search"])
@@ -0,0 +1,105 @@
+import os
+import sys
+from ldaptor import usage, workers
+from twisted.internet import protocol, reactor, stdio
+from twisted.python import log
+
+
+class MyOptions(usage.Options):
+    """LDAPtor server for an LDIF snapshot, run by several worker processes"""
+
+    optParameters = (
+        ("port", "p", 10389, "Port to listen on", int),
+        ("interface", None, "", "Interface to listen on"),
+        (
+            "workers",
+            "n",
+            None,
+            "Number of worker processes [default: number of CPUs]",
+            int,
+        ),
+        ("changes", None, None, "LDIF change file to follow and apply"),
+        ("interval", None, 1.0, "Seconds between reads of the change file", float),
+        ("worker-fd", None, None, "Serve as a worker, on this listening socket", int),
+    )
+
+    def __init__(self):
+        super().__init__()
+        self["indexes"] = []
+
+    def opt_index(self, attributeType):
+        """Index the values of an attribute type (may be repeated)"""
+        self["indexes"].append(attributeType)
+
+    def parseArgs(self, data):
+        self["data"] = data
+
+
+def makeService(config):
+    """
+    Return the service of the supervisor, or of a worker if
+    --worker-fd is given.
+    """
+    if config["worker-fd"] is not None:
+        return workers.WorkerService(
+            config["data"],
+            config["worker-fd"],
+            workers.family(config["interface"]),
+            changes=config["changes"],
+            interval=config["interval"],
+            indexes=config["indexes"],
+        )
+
+    port = workers.listen(config["port"], config["interface"])
+    args = [
+        sys.executable,
+        "-m",
+        "ldaptor._scripts.server",
+        "--worker-fd",
+        str(port.fileno()),
+        "--interface",
+        config["interface"],
+        "--interval",
+        str(config["interval"]),
+    ]
+    if config["changes"] is not None:
+        args += ["--changes", os.path.abspath(config["changes"])]
+    for attributeType in config["indexes"]:
+        args += ["--index", attributeType]
+    args.append(os.path.abspath(config["data"]))
+    return workers.WorkerMonitor(args, config["workers"] or os.cpu_count() or 1, port)
+
+
+class _Supervisor(protocol.Protocol):
+    """
+    The stdin of a worker, which is closed when its supervisor exits.
+    """
+
+    def connectionLost(self, reason):
+        if reactor.running:
+            reactor.stop()
+
+
+def console_script():
+    try:
+        config = MyOptions()
+        config.parseOptions()
+    except usage.UsageError as ue:
+        sys.stderr.write(f"{sys.argv[0]}: {ue}\n")
+        sys.exit(1)
+
+    log.startLogging(sys.stderr)
+    try:
+        service = makeService(config)
+    except OSError as e:
+        sys.stderr.write(f"{sys.argv[0]}: {e}\n")
+        sys.exit(1)
+    if config["worker-fd"] is not None:
+        stdio.StandardIO(_Supervisor())
+    reactor.callWhenRunning(service.startService)
+    reactor.addSystemEventTrigger("before", "shutdown", service.stopService)
+    reactor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(console_script())
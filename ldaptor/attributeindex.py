@@ -0,0 +1,530 @@
+"""
+Indexes over the values of the attributes of in-memory LDAP entries.
+
+An AttributeIndex maps the values of one attribute type to the entries
+holding them, so that a search can start from the few entries that may
+match its filter instead of walking the whole tree. The candidates are
+then matched against the filter as usual, so an index only has to find
+a superset of the matching entries.
+
+Entries are kept in dicts keyed by their id(), as entries hash by DN,
+which changes when they move, and compare equal by content.
+"""
+
+import bisect
+import datetime
+import re
+
+from ldaptor._encoder import to_bytes
+from ldaptor.attributeset import normalizeValue
+from ldaptor.protocols import pureldap
+
+INTEGER = "1.3.6.1.4.1.1466.115.121.1.27"
+GENERALIZED_TIME = "1.3.6.1.4.1.1466.115.121.1.24"
+OCTET_STRING = "1.3.6.1.4.1.1466.115.121.1.40"
+DIRECTORY_STRING = "1.3.6.1.4.1.1466.115.121.1.15"
+
+
+def normalizeType(attributeType):
+    """
+    Return the key of an attribute type, which ignores case.
+    """
+    if isinstance(attributeType, bytes):
+        attributeType = attributeType.decode("utf-8")
+    return attributeType.lower()
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def integerKey(value):
+    """
+    Order values of the Integer syntax by their numeric value.
+    """
+    return int(_text(value))
+
+
+_generalizedTime = re.compile(
+    r"([0-9]{4})([0-9]{2})([0-9]{2})([0-9]{2})([0-9]{2})?([0-9]{2})?"
+    r"(?:[.,]([0-9]+))?(Z|[+-][0-9]{2}(?:[0-9]{2})?)?$"
+)
+
+
+def generalizedTimeKey(value):
+    """
+    Order values of the Generalized Time syntax by the UTC time they
+    denote. A value without a time zone is taken as UTC.
+    """
+    value = _text(value)
+    match = _generalizedTime.match(value)
+    if match is None:
+        raise ValueError("Invalid generalized time: %r" % value)
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    result = datetime.datetime(
+        int(year), int(month), int(day), int(hour), int(minute or 0), int(second or 0)
+    )
+    if fraction:
+        # A fraction is of the last unit given.
+        unit = 1 if second else 60 if minute else 3600
+        result += datetime.timedelta(seconds=float("0." + fraction) * unit)
+    if zone and zone != "Z":
+        offset = datetime.timedelta(hours=int(zone[1:3]), minutes=int(zone[3:] or 0))
+        if zone[0] == "+":
+            result -= offset
+        else:
+            result += offset
+    return result
+
+
+def octetStringKey(value):
+    """
+    Order values of the Octet String syntax by their bytes.
+    """
+    return to_bytes(value)
+
+
+def caseIgnoreKey(value):
+    """
+    Order text values ignoring case.
+    """
+    return _text(value).lower()
+
+
+_orderingKeys = {
+    INTEGER: integerKey,
+    GENERALIZED_TIME: generalizedTimeKey,
+    OCTET_STRING: octetStringKey,
+}
+
+
+# The ordering matching rules of RFC 4517, by OID and by name, and the
+# functions ordering values as they do.
+_orderingRules = {
+    "2.5.13.3": caseIgnoreKey,
+    "caseignoreorderingmatch": caseIgnoreKey,
+    "2.5.13.15": integerKey,
+    "integerorderingmatch": integerKey,
+    "2.5.13.18": octetStringKey,
+    "octetstringorderingmatch": octetStringKey,
+    "2.5.13.28": generalizedTimeKey,
+    "generalizedtimeorderingmatch": generalizedTimeKey,
+}
+
+
+def orderingRuleKey(rule):
+    """
+    Return the function ordering values as an ordering matching rule
+    does, like orderingKey(), or None if the rule is not known.
+
+    @param rule: The OID or the name of the rule, e.g. "2.5.13.15" or
+        "integerOrderingMatch".
+    """
+    return _orderingRules.get(_text(rule).strip().lower())
+
+
+def orderingKey(syntax):
+    """
+    Return the function ordering the values of an attribute syntax.
+
+    The function raises ValueError for values that are not valid in the
+    syntax, which are neither less nor greater than any other value.
+
+    @param syntax: The OID of the syntax, as found in an attribute type
+        description, e.g. INTEGER or b"1.3.6.1.4.1.1466.115.121.1.15{32768}".
+        Syntaxes other than INTEGER, GENERALIZED_TIME and OCTET_STRING
+        order values as text ignoring case.
+    """
+    key = _orderingKeys.get(syntax)
+    if key is not None:
+        return key
+    syntax = _text(syntax).split("{", 1)[0].strip()
+    return _orderingKeys.get(syntax, caseIgnoreKey)
+
+
+def trigrams(value):
+    """
+    Return the set of substrings of length 3 of value.
+    """
+    return {value[i : i + 3] for i in range(len(value) - 2)}
+
+
+class _SortedKeys:
+    """
+    A sorted list of keys, which sorts additions when it is next read.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._sorted = True
+
+    def add(self, key):
+        self._keys.append(key)
+        self._sorted = False
+
+    def remove(self, key):
+        keys = self._sortedKeys()
+        del keys[bisect.bisect_left(keys, key)]
+
+    def _sortedKeys(self):
+        if not self._sorted:
+            # Mostly sorted already, which sort() takes advantage of.
+            self._keys.sort()
+            self._sorted = True
+        return self._keys
+
+    def atLeast(self, key):
+        keys = self._sortedKeys()
+        return keys[bisect.bisect_left(keys, key) :]
+
+    def atMost(self, key):
+        keys = self._sortedKeys()
+        return keys[: bisect.bisect_right(keys, key)]
+
+    def iterate(self, reverse=False):
+        """
+        Yield the keys in order, or in reverse order. Keys may be added
+        and removed meanwhile; each key is then found from the previous
+        one again.
+        """
+        keys = self._sortedKeys()
+        if not keys:
+            return
+        key = keys[-1] if reverse else keys[0]
+        while True:
+            yield key
+            keys = self._sortedKeys()
+            if reverse:
+                i = bisect.bisect_left(keys, key)
+                if i == 0:
+                    return
+                key = keys[i - 1]
+            else:
+                i = bisect.bisect_right(keys, key)
+                if i == len(keys):
+                    return
+                key = keys[i]
+
+    def startingWith(self, prefix):
+        keys = self._sortedKeys()
+        found = set()
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            found.add(keys[i])
+        return found
+
+
+class AttributeIndex:
+    """
+    Index the entries having an attribute, and optionally its values.
+
+    @ivar present: The entries having the attribute, keyed by id().
+
+    @ivar values: If equality or substring is true, a dict mapping the
+        normalized values of the attribute to the entries having them,
+        keyed by id().
+
+    Substring indexes keep the values sorted, and sorted reversed, to
+    find the values with initial and final substrings, and the values
+    having each trigram, to find the values containing any substrings
+    of at least 3 characters.
+
+    Ordering indexes keep the values sorted by the orderingKey() of a
+    syntax, to find the values in a range.
+
+    @ivar ordering: The syntax ordering the values, or None.
+
+    @ivar orderingKey: The function ordering the values, or None.
+    """
+
+    def __init__(self, attributeType, equality=True, substring=False, ordering=None):
+        self.attributeType = attributeType
+        self.equality = equality or substring
+        self.substring = substring
+        self.ordering = ordering
+        self.orderingKey = None if ordering is None else orderingKey(ordering)
+        self.present = {}
+        self.values = {}
+        self._keys = {}
+        self._prefixes = _SortedKeys()
+        self._suffixes = _SortedKeys()
+        self._trigrams = {}
+        # Values that are not text cannot be compared with the others, so
+        # they are candidates for every substring filter.
+        self._binary = set()
+        self._ordered = _SortedKeys()
+        self._orderedEntries = {}
+        self._orderKeys = {}
+
+    def __repr__(self):
+        return "{}({!r}, equality={!r}, substring={!r}, ordering={!r})".format(
+            self.__class__.__name__,
+            self.attributeType,
+            self.equality,
+            self.substring,
+            self.ordering,
+        )
+
+    def add(self, entry):
+        values = entry.get(self.attributeType)
+        if values is None:
+            return
+        key = id(entry)
+        self.present[key] = entry
+        if self.equality:
+            keys = {normalizeValue(value) for value in values}
+            self._keys[key] = keys
+            for k in keys:
+                entries = self.values.get(k)
+                if entries is None:
+                    entries = self.values[k] = {}
+                    if self.substring:
+                        self._addSubstrings(k)
+                entries[key] = entry
+        if self.orderingKey is not None:
+            keys = set()
+            for value in values:
+                try:
+                    keys.add(self.orderingKey(value))
+                except ValueError:
+                    pass
+            self._orderKeys[key] = keys
+            for k in keys:
+                entries = self._orderedEntries.get(k)
+                if entries is None:
+                    entries = self._orderedEntries[k] = {}
+                    self._ordered.add(k)
+                entries[key] = entry
+
+    def remove(self, entry):
+        key = id(entry)
+        if self.present.pop(key, None) is None:
+            return
+        for k in self._keys.pop(key, ()):
+            entries = self.values[k]
+            del entries[key]
+            if not entries:
+                del self.values[k]
+                if self.substring:
+                    self._removeSubstrings(k)
+        for k in self._orderKeys.pop(key, ()):
+            entries = self._orderedEntries[k]
+            del entries[key]
+            if not entries:
+                del self._orderedEntries[k]
+                self._ordered.remove(k)
+
+    def inRange(self, value, greater):
+        """
+        Find the entries with a value at least, or at most, value.
+
+        @param greater: If true, find the values greater than or equal to
+            value, else the values less than or equal to it.
+
+        @return: A dict of the entries, keyed by id().
+        """
+        try:
+            value = self.orderingKey(value)
+        except ValueError:
+            return {}
+        if greater:
+            keys = self._ordered.atLeast(value)
+        else:
+            keys = self._ordered.atMost(value)
+        result = {}
+        for k in keys:
+            result.update(self._orderedEntries[k])
+        return result
+
+    def ordered(self, reverse=False):
+        """
+        Yield the entries with a value in order of their least value, or
+        in reverse order of their greatest value, each once.
+
+        @return: An iterator over lists of the entries having the same
+            least, or greatest, value.
+        """
+        seen = set()
+        for k in self._ordered.iterate(reverse):
+            group = []
+            for key, entry in list(self._orderedEntries.get(k, {}).items()):
+                if key not in seen:
+                    seen.add(key)
+                    group.append(entry)
+            if group:
+                yield group
+
+    def hasOrderedValue(self, entry):
+        """
+        Return whether the entry has a value ordered by this index.
+        """
+        return bool(self._orderKeys.get(id(entry)))
+
+    def _addSubstrings(self, value):
+        if not isinstance(value, str):
+            self._binary.add(value)
+            return
+        self._prefixes.add(value)
+        self._suffixes.add(value[::-1])
+        for trigram in trigrams(value):
+            self._trigrams.setdefault(trigram, set()).add(value)
+
+    def _removeSubstrings(self, value):
+        if not isinstance(value, str):
+            self._binary.discard(value)
+            return
+        self._prefixes.remove(value)
+        self._suffixes.remove(value[::-1])
+        for trigram in trigrams(value):
+            values = self._trigrams[trigram]
+            values.discard(value)
+            if not values:
+                del self._trigrams[trigram]
+
+    def _containing(self, substring):
+        found = None
+        for trigram in sorted(
+            trigrams(substring), key=lambda t: len(self._trigrams.get(t, ()))
+        ):
+            values = self._trigrams.get(trigram)
+            if not values:
+                return set()
+            found = set(values) if found is None else found & values
+            if not found:
+                break
+        return found
+
+    def substringValues(self, substrings):
+        """
+        Find the values that may match a substring filter.
+
+        @param substrings: The LDAPFilter_substrings_initial,
+            LDAPFilter_substrings_any and LDAPFilter_substrings_final of
+            the filter.
+
+        @return: A set of normalized values, or None if no substring
+            narrows the search.
+        """
+        found = None
+        for substring in substrings:
+            value = normalizeValue(substring.value)
+            if not isinstance(value, str):
+                continue
+            if isinstance(substring, pureldap.LDAPFilter_substrings_initial):
+                values = self._prefixes.startingWith(value)
+            elif isinstance(substring, pureldap.LDAPFilter_substrings_final):
+                values = {v[::-1] for v in self._suffixes.startingWith(value[::-1])}
+            elif len(value) >= 3:
+                values = self._containing(value)
+            else:
+                continue
+            found = values if found is None else found & values
+            if not found:
+                break
+        if found is None:
+            return None
+        return found | self._binary
+
+
+def candidates(indexes, filter):
+    """
+    Find the entries that may match a filter.
+
+    @param indexes: A dict mapping normalized attribute types to their
+        AttributeIndex.
+
+    @param filter: An LDAPFilter.
+
+    @return: A dict of the entries that may match filter, keyed by id(),
+        which must not be changed, or None if the indexes cannot narrow
+        the search.
+    """
+    if isinstance(filter, pureldap.LDAPFilter_present):
+        index = indexes.get(normalizeType(filter.value))
+        if index is None:
+            return None
+        return index.present
+    elif isinstance(filter, pureldap.LDAPFilter_equalityMatch):
+        index = indexes.get(normalizeType(filter.attributeDesc.value))
+        if index is None or not index.equality:
+            return None
+        return index.values.get(normalizeValue(filter.assertionValue.value), {})
+    elif isinstance(filter, pureldap.LDAPFilter_substrings):
+        index = indexes.get(normalizeType(filter.type))
+        if index is None or not index.substring:
+            return None
+        values = index.substringValues(filter.substrings)
+        if values is None:
+            return None
+        result = {}
+        for value in values:
+            result.update(index.values[value])
+        return result
+    elif isinstance(
+        filter, (pureldap.LDAPFilter_greaterOrEqual, pureldap.LDAPFilter_lessOrEqual)
+    ):
+        index = indexes.get(normalizeType(filter.attributeDesc.value))
+        if index is None or index.orderingKey is None:
+            return None
+        return index.inRange(
+            filter.assertionValue.value,
+            greater=isinstance(filter, pureldap.LDAPFilter_greaterOrEqual),
+        )
+    elif isinstance(filter, pureldap.LDAPFilter_and):
+        narrowed = []
+        for f in filter:
+            found = candidates(indexes, f)
+            if found is not None:
+                narrowed.append(found)
+        if not narrowed:
+            return None
+        narrowed.sort(key=len)
+        smallest, others = narrowed[0], narrowed[1:]
+        if not others:
+            return smallest
+        return {
+            key: entry
+            for key, entry in smallest.items()
+            if all(key in found for found in others)
+        }
+    elif isinstance(filter, pureldap.LDAPFilter_or):
+        result = {}
+        for f in filter:
+            found = candidates(indexes, f)
+            if found is None:
+                return None
+            result.update(found)
+        return result
+    return None
+
+
+def selectivity(indexes, filter):
+    """
+    Estimate the fraction of the indexed entries that a presence or
+    equality filter matches.
+
+    The entries are counted by the largest index, which is usually that
+    of an attribute every entry has, such as objectClass.
+
+    @return: A float between 0 and 1, or None if no index counts the
+        entries matching filter.
+    """
+    if isinstance(filter, pureldap.LDAPFilter_present):
+        index = indexes.get(normalizeType(filter.value))
+        if index is None:
+            return None
+        found = len(index.present)
+    elif isinstance(filter, pureldap.LDAPFilter_equalityMatch):
+        index = indexes.get(normalizeType(filter.attributeDesc.value))
+        if index is None or not index.equality:
+            return None
+        found = len(index.values.get(normalizeValue(filter.assertionValue.value), ()))
+    else:
+        return None
+    total = max(len(index.present) for index in indexes.values())
+    if not total:
+        return 0.0
+    return found / total
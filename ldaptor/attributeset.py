@@ -1,9 +1,48 @@
+import functools
 from copy import deepcopy
 
 from ldaptor._encoder import get_strings
 
 
+def _changes(method):
+    """
+    Wrap a set method that changes the values to call _changed() after it.
+    """
+
+    @functools.wraps(method)
+    def change(self, *args):
+        try:
+            return method(self, *args)
+        finally:
+            self._changed()
+
+    return change
+
+
+def normalizeValue(value):
+    """
+    Return value as it is compared ignoring case: lowercased, and as
+    text if it is UTF-8 bytes, so that text and its encoding compare
+    equal. Values that are not text are returned as they are.
+    """
+    if isinstance(value, bytes):
+        try:
+            value = value.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    try:
+        return value.lower()
+    except AttributeError:
+        return value
+
+
 class LDAPAttributeSet(set):
+    #: A callable called with this set after its values have changed, such
+    #: as the entry holding it keeping an index of its values up to date.
+    onChange = None
+
+    _normalized = None
+
     def __init__(self, key, *a, **kw):
         """
         Represents all the values for an attribute in an LDAP entry. An entry
@@ -47,6 +86,24 @@ class LDAPAttributeSet(set):
     def __ne__(self, other):
         return not self == other
 
+    def normalized(self):
+        """
+        Return the values as normalizeValue() returns them, in a frozenset
+        built when first needed after the values last changed.
+        """
+        normalized = self._normalized
+        if normalized is None:
+            normalized = self._normalized = frozenset(
+                normalizeValue(value) for value in self
+            )
+        return normalized
+
+    def _changed(self):
+        self._normalized = None
+        if self.onChange is not None:
+            self.onChange(self)
+
+    @_changes
     def add(self, key):
         """
         Adding key to the attributes with checking
@@ -58,6 +115,7 @@ class LDAPAttributeSet(set):
 
         set.add(self, key)
 
+    @_changes
     def remove(self, key):
         """
         Removing key from the attributes with checking
@@ -70,6 +128,18 @@ class LDAPAttributeSet(set):
 
         raise KeyError(key)
 
+    discard = _changes(set.discard)
+    pop = _changes(set.pop)
+    clear = _changes(set.clear)
+    update = _changes(set.update)
+    difference_update = _changes(set.difference_update)
+    intersection_update = _changes(set.intersection_update)
+    symmetric_difference_update = _changes(set.symmetric_difference_update)
+    __ior__ = _changes(set.__ior__)
+    __iand__ = _changes(set.__iand__)
+    __isub__ = _changes(set.__isub__)
+    __ixor__ = _changes(set.__ixor__)
+
     def copy(self):
         result = self.__class__(self.key)
         result.update(self)
@@ -1,7 +1,15 @@
+import bisect
+import collections
+import heapq
+import operator
+import threading
+import time
+
 from twisted.internet import defer
-from ldaptor import delta, ldapfilter
+from ldaptor import attributeindex, delta, ldapfilter
 from ldaptor._encoder import get_strings
-from ldaptor.protocols import pureldap
+from ldaptor.attributeset import normalizeValue
+from ldaptor.protocols import pureber, pureldap
 from ldaptor.protocols.ldap import ldapsyntax, ldaperrors
 
 
@@ -146,105 +154,777 @@ class SubtreeFromChildrenMixin:
             return d
 
 
-class MatchMixin:
-    def match(self, filter):
-        if isinstance(filter, pureldap.LDAPFilter_present):
-            for value in get_strings(filter.value):
-                if value in self:
-                    return True
+def _variants(value):
+    """
+    Return a dict mapping the types of value, as bytes and as text, to
+    value converted to them, so that it can be compared with either.
+    Values that are neither map their own type to themselves.
+    """
+    variants = {type(value): value}
+    try:
+        if isinstance(value, bytes):
+            variants[str] = value.decode("utf-8")
+        elif isinstance(value, str):
+            variants[bytes] = value.encode("utf-8")
+    except UnicodeError:
+        pass
+    return variants
+
+
+_invalid = object()
+
+
+def _normalized(values):
+    """
+    Return the normalized values of an attribute, as cached by
+    LDAPAttributeSet, which entries other than BaseLDAPEntry may not use.
+    """
+    normalized = getattr(values, "_normalized", _invalid)
+    if normalized is None:
+        return values.normalized()
+    elif normalized is _invalid:
+        return {normalizeValue(value) for value in values}
+    return normalized
+
+
+def _compilePresent(filter):
+    attributeType = filter.value
+
+    def matchPresent(entry):
+        return attributeType in entry
+
+    return matchPresent
+
+
+def _compileEquality(filter):
+    # TODO case insensitivity depends on different attribute syntaxes
+    attributeType = filter.attributeDesc.value
+    wanted = normalizeValue(filter.assertionValue.value)
+
+    def matchEquality(entry):
+        values = entry.get(attributeType)
+        if values is None:
             return False
-        elif isinstance(filter, pureldap.LDAPFilter_equalityMatch):
-            # TODO case insensitivity depends on different attribute syntaxes
-            for value in get_strings(filter.assertionValue.value.lower()):
-                if value in [
-                    val.lower() for val in self.get(filter.attributeDesc.value, [])
-                ]:
-                    return True
+        return wanted in _normalized(values)
+
+    return matchEquality
+
+
+def _compileSubstrings(filter):
+    attributeType = filter.type
+    initial = final = None
+    anys = []
+    for substring in filter.substrings:
+        value = _variants(normalizeValue(substring.value))
+        if isinstance(substring, pureldap.LDAPFilter_substrings_initial):
+            initial = value
+        elif isinstance(substring, pureldap.LDAPFilter_substrings_final):
+            final = value
+        else:
+            anys.append(value)
+
+    def matchSubstrings(entry):
+        values = entry.get(attributeType)
+        if values is None:
             return False
-        elif isinstance(filter, pureldap.LDAPFilter_substrings):
-            if filter.type not in self:
-                return False
-            possibleMatches = self[filter.type]
-            substrings = filter.substrings[:]
-
-            if substrings and isinstance(
-                filter.substrings[0], pureldap.LDAPFilter_substrings_initial
-            ):
-                possibleMatches = [
-                    x[len(filter.substrings[0].value) :]
-                    for x in possibleMatches
-                    if x.lower().startswith(filter.substrings[0].value.lower())
-                ]
-                del substrings[0]
-
-            if substrings and isinstance(
-                filter.substrings[-1], pureldap.LDAPFilter_substrings_final
-            ):
-                possibleMatches = [
-                    x[: -len(filter.substrings[0].value)]
-                    for x in possibleMatches
-                    if x.lower().endswith(filter.substrings[-1].value.lower())
-                ]
-                del substrings[-1]
-
-            while possibleMatches and substrings:
-                assert isinstance(substrings[0], pureldap.LDAPFilter_substrings_any)
-                r = []
-                for possible in possibleMatches:
-                    i = possible.lower().find(substrings[0].value.lower())
-                    if i >= 0:
-                        r.append(possible[i:])
-                possibleMatches = r
-                del substrings[0]
-            if possibleMatches and not substrings:
+        for value in _normalized(values):
+            kind = type(value)
+            start, end = 0, len(value)
+            if initial is not None:
+                prefix = initial.get(kind)
+                if prefix is None or not value.startswith(prefix):
+                    continue
+                start = len(prefix)
+            if final is not None:
+                suffix = final.get(kind)
+                if (
+                    suffix is None
+                    or not value.endswith(suffix)
+                    or end - len(suffix) < start
+                ):
+                    continue
+                end -= len(suffix)
+            # Each substring is found after the previous one.
+            for middle in anys:
+                substring = middle.get(kind)
+                if substring is None:
+                    break
+                i = value.find(substring, start, end)
+                if i < 0:
+                    break
+                start = i + len(substring)
+            else:
                 return True
+        return False
+
+    return matchSubstrings
+
+
+def _compileOrdering(filter, compare):
+    attributeType = filter.attributeDesc.value
+    assertion = filter.assertionValue.value
+    variants = _variants(assertion)
+    # The assertion, by ordering key function of the entries matched.
+    keyed = {}
+
+    def matchOrdering(entry):
+        values = entry.get(attributeType)
+        if values is None:
             return False
-        elif isinstance(filter, pureldap.LDAPFilter_greaterOrEqual):
-            if filter.attributeDesc.value not in self:
-                return False
-            for value in self[filter.attributeDesc.value]:
-                if value >= filter.assertionValue.value:
+        key = entry._orderingKey(attributeType)
+        if key is None:
+            for value in values:
+                if compare(value, variants.get(type(value), assertion)):
                     return True
             return False
-        elif isinstance(filter, pureldap.LDAPFilter_lessOrEqual):
-            if filter.attributeDesc.value not in self:
-                return False
-            for value in self[filter.attributeDesc.value]:
-                if value <= filter.assertionValue.value:
-                    return True
+        keyedAssertion = keyed.get(key)
+        if keyedAssertion is None:
+            try:
+                keyedAssertion = key(assertion)
+            except ValueError:
+                keyedAssertion = _invalid
+            keyed[key] = keyedAssertion
+        if keyedAssertion is _invalid:
             return False
-        elif isinstance(filter, pureldap.LDAPFilter_and):
-            for filt in filter:
-                if not self.match(filt):
+        for value in values:
+            try:
+                if compare(key(value), keyedAssertion):
+                    return True
+            except ValueError:
+                pass
+        return False
+
+    return matchOrdering
+
+
+def _compileExtensible(filter):
+    if filter.matchingRule is not None:
+        return _compileNotImplemented(filter)
+    attributeType = None if filter.type is None else filter.type.value
+    attributeTypes = () if attributeType is None else get_strings(attributeType)
+    wanted = normalizeValue(filter.matchValue.value)
+
+    def matchExtensible(entry):
+        values = entry.get(attributeType)
+        if values is not None and wanted in _normalized(values):
+            return True
+        for rdn in entry.dn.listOfRDNs:
+            for av in rdn.attributeTypesAndValues:
+                if attributeType is None or av.attributeType in attributeTypes:
+                    if normalizeValue(av.value) == wanted:
+                        return True
+        return False
+
+    return matchExtensible
+
+
+def _compileNotImplemented(filter):
+    def matchNotImplemented(entry):
+        raise ldapsyntax.MatchNotImplemented(filter)
+
+    return matchNotImplemented
+
+
+def _compile(filter):
+    if isinstance(filter, pureldap.LDAPFilter_present):
+        return _compilePresent(filter)
+    elif isinstance(filter, pureldap.LDAPFilter_equalityMatch):
+        return _compileEquality(filter)
+    elif isinstance(filter, pureldap.LDAPFilter_substrings):
+        return _compileSubstrings(filter)
+    elif isinstance(filter, pureldap.LDAPFilter_greaterOrEqual):
+        return _compileOrdering(filter, operator.ge)
+    elif isinstance(filter, pureldap.LDAPFilter_lessOrEqual):
+        return _compileOrdering(filter, operator.le)
+    elif isinstance(filter, pureldap.LDAPFilter_and):
+        terms = tuple(_compile(f) for f in filter)
+
+        def matchAnd(entry):
+            for term in terms:
+                if not term(entry):
                     return False
             return True
-        elif isinstance(filter, pureldap.LDAPFilter_or):
-            for filt in filter:
-                if self.match(filt):
+
+        return matchAnd
+    elif isinstance(filter, pureldap.LDAPFilter_or):
+        terms = tuple(_compile(f) for f in filter)
+
+        def matchOr(entry):
+            for term in terms:
+                if term(entry):
                     return True
             return False
-        elif isinstance(filter, pureldap.LDAPFilter_not):
-            return not self.match(filter.value)
-        elif isinstance(filter, pureldap.LDAPFilter_extensibleMatch):
-            if filter.matchingRule is None:
-                attrib = filter.type.value
-                match_value = filter.matchValue.value
-                match_value_lower = safelower(match_value)
-                if match_value_lower in [val.lower() for val in self.get(attrib, [])]:
-                    return True
-                for rdn in self.dn.listOfRDNs:
-                    for av in rdn.attributeTypesAndValues:
-                        if attrib is None or attrib == av.attributeType:
-                            if match_value_lower == safelower(av.value):
-                                return True
-                return False
+
+        return matchOr
+    elif isinstance(filter, pureldap.LDAPFilter_not):
+        term = _compile(filter.value)
+
+        def matchNot(entry):
+            return not term(entry)
+
+        return matchNot
+    elif isinstance(filter, pureldap.LDAPFilter_extensibleMatch):
+        return _compileExtensible(filter)
+    else:
+        return _compileNotImplemented(filter)
+
+
+# The number of compiled filters compileFilter() keeps.
+COMPILED_FILTERS = 1024
+
+_compiledFilters = collections.OrderedDict()
+_compiledFiltersLock = threading.Lock()
+
+
+def compileFilter(filterObject):
+    """
+    Compile a filter into a function of an entry returning whether the
+    entry matches the filter, as MatchMixin.match() does.
+
+    The filter is only interpreted once: the function calls nested
+    functions for the terms of the filter, with the assertion values
+    lowercased and converted to bytes and text ahead of time. The most
+    recently used COMPILED_FILTERS functions are kept, keyed by the BER
+    encoding of their filter, so that servers and proxies answering the
+    same filters again do not compile them again.
+
+    @param filterObject: An LDAPFilter.
+
+    @return: A function taking an entry providing IEntry, with the
+        _orderingKey() method of MatchMixin, and returning a bool. It
+        raises MatchNotImplemented for the terms of the filter that
+        cannot be evaluated, when it reaches them.
+    """
+    if not isinstance(filterObject, pureber.BERBase):
+        return _compile(filterObject)
+    key = filterObject.toWire()
+    with _compiledFiltersLock:
+        matcher = _compiledFilters.get(key)
+        if matcher is not None:
+            _compiledFilters.move_to_end(key)
+            return matcher
+    matcher = _compile(filterObject)
+    with _compiledFiltersLock:
+        _compiledFilters[key] = matcher
+        while len(_compiledFilters) > COMPILED_FILTERS:
+            _compiledFilters.popitem(last=False)
+    return matcher
+
+
+def iterateScope(base, scope):
+    """
+    Yield the entries in scope of base lazily, base before the entries
+    below it and each entry before its own children, for backends whose
+    entries return their children synchronously from _sync_children().
+
+    Only the children of the entries on the way down to the current one
+    are kept, so walking a subtree takes memory proportional to its
+    depth and width rather than its size.
+    """
+    if scope == pureldap.LDAP_SCOPE_baseObject:
+        yield base
+    elif scope == pureldap.LDAP_SCOPE_singleLevel:
+        yield from base._sync_children()
+    elif scope == pureldap.LDAP_SCOPE_wholeSubtree:
+        yield base
+        stack = [iter(base._sync_children())]
+        while stack:
+            for e in stack[-1]:
+                yield e
+                stack.append(iter(e._sync_children()))
+                break
             else:
-                raise ldapsyntax.MatchNotImplemented(filter)
+                stack.pop()
+    else:
+        raise ldaperrors.LDAPProtocolError("unknown search scope: %r" % scope)
+
+
+class MatchMixin:
+    def match(self, filter):
+        return compileFilter(filter)(self)
+
+    def _orderingKey(self, attributeType):
+        """
+        Return the function mapping the values of attributeType to keys
+        ordering them, as attributeindex.orderingKey() does, or None to
+        compare the values themselves.
+        """
+        return None
+
+
+# The relative cost of matching a filter against an entry, and the
+# fraction of entries it is guessed to match when that is not known.
+# Filters match() cannot evaluate cost the most, so that planFilter()
+# does not move them ahead of terms which would have decided the match.
+_filterCosts = {
+    pureldap.LDAPFilter_present: (1, 0.5),
+    pureldap.LDAPFilter_equalityMatch: (2, 0.1),
+    pureldap.LDAPFilter_greaterOrEqual: (3, 0.5),
+    pureldap.LDAPFilter_lessOrEqual: (3, 0.5),
+    pureldap.LDAPFilter_substrings: (4, 0.2),
+}
+
+_unknownFilterCost = (100, 0.5)
+
+
+def _andRank(term):
+    filter, cost, selectivity = term
+    if selectivity >= 1:
+        return float("inf")
+    return cost / (1 - selectivity)
+
+
+def _orRank(term):
+    filter, cost, selectivity = term
+    if selectivity <= 0:
+        return float("inf")
+    return cost / selectivity
+
+
+def _planTerms(filterObject, selectivity):
+    terms = []
+    for f in filterObject:
+        if f.__class__ is filterObject.__class__:
+            # (&(a)(&(b)(c))) is (&(a)(b)(c)), and the same for OR.
+            terms.extend(_planTerms(f, selectivity))
+        else:
+            terms.append(_plan(f, selectivity))
+    return terms
+
+
+def _plan(filterObject, selectivity):
+    """
+    Plan filterObject as planFilter() does, and return the plan, its
+    expected cost and the fraction of entries it is expected to match.
+    """
+    if isinstance(filterObject, (pureldap.LDAPFilter_and, pureldap.LDAPFilter_or)):
+        isAnd = isinstance(filterObject, pureldap.LDAPFilter_and)
+        terms = _planTerms(filterObject, selectivity)
+        terms.sort(key=_andRank if isAnd else _orRank)
+        # The cost of the terms evaluated until one decides the match.
+        cost = 0
+        reached = 1
+        for f, c, s in terms:
+            cost += reached * c
+            reached *= s if isAnd else 1 - s
+        plan = [f for f, c, s in terms]
+        original = list(filterObject)
+        if len(plan) != len(original) or any(
+            a is not b for a, b in zip(plan, original)
+        ):
+            filterObject = filterObject.__class__(plan, tag=filterObject.tag)
+        return filterObject, cost, reached if isAnd else 1 - reached
+    elif isinstance(filterObject, pureldap.LDAPFilter_not):
+        plan, cost, s = _plan(filterObject.value, selectivity)
+        if plan is not filterObject.value:
+            filterObject = pureldap.LDAPFilter_not(plan, tag=filterObject.tag)
+        return filterObject, cost, 1 - s
+
+    cost, s = _filterCosts.get(filterObject.__class__, _unknownFilterCost)
+    if selectivity is not None:
+        known = selectivity(filterObject)
+        if known is not None:
+            s = known
+    if isinstance(filterObject, pureldap.LDAPFilter_equalityMatch):
+        # match() ignores the case of the assertion value.
+        value = filterObject.assertionValue.value
+        lowered = value.lower()
+        if lowered != value:
+            filterObject = pureldap.LDAPFilter_equalityMatch(
+                attributeDesc=filterObject.attributeDesc,
+                assertionValue=pureldap.LDAPAssertionValue(lowered),
+                tag=filterObject.tag,
+            )
+    return filterObject, cost, s
+
+
+def planFilter(filterObject, selectivity=None):
+    """
+    Return a filter matching the same entries as filterObject, arranged
+    to be matched cheaply against many entries.
+
+    Nested AND and OR filters are flattened. The terms of an AND filter
+    are ordered to reject an entry at the least expected cost, cheap and
+    selective terms such as presence and equality first, and those of
+    an OR filter to accept it at the least expected cost. The assertion
+    values of equality filters are lowercased once.
+
+    @param selectivity: A function returning the fraction of entries
+        that a filter other than AND, OR and NOT matches, e.g. from index
+        statistics, or None if it does not know. Fixed guesses by type of
+        filter are used otherwise.
+
+    @return: filterObject itself if planning does not change it.
+    """
+    return _plan(filterObject, selectivity)[0]
+
+
+# The number of entries search() matches between the points at which a
+# cooperator may switch to its other tasks.
+COOPERATE_ENTRIES = 100
+
+
+def _cooperate(entries, callback):
+    """
+    Call callback with each of entries, for a cooperator: yield every
+    COOPERATE_ENTRIES entries, and the Deferreds callback returns.
+    """
+    count = 0
+    for entry in entries:
+        result = callback(entry)
+        if isinstance(result, defer.Deferred):
+            count = 0
+            yield result
         else:
-            raise ldapsyntax.MatchNotImplemented(filter)
+            count += 1
+            if count >= COOPERATE_ENTRIES:
+                count = 0
+                yield None
+
+
+def _matching(entries, match, unmatched=False):
+    """
+    Yield the entries that match, and None for the others if unmatched
+    is true.
+    """
+    for entry in entries:
+        if match(entry):
+            yield entry
+        elif unmatched:
+            yield None
+
+
+def _searchFilter(filterText, filterObject):
+    """
+    Return the filter of a search given filterText, filterObject, both
+    or neither.
+    """
+    if filterObject is None and filterText is None:
+        return pureldap.LDAPFilterMatchAll
+    elif filterObject is None:
+        return ldapfilter.parseFilter(filterText)
+    elif filterText is None:
+        return filterObject
+    else:
+        f = ldapfilter.parseFilter(filterText)
+        return pureldap.LDAPFilter_and((f, filterObject))
+
+
+def _matcher(plan):
+    """
+    Return a function telling whether an entry matches the planned
+    filter, compiled unless the class of the entry overrides match().
+    """
+    matches = compileFilter(plan)
+
+    def _match(entry):
+        if entry.__class__.match is MatchMixin.match:
+            return matches(entry)
+        return entry.match(plan)
+
+    return _match
+
+
+class _Descending:
+    """
+    A key ordered in reverse.
+    """
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def _sortKeyFunctions(sortKeys):
+    """
+    Return sortKeys with the key function of each ordering rule in
+    place of the rule, or None where there is no rule.
+    """
+    keys = []
+    for attributeType, orderingRule, reverseOrder in sortKeys:
+        key = None
+        if orderingRule is not None:
+            key = attributeindex.orderingRuleKey(orderingRule)
+            if key is None:
+                raise ldaperrors.LDAPInappropriateMatching(
+                    "unknown ordering rule: %r" % orderingRule
+                )
+        keys.append((attributeType, key, reverseOrder))
+    return keys
+
+
+def sortKey(sortKeys):
+    """
+    Return a function mapping an entry to a key that orders it as the
+    server side sorting control of RFC 2891 does.
+
+    An entry is ordered by its least value of each attribute, or by its
+    greatest one in reverse order. Entries without a value of an
+    attribute, or with none valid in its ordering, order after the
+    others, or before them in reverse order.
+
+    @param sortKeys: A sequence of (attributeType, orderingRule,
+        reverseOrder) tuples. orderingRule is the OID or name of an
+        ordering matching rule, or None to order the values as the
+        _orderingKey() of the entry does, or else as text ignoring case.
+
+    @raise ldaperrors.LDAPInappropriateMatching: If an ordering rule is
+        not known.
+    """
+    keys = _sortKeyFunctions(sortKeys)
+
+    def _key(entry):
+        return tuple(
+            _sortComponent(
+                entry.get(attributeType, ()),
+                key or _entryOrderingKey(entry, attributeType),
+                reverseOrder,
+            )
+            for attributeType, key, reverseOrder in keys
+        )
+
+    return _key
+
+
+def _entryOrderingKey(entry, attributeType):
+    key = getattr(entry, "_orderingKey", lambda _: None)(attributeType)
+    if key is None:
+        key = attributeindex.caseIgnoreKey
+    return key
+
+
+def _sortComponent(values, key, reverseOrder):
+    """
+    Return the part of the key of sortKey() for the values of one sort
+    key.
+    """
+    found = []
+    for value in values:
+        try:
+            found.append(key(value))
+        except ValueError:
+            pass
+    if not found:
+        component = (1,)
+    elif reverseOrder:
+        component = (0, max(found))
+    else:
+        component = (0, min(found))
+    return _Descending(component) if reverseOrder else component
+
+
+def sortEntries(entries, sortKeys, limit=0):
+    """
+    Return an iterator over entries in the order of sortKeys, as
+    sortKey() orders them.
+
+    With a limit, only the first limit entries are kept while reading
+    entries, in a heap. Otherwise the entries are put in a heap, which
+    the iterator takes them from in order, so that the first ones are
+    found without sorting all of them.
+    """
+    key = sortKey(sortKeys)
+    # The count keeps entries from being compared, and the order stable.
+    decorated = ((key(e), i, e) for i, e in enumerate(entries))
+    if limit:
+        return iter([e for _, _, e in heapq.nsmallest(limit, decorated)])
+    heap = list(decorated)
+    heapq.heapify(heap)
+    return _popAll(heap)
+
+
+def _popAll(heap):
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+class ListView:
+    """
+    The entries matching a search in the order of its sort keys, from
+    which the virtual list view control takes a window at a time.
+
+    Positioning by offset takes constant time, and by the value of the
+    first sort key a binary search of the keys of the entries, which are
+    found on first use. The entries are a snapshot: changes to the tree
+    after the view is made are not seen.
+
+    @ivar entries: The entries, as a list.
+    """
+
+    def __init__(self, entries, sortKeys, base=None):
+        """
+        @param entries: The entries, in the order of sortKeys as sortKey()
+            orders them.
+
+        @param base: The entry searched, whose _orderingKey() orders the
+            assertion values of find() where the first sort key has no
+            ordering rule.
+        """
+        self.entries = list(entries)
+        self.sortKeys = sortKeys
+        self._base = base
+        self._keys = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def offset(self, offset, contentCount=0):
+        """
+        Return the position, counted from 1, of the entry at offset in a
+        list that the client estimates has contentCount entries, or 0 if
+        it has no estimate. Offsets are scaled to the actual number of
+        entries, so that the first and last offsets are those of the
+        first and last entries. Positions past the last entry are one
+        more than the number of entries.
+
+        @raise ldaperrors.LDAPOffsetRangeError: If offset is less than 1.
+        """
+        if offset < 1 or contentCount < 0:
+            raise ldaperrors.LDAPOffsetRangeError(
+                "offset %d of %d" % (offset, contentCount)
+            )
+        count = len(self.entries)
+        if contentCount and contentCount != count:
+            if offset >= contentCount:
+                return max(count, 1)
+            return (offset - 1) * max(count - 1, 0) // (contentCount - 1) + 1
+        return min(offset, count + 1)
+
+    def find(self, value):
+        """
+        Return the position, counted from 1, of the first entry whose
+        value of the first sort key is value or follows it in the order
+        of the view, or one more than the number of entries if none does.
+        """
+        if self._keys is None:
+            key = sortKey(self.sortKeys)
+            self._keys = [key(e) for e in self.entries]
+        attributeType, key, reverseOrder = _sortKeyFunctions(self.sortKeys)[0]
+        if key is None:
+            key = _entryOrderingKey(self._base, attributeType)
+        target = (_sortComponent([value], key, reverseOrder),)
+        return bisect.bisect_left(self._keys, target) + 1
+
+    def window(self, position, beforeCount, afterCount):
+        """
+        Return the entries from beforeCount entries before position to
+        afterCount entries after it.
+        """
+        start = max(position - 1 - beforeCount, 0)
+        return self.entries[start : max(position + afterCount, 0)]
+
+
+# The clock search() measures its timeLimit with.
+_seconds = time.monotonic
 
 
 class SearchByTreeWalkingMixin:
+    def _searchCandidates(self, filterObject, scope):
+        """
+        Return a list of the entries in scope that may match
+        filterObject, or None to walk the whole scope. Backends with
+        indexes override this.
+        """
+        return None
+
+    def _iterateScope(self, scope):
+        """
+        Return an iterator over the entries in scope, e.g. from
+        iterateScope() for backends whose children are available
+        synchronously, or None to walk them with children() and subtree().
+        """
+        return None
+
+    def _iterateSorted(self, sortKeys, scope):
+        """
+        Return an iterator over the entries in scope in the order of
+        sortKeys, as sortKey() orders them, or None to sort the matching
+        entries instead. Backends with ordered indexes override this.
+        """
+        return None
+
+    def _filterSelectivity(self, filterObject):
+        """
+        Return the fraction of the entries in this tree that
+        filterObject matches, or None if it is not known, for
+        planFilter(). Backends with indexes override this.
+        """
+        return None
+
+    def searchEntries(
+        self,
+        filterText=None,
+        filterObject=None,
+        scope=None,
+        derefAliases=None,
+        sortKeys=None,
+        limit=0,
+        unmatched=False,
+    ):
+        """
+        Return an iterator over the entries in scope that match the
+        filter, which walks the scope only as far as it is consumed, or
+        None if this backend cannot walk its scope synchronously.
+
+        The arguments are those of search(). The iterator can be kept to
+        resume the search later, as LDAPServer does between the pages of
+        a paged search.
+
+        @param sortKeys: If not None, the sort keys of sortKey() to
+            return the entries in the order of. Entries are then taken
+            in order from an ordered index of the first sort key where
+            the backend has one, unless other indexes find fewer
+            candidates than it would walk, and sorted by sortEntries()
+            otherwise.
+
+        @param limit: If not 0, at most how many entries will be taken
+            from the iterator, which lets sorting keep only that many.
+
+        @param unmatched: If true, the iterator also yields None for each
+            entry walked that does not match, so that a caller taking a
+            slice of the entries at a time can bound the work of each
+            slice. Entries that are sorted are all matched at once.
+        """
+        filterObject = _searchFilter(filterText, filterObject)
+        if scope is None:
+            scope = pureldap.LDAP_SCOPE_wholeSubtree
+        if scope not in (
+            pureldap.LDAP_SCOPE_baseObject,
+            pureldap.LDAP_SCOPE_singleLevel,
+            pureldap.LDAP_SCOPE_wholeSubtree,
+        ):
+            raise ldaperrors.LDAPProtocolError("unknown search scope: %r" % scope)
+
+        if sortKeys:
+            # Refuse unknown ordering rules before walking anything.
+            sortKey(sortKeys)
+
+        plan, cost, selectivity = _plan(filterObject, self._filterSelectivity)
+        match = _matcher(plan)
+        candidates = self._searchCandidates(filterObject, scope)
+        # Taking limit entries in order walks about limit / selectivity
+        # of them, which beats sorting the candidates if there are more.
+        if sortKeys and (
+            candidates is None or limit and limit < selectivity * len(candidates)
+        ):
+            ordered = self._iterateSorted(sortKeys, scope)
+            if ordered is not None:
+                return _matching(ordered, match, unmatched)
+        if candidates is None:
+            candidates = self._iterateScope(scope)
+        if candidates is None:
+            return None
+        if sortKeys:
+            return sortEntries(_matching(candidates, match), sortKeys, limit)
+        return _matching(candidates, match, unmatched)
+
     def search(
         self,
         filterText=None,
@@ -256,16 +936,24 @@ class SearchByTreeWalkingMixin:
         timeLimit=0,
         typesOnly=0,
         callback=None,
+        cooperator=None,
     ):
-        if filterObject is None and filterText is None:
-            filterObject = pureldap.LDAPFilterMatchAll
-        elif filterObject is None and filterText is not None:
-            filterObject = ldapfilter.parseFilter(filterText)
-        elif filterObject is not None and filterText is None:
-            pass
-        elif filterObject is not None and filterText is not None:
-            f = ldapfilter.parseFilter(filterText)
-            filterObject = pureldap.LDAPFilter_and((f, filterObject))
+        """
+        Search as IConnectedLDAPEntry.search() does.
+
+        @param cooperator: A twisted.internet.task.Cooperator, to match
+            the entries in scope as one of its tasks, a slice at a time,
+            instead of all at once, if this backend can walk its scope
+            synchronously. callback may then return a Deferred to pause
+            the search until it fires.
+
+        The walk stops when an entry matches after sizeLimit entries
+        have, or when timeLimit seconds have passed, and the Deferred
+        then fails with LDAPSizeLimitExceeded or LDAPTimeLimitExceeded.
+        The entries matched until then have been given to callback, or
+        are the results attribute of the exception if callback is None.
+        """
+        filterObject = _searchFilter(filterText, filterObject)
 
         if scope is None:
             scope = pureldap.LDAP_SCOPE_wholeSubtree
@@ -287,20 +975,57 @@ class SearchByTreeWalkingMixin:
         else:
             raise ldaperrors.LDAPProtocolError("unknown search scope: %r" % scope)
 
+        candidates = self._searchCandidates(filterObject, scope)
+        if candidates is None:
+            candidates = self._iterateScope(scope)
+        if candidates is not None:
+
+            def iterateCandidates(callback):
+                for entry in candidates:
+                    callback(entry)
+                return defer.succeed(None)
+
+            iterator = iterateCandidates
+
+        match = _matcher(planFilter(filterObject, self._filterSelectivity))
+
         results = []
         if callback is None:
             matchCallback = results.append
         else:
             matchCallback = callback
 
+        deadline = None
+        if timeLimit:
+            deadline = _seconds() + timeLimit
+        found = 0
+
         # gather results, send them
         def _tryMatch(entry):
-            if entry.match(filterObject):
-                matchCallback(entry)
+            nonlocal found
+            if deadline is not None and _seconds() >= deadline:
+                raise ldaperrors.LDAPTimeLimitExceeded()
+            if match(entry):
+                if sizeLimit and found >= sizeLimit:
+                    raise ldaperrors.LDAPSizeLimitExceeded()
+                found += 1
+                return matchCallback(entry)
 
-        iterator(callback=_tryMatch)
+        if candidates is not None and cooperator is not None:
+            d = cooperator.cooperate(_cooperate(candidates, _tryMatch)).whenDone()
+        else:
+            d = defer.maybeDeferred(iterator, callback=_tryMatch)
 
         if callback is None:
-            return defer.succeed(results)
+
+            def _partial(reason):
+                reason.trap(
+                    ldaperrors.LDAPSizeLimitExceeded, ldaperrors.LDAPTimeLimitExceeded
+                )
+                reason.value.results = results
+                return reason
+
+            d.addCallbacks(lambda _: results, _partial)
         else:
-            return defer.succeed(None)
+            d.addCallback(lambda _: None)
+        return d
@@ -2,7 +2,8 @@ from twisted.internet import defer, error
 from twisted.python.failure import Failure
 from zope.interface import implementer
 
-from ldaptor import interfaces, entry, entryhelpers
+from ldaptor import attributeindex, interfaces, entry, entryhelpers
+from ldaptor.protocols import pureldap
 from ldaptor.protocols.ldap import distinguishedname, ldaperrors, ldifprotocol
 
 
@@ -10,6 +11,14 @@ class LDAPCannotRemoveRootError(ldaperrors.LDAPNamingViolation):
     """Cannot remove root of LDAP tree"""
 
 
+def _rdnKey(rdn):
+    """
+    Return the key of a child entry by its RDN, ignoring case as comparing
+    RDNs does.
+    """
+    return tuple((ava.attributeType.lower(), ava.value.lower()) for ava in rdn.split())
+
+
 @implementer(interfaces.IConnectedLDAPEntry)
 class ReadOnlyInMemoryLDAPEntry(
     entry.EditableLDAPEntry,
@@ -22,6 +31,193 @@ class ReadOnlyInMemoryLDAPEntry(
         entry.BaseLDAPEntry.__init__(self, *a, **kw)
         self._parent = None
         self._children = {}
+        # Shared by all the entries of a tree.
+        self._indexes = {}
+        self._syntaxes = {}
+
+    def buildAttributeSet(self, key, values):
+        attributes = super().buildAttributeSet(key, values)
+        attributes.onChange = self._attributeChanged
+        return attributes
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._reindex(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._reindex(key)
+
+    def _attributeChanged(self, attributes):
+        self._reindex(attributes.key)
+
+    def _orderingKey(self, attributeType):
+        syntax = self._syntaxes.get(attributeindex.normalizeType(attributeType))
+        if syntax is None:
+            return None
+        return attributeindex.orderingKey(syntax)
+
+    def _reindex(self, key):
+        index = self._indexes.get(attributeindex.normalizeType(key))
+        if index is not None:
+            index.remove(self)
+            index.add(self)
+
+    def _walk(self):
+        """
+        Yield this entry and all the entries below it.
+        """
+        return entryhelpers.iterateScope(self, pureldap.LDAP_SCOPE_wholeSubtree)
+
+    def setSyntax(self, attributeType, syntax):
+        """
+        Set the syntax of an attribute type in the whole tree of this
+        entry.
+
+        The greaterOrEqual and lessOrEqual filters, and the server side
+        sorting control without an ordering rule, then compare values of
+        the attribute as the syntax orders them, see
+        attributeindex.orderingKey(), whether or not the attribute has
+        an ordering index. Without a syntax they compare the values
+        themselves.
+
+        @param attributeType: The attribute type, e.g. "uidNumber".
+
+        @param syntax: The OID of the syntax, as found in schema, e.g.
+            attributeindex.INTEGER.
+        """
+        attributeType = attributeindex.normalizeType(attributeType)
+        self._syntaxes[attributeType] = syntax
+        index = self._indexes.get(attributeType)
+        if index is not None and index.ordering is not None:
+            self.addIndex(
+                index.attributeType,
+                equality=index.equality,
+                substring=index.substring,
+                ordering=True,
+            )
+
+    def addIndex(self, attributeType, equality=True, substring=False, ordering=False):
+        """
+        Index an attribute type in the whole tree of this entry.
+
+        Searches use the indexes to find the entries that may match
+        presence, equality and substring filters, and AND and OR filters
+        built from them, instead of matching every entry in scope. The
+        indexes are kept up to date as entries are added, deleted, moved
+        or edited. Indexes do not change which entries match.
+
+        @param attributeType: The attribute type to index, e.g. "uid".
+
+        @param equality: If false, only index which entries have the
+            attribute, for presence filters.
+
+        @param substring: If true, also index the values for substring
+            filters, e.g. "(cn=*smi*)" or "(mail=jo*)". Substrings in the
+            middle of a value need to be at least 3 characters long to be
+            looked up.
+
+        @param ordering: If true, also index the values in the order of
+            the syntax of the attribute, for greaterOrEqual and
+            lessOrEqual filters and sorting.
+
+        @raise ValueError: If ordering is true and the attribute has no
+            syntax set with setSyntax().
+        """
+        syntax = None
+        if ordering:
+            syntax = self._syntaxes.get(attributeindex.normalizeType(attributeType))
+            if syntax is None:
+                raise ValueError("no syntax set for %r" % (attributeType,))
+        index = attributeindex.AttributeIndex(
+            attributeType, equality=equality, substring=substring, ordering=syntax
+        )
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        for e in root._walk():
+            index.add(e)
+        self._indexes[attributeindex.normalizeType(attributeType)] = index
+
+    def _searchCandidates(self, filterObject, scope):
+        if not self._indexes or scope == pureldap.LDAP_SCOPE_baseObject:
+            return None
+        found = attributeindex.candidates(self._indexes, filterObject)
+        if found is None:
+            return None
+        return [e for e in found.values() if self._inScope(e, scope)]
+
+    def _inScope(self, e, scope):
+        """
+        Return whether e is in a singleLevel or wholeSubtree scope of
+        this entry.
+        """
+        if scope == pureldap.LDAP_SCOPE_singleLevel:
+            return e._parent is self
+        while e is not None:
+            if e is self:
+                return True
+            e = e._parent
+        return False
+
+    def _iterateSorted(self, sortKeys, scope):
+        if not self._indexes or scope == pureldap.LDAP_SCOPE_baseObject:
+            return None
+        attributeType, orderingRule, reverseOrder = sortKeys[0]
+        index = self._indexes.get(attributeindex.normalizeType(attributeType))
+        if index is None or index.orderingKey is None:
+            return None
+        if (
+            orderingRule is not None
+            and attributeindex.orderingRuleKey(orderingRule) is not index.orderingKey
+        ):
+            return None
+        return self._sorted(index, sortKeys, scope)
+
+    def _sorted(self, index, sortKeys, scope):
+        """
+        Yield the entries in scope in the order of the ordered index of
+        the first sort key, ordering entries with the same value by the
+        other sort keys.
+        """
+        key = entryhelpers.sortKey(sortKeys)
+        reverseOrder = sortKeys[0][2]
+
+        def missing():
+            # Entries without a value in the index order after the others.
+            return sorted(
+                (e for e in self._iterateScope(scope) if not index.hasOrderedValue(e)),
+                key=key,
+            )
+
+        if reverseOrder:
+            yield from missing()
+        for group in index.ordered(reverseOrder):
+            group = [e for e in group if self._inScope(e, scope)]
+            if len(group) > 1 and len(sortKeys) > 1:
+                group.sort(key=key)
+            yield from group
+        if not reverseOrder:
+            yield from missing()
+
+    def _sync_children(self):
+        # A copy, as the children may change while a search walks them.
+        return list(self._children.values())
+
+    def _iterateScope(self, scope):
+        return entryhelpers.iterateScope(self, scope)
+
+    def subtree(self, callback=None):
+        if callback is None:
+            return defer.succeed(list(self._walk()))
+        for e in self._walk():
+            callback(e)
+        return defer.succeed(None)
+
+    def _filterSelectivity(self, filterObject):
+        if not self._indexes:
+            return None
+        return attributeindex.selectivity(self._indexes, filterObject)
 
     def parent(self):
         return self._parent
@@ -37,14 +233,14 @@ class ReadOnlyInMemoryLDAPEntry(
     def _lookup(self, dn):
         if not self.dn.contains(dn):
             raise ldaperrors.LDAPNoSuchObject(dn.getText())
-        if dn == self.dn:
-            return defer.succeed(self)
-
-        for c in self._children.values():
-            if c.dn.contains(dn):
-                return c.lookup(dn)
-
-        raise ldaperrors.LDAPNoSuchObject(dn.getText())
+        rdns = dn.split()
+        e = self
+        # Descend by the RDNs of dn below this entry, from the top.
+        for i in range(len(rdns) - len(self.dn.split()) - 1, -1, -1):
+            e = e._children.get(_rdnKey(rdns[i]))
+            if e is None:
+                raise ldaperrors.LDAPNoSuchObject(dn.getText())
+        return e
 
     def lookup(self, dn):
         if not isinstance(dn, distinguishedname.DistinguishedName):
@@ -57,15 +253,17 @@ class ReadOnlyInMemoryLDAPEntry(
     def addChild(self, rdn, attributes):
         """TODO ugly API. Returns the created entry."""
         rdn = distinguishedname.RelativeDistinguishedName(rdn)
-        rdn_str = rdn.getText()
-        if rdn_str in self._children:
-            raise ldaperrors.LDAPEntryAlreadyExists(
-                self._children[rdn_str].dn.getText()
-            )
+        key = _rdnKey(rdn)
+        if key in self._children:
+            raise ldaperrors.LDAPEntryAlreadyExists(self._children[key].dn.getText())
         dn = distinguishedname.DistinguishedName(listOfRDNs=(rdn,) + self.dn.split())
         e = self.__class__(dn, attributes)
         e._parent = self
-        self._children[rdn_str] = e
+        e._indexes = self._indexes
+        e._syntaxes = self._syntaxes
+        self._children[key] = e
+        for index in self._indexes.values():
+            index.add(e)
         return e
 
     def _delete(self):
@@ -81,11 +279,19 @@ class ReadOnlyInMemoryLDAPEntry(
     def _deleteChild(self, rdn):
         if not isinstance(rdn, distinguishedname.RelativeDistinguishedName):
             rdn = distinguishedname.RelativeDistinguishedName(stringValue=rdn)
-        rdn_str = rdn.getText()
         try:
-            return self._children.pop(rdn_str)
+            child = self._children.pop(_rdnKey(rdn))
         except KeyError:
             raise ldaperrors.LDAPNoSuchObject(rdn.getText())
+        if self._indexes or self._syntaxes:
+            # The entries removed keep the syntaxes of the tree.
+            syntaxes = dict(self._syntaxes)
+            for e in child._walk():
+                for index in self._indexes.values():
+                    index.remove(e)
+                e._indexes = {}
+                e._syntaxes = syntaxes
+        return child
 
     def deleteChild(self, rdn):
         return defer.maybeDeferred(self._deleteChild, rdn)
@@ -105,9 +311,16 @@ class ReadOnlyInMemoryLDAPEntry(
         return d
 
     def _move2(self, newParent, newDN):
-        if newParent is not None:
-            newParent._children[newDN.split()[0].getText()] = self
-            del self._parent._children[self.dn.split()[0].getText()]
+        if self._parent is not None:
+            if newParent is None:
+                newParent = self._parent
+            key = _rdnKey(newDN.split()[0])
+            existing = newParent._children.get(key)
+            if existing is not None and existing is not self:
+                raise ldaperrors.LDAPEntryAlreadyExists(existing.dn.getText())
+            del self._parent._children[_rdnKey(self.dn.split()[0])]
+            newParent._children[key] = self
+            self._parent = newParent
         # remove old RDN attributes
         for attr in self.dn.split()[0].split():
             self[attr.attributeType].remove(attr.value)
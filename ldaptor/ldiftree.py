@@ -211,6 +211,9 @@ class LDIFTreeEntry(
     def children(self, callback=None):
         return defer.maybeDeferred(self._children, callback=callback)
 
+    def _iterateScope(self, scope):
+        return entryhelpers.iterateScope(self, scope)
+
     def lookup(self, dn):
         dn = distinguishedname.DistinguishedName(dn)
         if not self.dn.contains(dn):
@@ -37,7 +37,9 @@ class LDAPClient(protocol.Protocol):
 
     def __init__(self):
         self.onwire = {}
-        self.buffer = b""
+        # Ids of the requests whose responses are not decoded.
+        self.rawResponses = set()
+        self.framer = pureber.BERFramer()
         self.connected = None
 
     berdecoder = pureldap.LDAPBERDecoderContext_TopLevel(
@@ -52,16 +54,16 @@ class LDAPClient(protocol.Protocol):
     )
 
     def dataReceived(self, recd):
-        self.buffer += recd
-        while 1:
-            try:
-                o, bytes = pureber.berDecodeObject(self.berdecoder, self.buffer)
-            except pureber.BERExceptionInsufficientData:
-                o, bytes = None, 0
-            self.buffer = self.buffer[bytes:]
-            if not o:
-                break
-            self.handle(o)
+        self.framer.feed(recd)
+        for pdu in self.framer:
+            if self.rawResponses:
+                envelope = pureldap.LDAPMessageEnvelope(pdu)
+                if envelope.id in self.rawResponses:
+                    self.handleRaw(envelope)
+                    continue
+            o, _ = pureber.berDecodeObject(self.berdecoder, memoryview(pdu))
+            if o is not None:
+                self.handle(o)
 
     def connectionMade(self):
         """TCP connection has opened"""
@@ -70,6 +72,7 @@ class LDAPClient(protocol.Protocol):
     def connectionLost(self, reason=protocol.connectionDone):
         """Called when TCP connection has been lost"""
         self.connected = 0
+        self.rawResponses.clear()
         # notify handlers of operations in flight
         while self.onwire:
             k, v = self.onwire.popitem()
@@ -165,6 +168,33 @@ class LDAPClient(protocol.Protocol):
         self.transport.write(msg.toWire())
         return d
 
+    def send_multiResponse_raw(self, op, handler, *args, **kwargs):
+        """
+        Send an LDAP operation to the server, expecting one or more
+        responses which are passed on without being decoded.
+
+        `handler` will receive each response as a
+        L{pureldap.LDAPMessageEnvelope} as its first argument. The
+        Deferred returned by this function will never fire.
+
+        @param op: the operation to send
+        @type op: LDAPProtocolRequest
+        @param handler: a callable that will be called for each
+        response. It should return a boolean, whether this was the
+        final response.
+        @param args: positional arguments to pass to handler
+        @param kwargs: keyword arguments to pass to handler
+        @return: a deferred that errbacks if the connection is lost
+        @rtype: Deferred
+        """
+        msg = self._send(op)
+        assert op.needs_answer
+        d = defer.Deferred()
+        self.onwire[msg.id] = (d, False, handler, args, kwargs)
+        self.rawResponses.add(msg.id)
+        self.transport.write(msg.toWire())
+        return d
+
     def send_noResponse(self, op, controls=None):
         """
         Send an LDAP operation to the server, with no response
@@ -209,6 +239,16 @@ class LDAPClient(protocol.Protocol):
                     if handler(msg.value, *args, **kwargs):
                         del self.onwire[msg.id]
 
+    def handleRaw(self, envelope):
+        if self.debug:
+            log.msg("C<-S %s" % repr(envelope))
+
+        d, return_controls, handler, args, kwargs = self.onwire[envelope.id]
+        # Return true to mark request as fully handled
+        if handler(envelope, *args, **kwargs):
+            del self.onwire[envelope.id]
+            self.rawResponses.discard(envelope.id)
+
     def bind(self, dn="", auth=""):
         """
         @depreciated: Use e.bind(auth).
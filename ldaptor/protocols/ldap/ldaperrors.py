@@ -240,7 +240,20 @@ class LDAPLoopDetect(LDAPException):
     name = b"loopDetect"
 
 
-# 55-63 unused
+# 55-59 unused
+
+
+class LDAPSortControlMissing(LDAPException):
+    resultCode = 60
+    name = b"sortControlMissing"
+
+
+class LDAPOffsetRangeError(LDAPException):
+    resultCode = 61
+    name = b"offsetRangeError"
+
+
+# 62-63 unused
 
 
 class LDAPNamingViolation(LDAPException):
@@ -1,10 +1,15 @@
 """LDAP protocol server"""
 
-from ldaptor import interfaces, delta
+import collections
+import time
+
+from ldaptor import interfaces, delta, entryhelpers
 from ldaptor.protocols import pureldap, pureber
 from ldaptor.protocols.ldap import distinguishedname, ldaperrors
-from twisted.python import log
-from twisted.internet import protocol, defer
+from ldaptor._encoder import to_bytes
+from twisted.python import failure, log
+from twisted.internet import interfaces as iinternet, protocol, defer, threads
+from zope.interface import implementer
 
 
 class LDAPServerConnectionLostException(ldaperrors.LDAPException):
@@ -15,7 +20,7 @@ class BaseLDAPServer(protocol.Protocol):
     debug = False
 
     def __init__(self):
-        self.buffer = b""
+        self.framer = pureber.BERFramer()
         self.connected = None
 
     berdecoder = pureldap.LDAPBERDecoderContext_TopLevel(
@@ -30,16 +35,11 @@ class BaseLDAPServer(protocol.Protocol):
     )
 
     def dataReceived(self, recd):
-        self.buffer += recd
-        while 1:
-            try:
-                o, bytes = pureber.berDecodeObject(self.berdecoder, self.buffer)
-            except pureber.BERExceptionInsufficientData:
-                o, bytes = None, 0
-            self.buffer = self.buffer[bytes:]
-            if o is None:
-                break
-            self.handle(o)
+        self.framer.feed(recd)
+        for pdu in self.framer:
+            o, _ = pureber.berDecodeObject(self.berdecoder, memoryview(pdu))
+            if o is not None:
+                self.handle(o)
 
     def connectionMade(self):
         """TCP connection has opened"""
@@ -49,13 +49,21 @@ class BaseLDAPServer(protocol.Protocol):
         """Called when TCP connection has been lost"""
         self.connected = 0
 
-    def queue(self, id, op):
+    def queue(self, id, op, controls=None):
         if not self.connected:
             raise LDAPServerConnectionLostException()
-        msg = pureldap.LDAPMessage(op, id=id)
+        if isinstance(op, pureldap.LDAPMessageEnvelope):
+            # A response passed on by a proxy; only its id is replaced.
+            if self.debug:
+                log.msg("S->C %s" % repr(op), debug=True)
+            self.transport.write(op.withId(id))
+            return
+        msg = pureldap.LDAPMessage(op, controls=controls, id=id)
         if self.debug:
             log.msg("S->C %s" % repr(msg), debug=True)
-        self.transport.write(msg.toWire())
+        out = []
+        msg.encodeInto(out)
+        self.transport.write(b"".join(out))
 
     def unsolicitedNotification(self, msg):
         log.msg("Got unsolicited notification: %s" % repr(msg))
@@ -85,9 +93,13 @@ class BaseLDAPServer(protocol.Protocol):
             errorMessage=reason.value.message,
         )
 
-    def _cbHandle(self, response, id):
+    def _cbHandle(self, response, id, controls=None):
         if response is not None:
-            self.queue(id, response)
+            if controls is None:
+                # Subclasses may override queue() without controls.
+                self.queue(id, response)
+            else:
+                self.queue(id, response, controls)
 
     def failDefault(self, resultCode, errorMessage):
         return pureldap.LDAPExtendedResponse(
@@ -121,7 +133,9 @@ class BaseLDAPServer(protocol.Protocol):
                 handler,
                 msg.value,
                 msg.controls,
-                lambda response: self._cbHandle(response, msg.id),
+                lambda response, controls=None: self._cbHandle(
+                    response, msg.id, controls
+                ),
             )
             d.addErrback(self._cbLDAPError, name)
             d.addErrback(defer.logError)
@@ -129,11 +143,382 @@ class BaseLDAPServer(protocol.Protocol):
             d.addCallback(self._cbHandle, msg.id)
 
 
+# The OID of the paged results control of RFC 2696.
+PAGED_RESULTS_OID = b"1.2.840.113556.1.4.319"
+
+# The OIDs of the server side sorting request and response controls of
+# RFC 2891.
+SORT_REQUEST_OID = b"1.2.840.113556.1.4.473"
+SORT_RESPONSE_OID = b"1.2.840.113556.1.4.474"
+
+# The OIDs of the virtual list view request and response controls of
+# draft-ietf-ldapext-ldapv3-vlv.
+LIST_VIEW_REQUEST_OID = b"2.16.840.1.113730.3.4.9"
+LIST_VIEW_RESPONSE_OID = b"2.16.840.1.113730.3.4.10"
+
+# The clock the cursors of paged searches expire by.
+_seconds = time.monotonic
+
+
+def _popControl(controls, controlType):
+    """
+    Return the control of controlType in controls, or None if there is
+    none, and the other controls.
+    """
+    found = None
+    others = []
+    for control in controls or ():
+        if to_bytes(control[0]) == controlType:
+            found = control
+            if control[2] is None:
+                raise ldaperrors.LDAPProtocolError(
+                    b"Control %s needs a value" % controlType
+                )
+        else:
+            others.append(control)
+    return found, others
+
+
+def _decodePagedResults(value):
+    """
+    Return the size and the cookie of a paged results control value.
+    """
+    try:
+        seq, _ = pureber.berDecodeObject(pureber.BERDecoderContext(), value)
+        size, cookie = seq
+        return size.value, bytes(cookie.value)
+    except (
+        ValueError,
+        TypeError,
+        AttributeError,
+        pureber.BERException,
+        pureber.BERExceptionInsufficientData,
+    ):
+        raise ldaperrors.LDAPProtocolError(b"Invalid paged results control")
+
+
+def _pagedResultsControl(cookie):
+    return (
+        PAGED_RESULTS_OID,
+        None,
+        pureber.BERSequence(
+            [pureber.BERInteger(0), pureber.BEROctetString(cookie)]
+        ).toWire(),
+    )
+
+
+class _SortKeyDecoderContext(pureber.BERDecoderContext):
+    Identities = {
+        pureber.CLASS_CONTEXT | 0x00: pureber.BEROctetString,
+        pureber.CLASS_CONTEXT | 0x01: pureber.BERBoolean,
+    }
+
+
+def _decodeSortKeys(value):
+    """
+    Return the sort keys of a server side sorting request control value,
+    as (attributeType, orderingRule, reverseOrder) tuples.
+    """
+    context = _SortKeyDecoderContext(fallback=pureber.BERDecoderContext())
+    try:
+        seq, _ = pureber.berDecodeObject(context, value)
+        sortKeys = []
+        for key in seq:
+            attributeType, *options = key
+            orderingRule = None
+            reverseOrder = False
+            for option in options:
+                if option.tag == pureber.CLASS_CONTEXT | 0x00:
+                    orderingRule = bytes(option.value)
+                elif option.tag == pureber.CLASS_CONTEXT | 0x01:
+                    reverseOrder = bool(option.value)
+                else:
+                    raise ValueError(option)
+            sortKeys.append((bytes(attributeType.value), orderingRule, reverseOrder))
+    except (
+        ValueError,
+        TypeError,
+        AttributeError,
+        pureber.BERException,
+        pureber.BERExceptionInsufficientData,
+    ):
+        raise ldaperrors.LDAPProtocolError(b"Invalid sort control")
+    if not sortKeys:
+        raise ldaperrors.LDAPProtocolError(b"Invalid sort control")
+    return sortKeys
+
+
+def _sortResultControl(resultCode, attributeType=None):
+    value = [pureber.BEREnumerated(resultCode)]
+    if attributeType is not None:
+        value.append(
+            pureber.BEROctetString(attributeType, tag=pureber.CLASS_CONTEXT | 0x00)
+        )
+    return (SORT_RESPONSE_OID, None, pureber.BERSequence(value).toWire())
+
+
+def _sortControlKeys(sort):
+    """
+    Return the sort keys of a server side sorting request control, or
+    None if they cannot be sorted by, and the response control to send.
+
+    @raise ldaperrors.LDAPUnavailableCriticalExtension: If a critical
+        control has an unknown ordering rule.
+    """
+    sortKeys = _decodeSortKeys(sort[2])
+    try:
+        entryhelpers.sortKey(sortKeys)
+    except ldaperrors.LDAPInappropriateMatching:
+        if sort[1]:
+            raise ldaperrors.LDAPUnavailableCriticalExtension(b"Unknown ordering rule")
+        return None, _sortResultControl(ldaperrors.LDAPInappropriateMatching.resultCode)
+    return sortKeys, _sortResultControl(ldaperrors.Success.resultCode)
+
+
+class _ListViewDecoderContext(pureber.BERDecoderContext):
+    Identities = {
+        pureber.CLASS_CONTEXT | 0x00: pureber.BERSequence,
+        pureber.CLASS_CONTEXT | 0x01: pureber.BEROctetString,
+    }
+
+
+def _decodeListView(value):
+    """
+    Return the beforeCount, afterCount, target and contextID of a
+    virtual list view request control value. The target is either an
+    (offset, contentCount) tuple or the assertion value to find, as
+    bytes. contextID is None if there is none.
+    """
+    context = _ListViewDecoderContext(fallback=pureber.BERDecoderContext())
+    try:
+        seq, _ = pureber.berDecodeObject(context, value)
+        beforeCount, afterCount, target, *rest = seq
+        if target.tag == pureber.CLASS_CONTEXT | 0x00:
+            offset, contentCount = target
+            target = (offset.value, contentCount.value)
+        elif target.tag == pureber.CLASS_CONTEXT | 0x01:
+            target = bytes(target.value)
+        else:
+            raise ValueError(target)
+        contextID = None
+        if rest:
+            (contextID,) = rest
+            contextID = bytes(contextID.value)
+        beforeCount = beforeCount.value
+        afterCount = afterCount.value
+    except (
+        ValueError,
+        TypeError,
+        AttributeError,
+        pureber.BERException,
+        pureber.BERExceptionInsufficientData,
+    ):
+        raise ldaperrors.LDAPProtocolError(b"Invalid virtual list view control")
+    if beforeCount < 0 or afterCount < 0:
+        raise ldaperrors.LDAPProtocolError(b"Invalid virtual list view control")
+    return beforeCount, afterCount, target, contextID
+
+
+def _listViewControl(targetPosition, contentCount, resultCode, contextID=None):
+    value = [
+        pureber.BERInteger(targetPosition),
+        pureber.BERInteger(contentCount),
+        pureber.BEREnumerated(resultCode),
+    ]
+    if contextID is not None:
+        value.append(pureber.BEROctetString(contextID))
+    return (LIST_VIEW_RESPONSE_OID, None, pureber.BERSequence(value).toWire())
+
+
+def _expire(cursors, now):
+    """
+    Drop the cursors of paged searches or virtual list views, least
+    recently used first, which have expired by now.
+    """
+    while cursors:
+        oldest = next(iter(cursors.values()))
+        if oldest.expires > now:
+            break
+        cursors.popitem(last=False)
+
+
+class _PagedSearch:
+    """
+    The cursor of a paged or sorted search, kept by LDAPServer between
+    the pages of a paged search.
+
+    Virtual list views are kept between requests in the same way.
+
+    @ivar request: The encoded search request, which the request for
+        each page has to repeat.
+    @ivar entries: The iterator over the matching entries not yet sent,
+        or the entryhelpers.ListView of a virtual list view.
+    @ivar controls: The response controls to send with each page, other
+        than the paged results control.
+    @ivar sent: How many entries have been sent.
+    @ivar expires: When the cursor expires, by _seconds().
+    @ivar threaded: Whether LDAPServer.searchThreadPool may take the
+        entries, which only backends walking their entries synchronously
+        allow.
+    """
+
+    def __init__(self, request, entries, controls=(), threaded=False):
+        self.request = request
+        self.entries = entries
+        self.controls = list(controls)
+        self.threaded = threaded
+        self.sent = 0
+        self.expires = None
+
+
+def _pageEntries(entries, count, sizeLimit, sent, deadline):
+    """
+    Yield the entries of a page of a search from the iterator entries,
+    and the None that it yields for the entries that do not match.
+
+    At most count entries are taken, or all of them if count is None.
+    Taking one fails when it would exceed sizeLimit, where sent entries
+    were sent by earlier pages, or at deadline, by _seconds().
+    """
+    taken = 0
+    while count is None or taken < count:
+        try:
+            entry = next(entries)
+        except StopIteration:
+            return
+        if deadline is not None and _seconds() >= deadline:
+            raise ldaperrors.LDAPTimeLimitExceeded()
+        if entry is not None:
+            if sizeLimit and sent >= sizeLimit:
+                raise ldaperrors.LDAPSizeLimitExceeded()
+            sent += 1
+            taken += 1
+        yield entry
+
+
+def _limit(requested, maximum):
+    """
+    Return the lower of two limits, where 0 means no limit.
+    """
+    if not maximum:
+        return requested
+    if not requested:
+        return maximum
+    return min(requested, maximum)
+
+
+class _EncodedResponse:
+    """
+    A protocolOp encoded ahead of time, such as in a search thread, which
+    LDAPMessage.encodeInto() copies as it is.
+    """
+
+    def __init__(self, wire):
+        self.wire = wire
+
+    def encodeInto(self, out):
+        out.append(self.wire)
+        return len(self.wire)
+
+    def __repr__(self):
+        return "{}(length={!r})".format(self.__class__.__name__, len(self.wire))
+
+
+@implementer(iinternet.IPushProducer)
 class LDAPServer(BaseLDAPServer):
     """An LDAP server"""
 
     boundUser = None
 
+    #: A twisted.internet.task.Cooperator to run the searches of backends
+    #: that walk their entries synchronously, such as in-memory and LDIF
+    #: trees, a slice at a time, so that a large search does not stop the
+    #: other connections from being served. None runs each search at once.
+    #: The server then also registers as the producer of its transport,
+    #: and stops matching entries while the transport is paused. Paged,
+    #: sorted and virtual list view searches are run the same way, except
+    #: that the entries to sort are matched at once unless an ordering
+    #: index gives them in order.
+    searchCooperator = None
+
+    #: A twisted.python.threadpool.ThreadPool to match and encode the
+    #: entries of searches of those backends in, instead of the reactor
+    #: thread, so that an expensive search does not delay the requests of
+    #: other connections. The entries are matched and encoded
+    #: searchBatchSize at a time, and written by the reactor thread, which
+    #: waits for a paused transport to resume before the next batch is
+    #: matched, so that paused clients do not keep threads busy. Backends
+    #: whose searchEntries() cannot walk their scope synchronously are
+    #: searched in the reactor thread. Only for trees that are not changed
+    #: while the server runs, such as a snapshot whose changes are
+    #: refused, since the reactor thread would change entries under a
+    #: search. None searches in the reactor thread.
+    searchThreadPool = None
+    searchBatchSize = 100
+
+    #: The most entries a search may return, and the most seconds it may
+    #: take, whatever the client asks for. 0 means no limit.
+    sizeLimit = 0
+    timeLimit = 0
+
+    #: The most paged searches a connection keeps cursors for, dropping
+    #: the least recently used one when another is started, and for how
+    #: many seconds a cursor is kept after its last page.
+    pagedSearches = 5
+    pagedSearchTimeout = 300
+
+    #: The most virtual list views a connection keeps the sorted entries
+    #: of, and for how many seconds after the last request for a window.
+    #: Changes to the directory are not seen in a view while it is kept.
+    listViews = 5
+    listViewTimeout = 60
+
+    # A Deferred fired when the transport resumes, while it is paused.
+    _resumed = None
+
+    def __init__(self):
+        super().__init__()
+        # The cursors of paged searches by cookie, least recently used first.
+        self._pagedSearches = collections.OrderedDict()
+        self._pagedCookie = 0
+        # The virtual list views by context id, least recently used first.
+        self._listViews = collections.OrderedDict()
+        self._listViewContext = 0
+
+    def connectionMade(self):
+        super().connectionMade()
+        if self.searchCooperator is not None or self.searchThreadPool is not None:
+            self.transport.registerProducer(self, True)
+
+    def connectionLost(self, reason=protocol.connectionDone):
+        super().connectionLost(reason)
+        self._pagedSearches.clear()
+        self._listViews.clear()
+        self.resumeProducing()
+
+    def pauseProducing(self):
+        if self._resumed is None:
+            self._resumed = defer.Deferred()
+
+    def resumeProducing(self):
+        resumed, self._resumed = self._resumed, None
+        if resumed is not None:
+            resumed.callback(None)
+
+    def stopProducing(self):
+        self.resumeProducing()
+
+    def _whenResumed(self):
+        """
+        Return a Deferred firing when the transport is not paused.
+        """
+        d = defer.Deferred()
+        if self._resumed is None:
+            d.callback(None)
+        else:
+            self._resumed.chainDeferred(d)
+        return d
+
     fail_LDAPBindRequest = pureldap.LDAPBindResponse
 
     def handle_LDAPBindRequest(self, request, controls, reply):
@@ -199,6 +584,10 @@ class LDAPServer(BaseLDAPServer):
                             pureldap.LDAPPasswordModifyRequest.oid,
                         ],
                     ),
+                    (
+                        "supportedControl",
+                        [PAGED_RESULTS_OID, SORT_REQUEST_OID, LIST_VIEW_REQUEST_OID],
+                    ),
                 ],
             )
         )
@@ -253,31 +642,47 @@ class LDAPServer(BaseLDAPServer):
         d.addErrback(_cbCompareOtherError)
         return d
 
-    def _cbSearchGotBase(self, base, dn, request, reply):
+    def _searchResultEntry(self, request, entry):
+        requested_attribs = request.attributes
+        if len(requested_attribs) > 0 and b"*" not in requested_attribs:
+            filtered_attribs = [
+                (k, entry.get(k)) for k in requested_attribs if k in entry
+            ]
+        else:
+            filtered_attribs = entry.items()
+        return pureldap.LDAPSearchResultEntry(
+            objectName=entry.dn.getText(),
+            attributes=filtered_attribs,
+        )
+
+    def _cbSearchGotBase(self, base, dn, request, reply, threaded=True):
+        if (
+            threaded
+            and self.searchThreadPool is not None
+            and isinstance(base, entryhelpers.SearchByTreeWalkingMixin)
+        ):
+            return self._threadedSearch(base, dn, request, reply)
+
         def _sendEntryToClient(entry):
-            requested_attribs = request.attributes
-            if len(requested_attribs) > 0 and b"*" not in requested_attribs:
-                filtered_attribs = [
-                    (k, entry.get(k)) for k in requested_attribs if k in entry
-                ]
-            else:
-                filtered_attribs = entry.items()
-            reply(
-                pureldap.LDAPSearchResultEntry(
-                    objectName=entry.dn.getText(),
-                    attributes=filtered_attribs,
-                )
-            )
+            reply(self._searchResultEntry(request, entry))
+            # Wait for the client to read before matching more entries.
+            return self._resumed
 
+        kwargs = {}
+        if self.searchCooperator is not None and isinstance(
+            base, entryhelpers.SearchByTreeWalkingMixin
+        ):
+            kwargs["cooperator"] = self.searchCooperator
         d = base.search(
             filterObject=request.filter,
             attributes=request.attributes,
             scope=request.scope,
             derefAliases=request.derefAliases,
-            sizeLimit=request.sizeLimit,
-            timeLimit=request.timeLimit,
+            sizeLimit=_limit(request.sizeLimit, self.sizeLimit),
+            timeLimit=_limit(request.timeLimit, self.timeLimit),
             typesOnly=request.typesOnly,
             callback=_sendEntryToClient,
+            **kwargs,
         )
 
         def _done(_):
@@ -288,6 +693,159 @@ class LDAPServer(BaseLDAPServer):
         d.addCallback(_done)
         return d
 
+    def _threadedSearch(self, base, dn, request, reply):
+        """
+        Search base in searchThreadPool, as _cbSearchGotBase() does in
+        the reactor thread, if base can walk its scope synchronously.
+        """
+
+        def _gotEntries(entries):
+            if entries is None:
+                return self._cbSearchGotBase(base, dn, request, reply, threaded=False)
+            d = self._sendEntries(entries, request, reply)
+            d.addCallback(
+                lambda _: pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.Success.resultCode
+                )
+            )
+            return d
+
+        d = self._searchEntries(base, request)
+        d.addCallback(_gotEntries)
+        return d
+
+    def _searchEntries(self, base, request, sortKeys=None, limit=0):
+        """
+        Return a Deferred firing with the iterator of base.searchEntries()
+        for request, or None. It is called in searchThreadPool if there
+        is one, since sorting matches all the entries at once.
+        """
+        from twisted.internet import reactor
+
+        def _search():
+            return base.searchEntries(
+                filterObject=request.filter,
+                scope=request.scope,
+                derefAliases=request.derefAliases,
+                sortKeys=sortKeys,
+                limit=limit,
+                unmatched=True,
+            )
+
+        if self.searchThreadPool is None:
+            return defer.maybeDeferred(_search)
+        return threads.deferToThreadPool(reactor, self.searchThreadPool, _search)
+
+    def _sendEntries(self, entries, request, reply, count=None, sent=0, threaded=True):
+        """
+        Send the entries of a search, or of a page of it, from the
+        iterator entries, which may yield None for the entries that do
+        not match. Return a Deferred firing with how many were sent, or
+        failing with LDAPSizeLimitExceeded or LDAPTimeLimitExceeded after
+        sending the entries found until then.
+
+        @param count: At most how many entries to send, or None for all.
+
+        @param sent: How many entries of the search earlier pages sent.
+
+        @param threaded: Whether searchThreadPool may take the entries.
+            It then matches and encodes searchBatchSize of them at a
+            time, and the reactor thread sends each batch and waits for
+            the transport to resume before the next one is taken, so that
+            no thread waits for a paused client. Otherwise the entries
+            are taken as _takeEntries() does.
+        """
+        from twisted.internet import reactor
+
+        timeLimit = _limit(request.timeLimit, self.timeLimit)
+        deadline = None
+        if timeLimit:
+            deadline = _seconds() + timeLimit
+        entries = _pageEntries(
+            entries, count, _limit(request.sizeLimit, self.sizeLimit), sent, deadline
+        )
+        # From now on, the entries sent by this page.
+        sent = 0
+
+        if not threaded or self.searchThreadPool is None:
+
+            def _send(entry):
+                nonlocal sent
+                reply(self._searchResultEntry(request, entry))
+                sent += 1
+
+            d = self._takeEntries(entries, _send)
+            d.addCallback(lambda _: sent)
+            return d
+
+        def _take():
+            batch = []
+            try:
+                for entry in entries:
+                    if entry is None:
+                        continue
+                    out = []
+                    self._searchResultEntry(request, entry).encodeInto(out)
+                    batch.append(b"".join(out))
+                    if len(batch) >= self.searchBatchSize:
+                        break
+            except Exception:
+                return batch, failure.Failure()
+            return batch, None
+
+        def _gotBatch(result):
+            nonlocal sent
+            batch, reason = result
+            for wire in batch:
+                reply(_EncodedResponse(wire))
+            sent += len(batch)
+            if reason is not None:
+                return reason
+            if len(batch) < self.searchBatchSize:
+                return sent
+            d = self._whenResumed()
+            d.addCallback(
+                lambda _: threads.deferToThreadPool(
+                    reactor, self.searchThreadPool, _take
+                )
+            )
+            d.addCallback(_gotBatch)
+            return d
+
+        d = threads.deferToThreadPool(reactor, self.searchThreadPool, _take)
+        d.addCallback(_gotBatch)
+        return d
+
+    def _takeEntries(self, entries, callback):
+        """
+        Call callback with each entry of the iterator entries, skipping
+        the None that it yields for the entries that do not match, and
+        return a Deferred firing when done.
+
+        searchCooperator takes COOPERATE_ENTRIES of them a slice at a
+        time, and none while the transport is paused. Without one they
+        are all taken at once.
+        """
+        if self.searchCooperator is None:
+            try:
+                for entry in entries:
+                    if entry is not None:
+                        callback(entry)
+            except Exception:
+                return defer.fail()
+            return defer.succeed(None)
+
+        def _slices():
+            for walked, entry in enumerate(entries, 1):
+                if entry is not None:
+                    callback(entry)
+                if walked % entryhelpers.COOPERATE_ENTRIES == 0:
+                    yield None
+                if self._resumed is not None:
+                    yield self._resumed
+
+        return self.searchCooperator.cooperate(_slices()).whenDone()
+
     def _cbSearchLDAPError(self, reason):
         reason.trap(ldaperrors.LDAPException)
         return pureldap.LDAPSearchResultDone(resultCode=reason.value.resultCode)
@@ -299,7 +857,271 @@ class LDAPServer(BaseLDAPServer):
 
     fail_LDAPSearchRequest = pureldap.LDAPSearchResultDone
 
+    def _cbControlledSearchGotBase(self, base, request, reply, size, sort):
+        controls = []
+        sortKeys = None
+        if sort is not None:
+            sortKeys, control = _sortControlKeys(sort)
+            controls.append(control)
+
+        def _gotEntries(entries):
+            if entries is not None:
+                search = _PagedSearch(
+                    request.toWire(), entries, controls, threaded=True
+                )
+                return self._sendSearch(search, request, reply, size)
+
+            # This backend cannot resume a search, so its results are all
+            # found on the first page.
+            d = base.search(
+                filterObject=request.filter,
+                attributes=request.attributes,
+                scope=request.scope,
+                derefAliases=request.derefAliases,
+                typesOnly=request.typesOnly,
+            )
+            d.addCallback(_gotResults)
+            return d
+
+        def _gotResults(results):
+            if sortKeys:
+                entries = entryhelpers.sortEntries(results, sortKeys)
+            else:
+                entries = iter(results)
+            search = _PagedSearch(request.toWire(), entries, controls)
+            return self._sendSearch(search, request, reply, size)
+
+        if not isinstance(base, entryhelpers.SearchByTreeWalkingMixin):
+            return _gotEntries(None)
+        sizeLimit = _limit(request.sizeLimit, self.sizeLimit)
+        # One more, to tell whether the size limit is exceeded.
+        d = self._searchEntries(
+            base, request, sortKeys, sizeLimit + 1 if sizeLimit else 0
+        )
+        d.addCallback(_gotEntries)
+        return d
+
+    def _sendSearch(self, search, request, reply, size):
+        """
+        Send the next size entries of a paged search, with the cookie to
+        resume it with if it has more, or all the entries of a search
+        that is not paged if size is None. Return a Deferred firing when
+        they are sent, which _sendEntries() does.
+        """
+
+        def _sent(sent):
+            search.sent += sent
+            controls = list(search.controls)
+            if size is not None:
+                cookie = b""
+                if sent == size:
+                    self._pagedCookie += 1
+                    cookie = b"%d" % self._pagedCookie
+                    search.expires = _seconds() + self.pagedSearchTimeout
+                    self._pagedSearches[cookie] = search
+                    while len(self._pagedSearches) > self.pagedSearches:
+                        self._pagedSearches.popitem(last=False)
+                controls.append(_pagedResultsControl(cookie))
+            reply(
+                pureldap.LDAPSearchResultDone(resultCode=ldaperrors.Success.resultCode),
+                controls,
+            )
+
+        d = self._sendEntries(
+            search.entries, request, reply, size, search.sent, search.threaded
+        )
+        d.addCallback(_sent)
+        return d
+
+    def _controlledSearch(self, request, paged, sort, reply):
+        """
+        Run a search with the paged results control of RFC 2696, the
+        server side sorting control of RFC 2891, or both.
+
+        The search starts with an iterator over the matching entries, in
+        order if sorted, from SearchByTreeWalkingMixin.searchEntries where
+        the backend supports it. With paged results, the cookie returned
+        with each page then takes the next page from that same iterator,
+        instead of running the search again.
+        """
+        if paged is None:
+            d = self._lookupBase(request)
+            d.addCallback(self._cbControlledSearchGotBase, request, reply, None, sort)
+            return d
+
+        size, cookie = _decodePagedResults(paged[2])
+        _expire(self._pagedSearches, _seconds())
+
+        if cookie:
+            search = self._pagedSearches.pop(cookie, None)
+            if search is None or search.request != request.toWire():
+                raise ldaperrors.LDAPUnwillingToPerform(
+                    b"Unknown or expired paged results cookie"
+                )
+            if size > 0:
+                return self._sendSearch(search, request, reply, size)
+        if size <= 0:
+            # Abandons the search of the cookie, if any.
+            reply(
+                pureldap.LDAPSearchResultDone(resultCode=ldaperrors.Success.resultCode),
+                [_pagedResultsControl(b"")],
+            )
+            return
+
+        d = self._lookupBase(request)
+        d.addCallback(self._cbControlledSearchGotBase, request, reply, size, sort)
+        return d
+
+    def _listViewSearch(self, request, paged, sort, listView, reply):
+        """
+        Run a search with the virtual list view control, which sends the
+        window of the entries, sorted by the server side sorting control,
+        around a target entry.
+
+        The sorted entries are kept in an entryhelpers.ListView under the
+        context id sent with the window, so that the next request of the
+        client for the same search takes its window from them, by offset
+        or by a binary search for an assertion value, instead of running
+        the search again.
+        """
+        if paged is not None:
+            raise ldaperrors.LDAPUnwillingToPerform(
+                b"Virtual list views cannot be paged"
+            )
+        beforeCount, afterCount, target, contextID = _decodeListView(listView[2])
+        if sort is None:
+            resultCode = ldaperrors.LDAPSortControlMissing.resultCode
+            reply(
+                pureldap.LDAPSearchResultDone(resultCode=resultCode),
+                [_listViewControl(0, 0, resultCode)],
+            )
+            return
+        sortKeys, sortControl = _sortControlKeys(sort)
+        if sortKeys is None:
+            resultCode = ldaperrors.LDAPInappropriateMatching.resultCode
+            reply(
+                pureldap.LDAPSearchResultDone(resultCode=resultCode),
+                [sortControl, _listViewControl(0, 0, resultCode)],
+            )
+            return
+
+        key = (request.toWire(), bytes(sort[2]))
+        now = _seconds()
+        _expire(self._listViews, now)
+        view = None
+        if contextID is not None:
+            view = self._listViews.pop(contextID, None)
+            if view is not None and view.request != key:
+                view = None
+        if view is None:
+            timeLimit = _limit(request.timeLimit, self.timeLimit)
+            deadline = None
+            if timeLimit:
+                deadline = now + timeLimit
+            d = self._lookupBase(request)
+            d.addCallback(self._cbListViewGotBase, request, sortKeys, deadline)
+            d.addCallback(lambda entries: _PagedSearch(key, entries, [sortControl]))
+        else:
+            d = defer.succeed(view)
+        d.addCallback(
+            self._sendListView, request, reply, beforeCount, afterCount, target
+        )
+        return d
+
+    def _cbListViewGotBase(self, base, request, sortKeys, deadline):
+        """
+        Return a Deferred firing with the entryhelpers.ListView of the
+        entries of base matching request, whose entries are taken as
+        _takeEntries() does, or all at once in searchThreadPool.
+        """
+        from twisted.internet import reactor
+
+        def _view(entries, threaded=False):
+            entries = _pageEntries(entries, None, 0, 0, deadline)
+            if threaded and self.searchThreadPool is not None:
+                return threads.deferToThreadPool(
+                    reactor,
+                    self.searchThreadPool,
+                    lambda: entryhelpers.ListView(
+                        (e for e in entries if e is not None), sortKeys, base
+                    ),
+                )
+            found = []
+            d = self._takeEntries(entries, found.append)
+            d.addCallback(lambda _: entryhelpers.ListView(found, sortKeys, base))
+            return d
+
+        def _gotEntries(entries):
+            if entries is not None:
+                return _view(entries, threaded=True)
+            d = base.search(
+                filterObject=request.filter,
+                attributes=request.attributes,
+                scope=request.scope,
+                derefAliases=request.derefAliases,
+                typesOnly=request.typesOnly,
+            )
+            d.addCallback(
+                lambda results: _view(entryhelpers.sortEntries(results, sortKeys))
+            )
+            return d
+
+        if not isinstance(base, entryhelpers.SearchByTreeWalkingMixin):
+            return _gotEntries(None)
+        d = self._searchEntries(base, request, sortKeys)
+        d.addCallback(_gotEntries)
+        return d
+
+    def _sendListView(self, search, request, reply, beforeCount, afterCount, target):
+        """
+        Send the window of a virtual list view around its target, and
+        keep the view under a new context id.
+        """
+        view = search.entries
+        if isinstance(target, tuple):
+            try:
+                position = view.offset(*target)
+            except ldaperrors.LDAPOffsetRangeError as e:
+                reply(
+                    pureldap.LDAPSearchResultDone(
+                        resultCode=e.resultCode, errorMessage=e.message
+                    ),
+                    [_listViewControl(0, len(view), e.resultCode)],
+                )
+                return
+        else:
+            position = view.find(target)
+
+        resultCode = ldaperrors.Success.resultCode
+        window = view.window(position, beforeCount, afterCount)
+        sizeLimit = _limit(request.sizeLimit, self.sizeLimit)
+        if sizeLimit and len(window) > sizeLimit:
+            del window[sizeLimit:]
+            resultCode = ldaperrors.LDAPSizeLimitExceeded.resultCode
+        for entry in window:
+            reply(self._searchResultEntry(request, entry))
+
+        self._listViewContext += 1
+        contextID = b"%d" % self._listViewContext
+        search.expires = _seconds() + self.listViewTimeout
+        self._listViews[contextID] = search
+        while len(self._listViews) > self.listViews:
+            self._listViews.popitem(last=False)
+        reply(
+            pureldap.LDAPSearchResultDone(resultCode=resultCode),
+            search.controls
+            + [_listViewControl(position, len(view), resultCode, contextID)],
+        )
+
+    def _lookupBase(self, request):
+        dn = distinguishedname.DistinguishedName(request.baseObject)
+        root = interfaces.IConnectedLDAPEntry(self.factory)
+        return root.lookup(dn)
+
     def handle_LDAPSearchRequest(self, request, controls, reply):
+        paged, controls = _popControl(controls, PAGED_RESULTS_OID)
+        sort, controls = _popControl(controls, SORT_REQUEST_OID)
+        listView, controls = _popControl(controls, LIST_VIEW_REQUEST_OID)
         self.checkControls(controls)
 
         if (
@@ -308,10 +1130,17 @@ class LDAPServer(BaseLDAPServer):
             and request.filter == pureldap.LDAPFilter_present("objectClass")
         ):
             return self.getRootDSE(request, reply)
-        dn = distinguishedname.DistinguishedName(request.baseObject)
-        root = interfaces.IConnectedLDAPEntry(self.factory)
-        d = root.lookup(dn)
-        d.addCallback(self._cbSearchGotBase, dn, request, reply)
+        if listView is not None:
+            d = defer.maybeDeferred(
+                self._listViewSearch, request, paged, sort, listView, reply
+            )
+        elif paged is not None or sort is not None:
+            d = defer.maybeDeferred(self._controlledSearch, request, paged, sort, reply)
+        else:
+            dn = distinguishedname.DistinguishedName(request.baseObject)
+            root = interfaces.IConnectedLDAPEntry(self.factory)
+            d = root.lookup(dn)
+            d.addCallback(self._cbSearchGotBase, dn, request, reply)
         d.addErrback(self._cbSearchLDAPError)
         d.addErrback(defer.logError)
         d.addErrback(self._cbSearchOtherError)
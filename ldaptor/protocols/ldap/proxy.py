@@ -11,6 +11,8 @@ class Proxy(ldapserver.BaseLDAPServer):
     client = None
     waitingConnect = []
     unbound = False
+    # Pass responses on without decoding them.
+    passThrough = False
 
     def __init__(self, config):
         """
@@ -39,7 +41,9 @@ class Proxy(ldapserver.BaseLDAPServer):
 
     def _clientQueue(self, request, controls, reply):
         # TODO controls
-        if request.needs_answer:
+        if request.needs_answer and self.passThrough:
+            self.client.send_multiResponse_raw(request, self._gotRawResponse, reply)
+        elif request.needs_answer:
             self.client.send_multiResponse(request, self._gotResponse, reply)
             # TODO handle errbacks from the deferred above
         else:
@@ -57,6 +61,15 @@ class Proxy(ldapserver.BaseLDAPServer):
             ),
         )
 
+    def _gotRawResponse(self, envelope, reply):
+        reply(envelope)
+
+        # Only searches are answered with more than one response.
+        return envelope.tag not in (
+            pureldap.LDAPSearchResultEntry.tag,
+            pureldap.LDAPSearchResultReference.tag,
+        )
+
     def _failConnection(self, reason):
         # TODO self.loseConnection()
         return reason  # TODO
@@ -1,10 +1,12 @@
 """
 LDAP protocol proxy server.
 """
+from collections import deque
+
 from ldaptor.protocols.ldap import ldapserver, ldapconnector, ldaperrors
 from ldaptor.protocols import pureldap
 from twisted.internet import defer
-from twisted.python import log
+from twisted.python import failure, log
 
 
 class ProxyBase(ldapserver.BaseLDAPServer):
@@ -14,9 +16,13 @@ class ProxyBase(ldapserver.BaseLDAPServer):
     the client.
     Override `handleProxiedResponse()` to inspect/modify responses from
     the proxied server.
+    Set `passThrough` to pass responses from the proxied server on to the
+    client without decoding them. It has no effect on subclasses that
+    override `handleProxiedResponse()`, which still see every response.
     """
 
     client = None
+    passThrough = False
     unbound = False
     use_tls = False
     clientConnector = None
@@ -125,8 +131,15 @@ class ProxyBase(ldapserver.BaseLDAPServer):
             if result is None:
                 return
             request, controls = result
-            if request.needs_answer:
-                dseq = []
+            if request.needs_answer and self._passesThrough():
+                d2 = self.client.send_multiResponse_raw(
+                    request,
+                    self._gotRawResponseFromProxiedServer,
+                    reply,
+                )
+                d2.addErrback(log.err)
+            elif request.needs_answer:
+                dseq = deque()
                 d2 = self.client.send_multiResponse(
                     request,
                     self._gotResponseFromProxiedServer,
@@ -144,6 +157,16 @@ class ProxyBase(ldapserver.BaseLDAPServer):
         )
         d.addCallback(forwardit, reply)
 
+    def _passesThrough(self):
+        """
+        Whether responses are passed on without decoding them, which is
+        only done when handleProxiedResponse() is not overridden.
+        """
+        return (
+            self.passThrough
+            and type(self).handleProxiedResponse is ProxyBase.handleProxiedResponse
+        )
+
     def handleBeforeForwardRequest(self, request, controls, reply):
         """
         Override to modify request and/or controls forwarded on to the proxied server.
@@ -157,18 +180,32 @@ class ProxyBase(ldapserver.BaseLDAPServer):
     def _gotResponseFromProxiedServer(self, response, reply, request, controls, dseq):
         """
         Returns True if this is the last response to the request.
+
+        Responses are replied to as soon as handleProxiedResponse()
+        returns them. Only while a Deferred it returned has not fired
+        yet are the following responses queued in dseq, to be replied
+        to in order once it fires.
         """
-        d = defer.maybeDeferred(self.handleProxiedResponse, response, request, controls)
+        if type(self).handleProxiedResponse is ProxyBase.handleProxiedResponse:
+            result = response
+        else:
+            try:
+                result = self.handleProxiedResponse(response, request, controls)
+            except Exception:
+                result = failure.Failure()
 
-        def replyAndLinkToNextEntry(result):
-            dseq.pop(0)
-            reply(result)
-            if len(dseq) > 0:
-                dseq[0].addCallback(replyAndLinkToNextEntry)
+        if dseq:
+            if not isinstance(result, defer.Deferred):
+                result = defer.succeed(result)
+            dseq.append(result)
+        elif not isinstance(result, defer.Deferred):
+            self._replyToProxiedResponse(result, reply)
+        elif result.called and not result.paused:
+            result.addBoth(self._replyToProxiedResponse, reply)
+        else:
+            dseq.append(result)
+            result.addBoth(self._replyInOrder, reply, dseq)
 
-        dseq.append(d)
-        if len(dseq) == 1:
-            d.addCallback(replyAndLinkToNextEntry)
         return isinstance(
             response,
             (
@@ -177,6 +214,38 @@ class ProxyBase(ldapserver.BaseLDAPServer):
             ),
         )
 
+    def _gotRawResponseFromProxiedServer(self, envelope, reply):
+        """
+        Returns True if this is the last response to the request.
+        """
+        reply(envelope)
+        # Only searches are answered with more than one response.
+        return envelope.tag not in (
+            pureldap.LDAPSearchResultEntry.tag,
+            pureldap.LDAPSearchResultReference.tag,
+        )
+
+    def _replyToProxiedResponse(self, result, reply):
+        if isinstance(result, failure.Failure):
+            log.err(result, "handleProxiedResponse failed")
+        else:
+            reply(result)
+
+    def _replyInOrder(self, result, reply, dseq):
+        """
+        Reply to the response at the head of dseq, and then to those
+        following it that are ready, until one is still pending.
+        """
+        dseq.popleft()
+        self._replyToProxiedResponse(result, reply)
+        while dseq:
+            d = dseq[0]
+            if not d.called or d.paused:
+                d.addBoth(self._replyInOrder, reply, dseq)
+                return
+            dseq.popleft()
+            d.addBoth(self._replyToProxiedResponse, reply)
+
     def handleProxiedResponse(self, response, request, controls):
         """
         Override to intercept and modify proxied responses.
@@ -64,7 +64,8 @@ def berDecodeLength(m, offset=0):
     Return a tuple of (length, lengthLength).
     m must be atleast one byte long.
     """
-    l = ber2int(m[offset + 0 : offset + 1])
+    need(m, offset + 1)
+    l = m[offset]
     ll = 1
     if l & 0x80:
         ll = 1 + (l & 0x7F)
@@ -75,37 +76,89 @@ def berDecodeLength(m, offset=0):
 
 def int2berlen(i):
     assert i >= 0
-    e = int2ber(i, signed=False)
     if i <= 127:
-        return e
-    else:
-        l = len(e)
-        assert l > 0
-        assert l <= 127
-        return bytes((0x80 | l,)) + e
+        return _berShortLengths[i]
+    e = i.to_bytes((i.bit_length() + 7) // 8, "big")
+    l = len(e)
+    assert l <= 127
+    return bytes((0x80 | l,)) + e
+
+
+def _int2ber(i, signed=True):
+    if signed:
+        # The minimal two's complement length; ~i has the bit length
+        # of a negative i without its sign.
+        return i.to_bytes(
+            (i if i >= 0 else ~i).bit_length() // 8 + 1, "big", signed=True
+        )
+    if i < 0:
+        return bytes((i % 256,))
+    return i.to_bytes(max(1, (i.bit_length() + 7) // 8), "big")
 
 
 def int2ber(i, signed=True):
-    encoded = b""
-    while (signed and (i > 127 or i < -128)) or (not signed and (i > 255)):
-        encoded = bytes((i % 256,)) + encoded
-        i = i >> 8
-    encoded = bytes((i % 256,)) + encoded
-    return encoded
+    if signed and -128 <= i < 1024:
+        return _berSmallIntegers[i + 128]
+    return _int2ber(i, signed)
 
 
 def ber2int(e, signed=True):
     need(e, 1)
-    v = 0 + ord(e[0:1])
-    if v & 0x80 and signed:
-        v = v - 256
-    for i in range(1, len(e)):
-        v = (v << 8) | ord(e[i : i + 1])
-    return v
+    return int.from_bytes(e, "big", signed=signed)
+
+
+# Lengths below 128 are encoded in a single octet, and message ids and
+# enumerations are mostly small integers, so look their encodings up.
+_berShortLengths = tuple(bytes((i,)) for i in range(128))
+_berSmallIntegers = tuple(_int2ber(i) for i in range(-128, 1024))
+
+
+def _toWireFrom(encodeInto):
+    def toWire(self):
+        out = []
+        encodeInto(self, out)
+        return b"".join(out)
+
+    return toWire
+
+
+def berEncodeInto(obj, out):
+    """berEncodeInto(obj, list) -> length
+
+    Append the encoding of obj to out, as one or more bytes chunks, and
+    return its length. obj is anything to_bytes() accepts; objects with
+    an encodeInto() method add their own chunks.
+    """
+    encodeInto = getattr(obj, "encodeInto", None)
+    if encodeInto is None:
+        wire = to_bytes(obj)
+        out.append(wire)
+        return len(wire)
+    return encodeInto(out)
+
+
+# Modules whose fromBER() implementations accept a memoryview.
+_viewDecoders = frozenset([__name__, "ldaptor.protocols.pureldap"])
 
 
 class BERBase(WireStrAlias):
     tag = None
+    # Whether fromBER() accepts a memoryview as content, which is only
+    # assumed of the implementations in ldaptor itself.
+    _decodesViews = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fromBER = getattr(getattr(cls, "fromBER", None), "__func__", None)
+        cls._decodesViews = getattr(fromBER, "__module__", None) in _viewDecoders
+        toWire = cls.__dict__.get("toWire")
+        encodeInto = cls.__dict__.get("encodeInto")
+        if encodeInto is None:
+            if toWire is not None:
+                # toWire() is overridden, so encodeInto() must use it.
+                cls.encodeInto = BERBase.encodeInto
+        elif toWire is None:
+            cls.toWire = _toWireFrom(encodeInto)
 
     def identification(self):
         return self.tag
@@ -134,12 +187,75 @@ class BERBase(WireStrAlias):
     def toWire(self):
         return b""
 
+    def encodeInto(self, out):
+        """
+        Append the encoding of this object to the list out, as one or
+        more bytes chunks, and return its length.
+
+        Sequences compute the length of their content from the lengths
+        their children return and only then fill in their own header,
+        so joining out gives the same bytes as toWire() while every
+        value is copied only once, by the join.
+        """
+        wire = self.toWire()
+        out.append(wire)
+        return len(wire)
+
 
 class BERStructured(BERBase):
     def identification(self):
         return STRUCTURED | self.tag
 
 
+class CachedWire(BERBase):
+    """
+    A BER object whose encoding is computed once and then reused.
+
+    Wrap objects that are compared, hashed or sent several times, such
+    as a request that is sent again or filters kept in a set. Other
+    attributes are those of the wrapped object, in `obj`.
+
+    The encoding is not updated when the wrapped object, or anything it
+    contains, is modified: call invalidate() after modifying it.
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._wire = None
+
+    @property
+    def tag(self):
+        return self.obj.tag
+
+    def identification(self):
+        return self.obj.identification()
+
+    def invalidate(self):
+        """
+        Encode the wrapped object again the next time it is needed.
+        """
+        self._wire = None
+
+    def toWire(self):
+        wire = self._wire
+        if wire is None:
+            wire = self._wire = self.obj.toWire()
+        return wire
+
+    def encodeInto(self, out):
+        wire = self.toWire()
+        out.append(wire)
+        return len(wire)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.__dict__["obj"], name)
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(%r)" % (self.obj,)
+
+
 class BERException(Exception):
     pass
 
@@ -195,7 +311,7 @@ class BEROctetString(BERBase):
     @classmethod
     def fromBER(klass, tag, content, berdecoder=None):
         assert len(content) >= 0
-        r = klass(value=content, tag=tag)
+        r = klass(value=bytes(content), tag=tag)
         return r
 
     def __init__(self, value=None, tag=None):
@@ -203,10 +319,12 @@ class BEROctetString(BERBase):
         assert value is not None
         self.value = value
 
-    def toWire(self):
+    def encodeInto(self, out):
         value = to_bytes(self.value)
-        result = bytes((self.identification(),)) + int2berlen(len(value)) + value
-        return result
+        header = bytes((self.identification(),)) + int2berlen(len(value))
+        out.append(header)
+        out.append(value)
+        return len(header) + len(value)
 
     def __repr__(self):
         value = self.value
@@ -294,9 +412,15 @@ class BERSequence(BERStructured, UserList):
         assert value is not None
         UserList.__init__(self, value)
 
-    def toWire(self):
-        r = b"".join(to_bytes(x) for x in self.data)
-        return bytes((self.identification(),)) + int2berlen(len(r)) + r
+    def encodeInto(self, out):
+        i = len(out)
+        out.append(None)
+        length = 0
+        for x in self.data:
+            length += berEncodeInto(x, out)
+        header = bytes((self.identification(),)) + int2berlen(length)
+        out[i] = header
+        return len(header) + length
 
     def __repr__(self):
         if self.tag == self.__class__.tag:
@@ -327,11 +451,59 @@ class BERDecoderContext:
         BERSet.tag: BERSet,
     }
 
+    # The dispatch table of this context, built on first lookup, or
+    # False if its fallback chain cannot be flattened.
+    _dispatch = None
+
+    # Dispatch tables by context class and the table of the fallback
+    # they extend, shared by all contexts with the same chain.
+    _dispatchTables = {}
+
     def __init__(self, fallback=None, inherit=None):
         self.fallback = fallback
         self.inherit_context = inherit
 
+    def _dispatchTable(self):
+        """
+        Return a list mapping each tag octet to the class this context
+        or its fallback chain decodes it with, or False if the chain
+        contains a context which overrides lookup_id().
+
+        The Identities and fallback of each context in the chain are
+        read when the table is built.
+        """
+        fallback = self.fallback
+        if not fallback:
+            base = None
+        elif getattr(type(fallback), "lookup_id", None) is BERDecoderContext.lookup_id:
+            base = fallback._dispatch
+            if base is None:
+                base = fallback._dispatch = fallback._dispatchTable()
+            if base is False:
+                return False
+        else:
+            return False
+
+        key = (type(self), id(base))
+        cached = self._dispatchTables.get(key)
+        if cached is not None and cached[0] is base:
+            return cached[1]
+        if base is None:
+            table = [None] * 256
+        else:
+            table = list(base)
+        for tag, berclass in self.Identities.items():
+            if 0 <= tag < 256:
+                table[tag] = berclass
+        self._dispatchTables[key] = (base, table)
+        return table
+
     def lookup_id(self, id):
+        table = self._dispatch
+        if table is None:
+            table = self._dispatch = self._dispatchTable()
+        if table and 0 <= id < 256:
+            return table[id]
         try:
             return self.Identities[id]
         except KeyError:
@@ -363,10 +535,17 @@ class BERDecoderContext:
 def berDecodeObject(context, m):
     """berDecodeObject(context, bytes) -> (berobject, bytesUsed)
     berobject may be None.
+
+    m may also be a memoryview, in which case the content handed to
+    each fromBER() is a memoryview over the same buffer instead of a
+    copy of it. Nested objects are then decoded without copying their
+    enclosing data at every level, and only leaf values such as OCTET
+    STRINGs are materialized as bytes. Classes whose fromBER() is
+    defined outside of ldaptor still receive their content as bytes.
     """
     while m:
         need(m, 2)
-        i = ber2int(m[0:1], signed=0) & (CLASS_MASK | TAG_MASK)
+        i = m[0] & (CLASS_MASK | TAG_MASK)
 
         length, lenlen = berDecodeLength(m, offset=1)
         need(m, 1 + lenlen + length)
@@ -376,6 +555,8 @@ def berDecodeObject(context, m):
         if berclass:
             inh = context.inherit()
             assert inh
+            if type(m2) is memoryview and not getattr(berclass, "_decodesViews", False):
+                m2 = bytes(m2)
             r = berclass.fromBER(tag=i, content=m2, berdecoder=inh)
             return (r, 1 + lenlen + length)
         else:
@@ -384,6 +565,64 @@ def berDecodeObject(context, m):
     return (None, 0)
 
 
+def berFrameLength(m, offset=0):
+    """berFrameLength(bytes, offset) -> length
+
+    Return the total length, including the tag and length octets, of
+    the BER object starting at offset. Only the header needs to be
+    present; raises BERExceptionInsufficientData if it is not.
+    """
+    need(m, offset + 2)
+    length, lenlen = berDecodeLength(m, offset=offset + 1)
+    return 1 + lenlen + length
+
+
+class BERFramer:
+    """
+    Split a stream of bytes into complete top level BER objects.
+
+    Received data is appended to a single buffer with feed(). The tag
+    and length of the object at the head of the buffer are parsed only
+    once, and the object is handed out when all of its announced
+    length has arrived, so reassembling a large object from many small
+    reads costs time linear in its size.
+
+    Iterating over the framer returns the complete objects currently
+    buffered, as bytes, in the order they were received.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._frameLength = None
+
+    def feed(self, data):
+        self._buffer += data
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        buf = self._buffer
+        if self._frameLength is None:
+            try:
+                self._frameLength = berFrameLength(buf)
+            except BERExceptionInsufficientData:
+                raise StopIteration
+        length = self._frameLength
+        if len(buf) < length:
+            raise StopIteration
+        with memoryview(buf) as view:
+            frame = bytes(view[:length])
+        # Deleting from the head of a bytearray only advances its start
+        # offset, so consuming a frame does not copy what follows it.
+        del buf[:length]
+        self._frameLength = None
+        return frame
+
+
 def berDecodeMultiple(content, berdecoder):
     """berDecodeMultiple(content, berdecoder) -> [objects]
 
@@ -1,5 +1,6 @@
 """LDAP protocol message conversion; no application logic here."""
 
+import functools
 import string
 
 
@@ -16,9 +17,16 @@ from ldaptor.protocols.pureber import (
     BERStructured,
     CLASS_APPLICATION,
     CLASS_CONTEXT,
+    CLASS_MASK,
+    STRUCTURED,
+    TAG_MASK,
+    ber2int,
+    berDecodeLength,
     berDecodeMultiple,
     berDecodeObject,
+    berFrameLength,
     int2berlen,
+    need,
 )
 from ldaptor._encoder import to_bytes
 
@@ -108,14 +116,15 @@ class LDAPMessage(BERSequence):
         self.value = value
         self.controls = controls
 
-    def toWire(self):
+    def encodeInto(self, out):
         """
-        This is the wire/encoded representation.
+        Append the wire/encoded representation to out; toWire() returns
+        it as bytes.
         """
         l = [BERInteger(self.id), self.value]
         if self.controls is not None:
             l.append(LDAPControls([LDAPControl(*a) for a in self.controls]))
-        return BERSequence(l).toWire()
+        return BERSequence(l).encodeInto(out)
 
     def __repr__(self):
         l = []
@@ -127,6 +136,59 @@ class LDAPMessage(BERSequence):
         return self.__class__.__name__ + "(" + ", ".join(l) + ")"
 
 
+class LDAPMessageEnvelope:
+    """
+    An encoded LDAPMessage of which only the message id and the tag of
+    the protocolOp are decoded.
+
+    Proxies pass responses on as envelopes: withId() returns the
+    original encoding, including any controls, with only the message
+    id replaced.
+    """
+
+    def __init__(self, pdu):
+        need(pdu, 2)
+        _, lenlen = berDecodeLength(pdu, offset=1)
+        idOffset = 1 + lenlen
+        need(pdu, idOffset + 2)
+        idLength, idLenlen = berDecodeLength(pdu, offset=idOffset + 1)
+        idStart = idOffset + 1 + idLenlen
+        need(pdu, idStart + idLength + 1)
+
+        self.pdu = pdu
+        self.id = ber2int(pdu[idStart : idStart + idLength])
+        self.tag = pdu[idStart + idLength] & (CLASS_MASK | TAG_MASK)
+        self._valueOffset = idStart + idLength
+
+    def withId(self, id):
+        """
+        Return the encoding of this message with id as its message id.
+        """
+        if id == self.id:
+            return bytes(self.pdu)
+        encodedId = BERInteger(id).toWire()
+        rest = memoryview(self.pdu)[self._valueOffset :]
+        return b"".join(
+            [
+                bytes((STRUCTURED | BERSequence.tag,)),
+                int2berlen(len(encodedId) + len(rest)),
+                encodedId,
+                rest,
+            ]
+        )
+
+    def toWire(self):
+        return bytes(self.pdu)
+
+    def __repr__(self):
+        return "{}(id={!r}, tag={!r}, length={!r})".format(
+            self.__class__.__name__,
+            self.id,
+            self.tag,
+            len(self.pdu),
+        )
+
+
 class LDAPProtocolOp:
     def __init__(self):
         pass
@@ -315,7 +377,7 @@ class LDAPResult(LDAPProtocolResponse, BERSequence):
         self.referral = referral
         self.serverSaslCreds = serverSaslCreds
 
-    def toWire(self):
+    def encodeInto(self, out):
         assert self.referral is None  # TODO
         if self.serverSaslCreds:
             return BERSequence(
@@ -326,7 +388,7 @@ class LDAPResult(LDAPProtocolResponse, BERSequence):
                     LDAPBindResponse_serverSaslCreds(self.serverSaslCreds),
                 ],
                 tag=self.tag,
-            ).toWire()
+            ).encodeInto(out)
         else:
             return BERSequence(
                 [
@@ -335,7 +397,7 @@ class LDAPResult(LDAPProtocolResponse, BERSequence):
                     BEROctetString(self.errorMessage),
                 ],
                 tag=self.tag,
-            ).toWire()
+            ).encodeInto(out)
 
     def __repr__(self):
         l = []
@@ -1010,21 +1072,232 @@ class LDAPSearchRequest(LDAPProtocolRequest, BERSequence):
             )
 
 
+def _encodeAttribute(attr_li):
+    return BERSequence(
+        [
+            BEROctetString(attr_li[0]),
+            BERSet([BEROctetString(x) for x in attr_li[1]]),
+        ]
+    )
+
+
+def _decodesAll(method):
+    @functools.wraps(method)
+    def decodingMethod(self, *args, **kwargs):
+        self._edit()
+        return method(self, *args, **kwargs)
+
+    return decodingMethod
+
+
+class LDAPPartialAttributeList(list):
+    """
+    The attributes of a decoded LDAPSearchResultEntry.
+
+    This is a list of (type, [values]) tuples which keeps the encoded
+    attribute list and only decodes an attribute when it is accessed.
+    The first access scans the encoding once to index where each
+    attribute starts; get() then finds an attribute by type without
+    decoding any of the others.
+
+    Encoding the list again reuses the encoding of every attribute
+    that was not accessed, so an entry that is only forwarded is never
+    fully decoded. Other list operations decode all of it. Copies and
+    pickles of the list are plain lists.
+    """
+
+    def __init__(self, content, berdecoder=None):
+        list.__init__(self)
+        if isinstance(content, memoryview) and not isinstance(content.obj, bytes):
+            # Do not keep a mutable buffer alive and locked.
+            content = bytes(content)
+        if berdecoder is None:
+            berdecoder = BERDecoderContext()
+        self._content = content
+        self._berdecoder = berdecoder
+        self._offsets = None
+        self._index = None
+        self._items = None
+
+    def _scan(self):
+        content = self._content
+        offsets = []
+        index = {}
+        offset = 0
+        while offset < len(content):
+            end = offset + berFrameLength(content, offset)
+            need(content, end)
+            # The attribute type is the OCTET STRING leading the SEQUENCE.
+            _, lenlen = berDecodeLength(content, offset + 1)
+            typeOffset = offset + 1 + lenlen
+            typeLength, typeLenlen = berDecodeLength(content, typeOffset + 1)
+            typeStart = typeOffset + 1 + typeLenlen
+            attributeType = bytes(content[typeStart : typeStart + typeLength])
+            index.setdefault(attributeType.lower(), len(offsets))
+            offsets.append((offset, end))
+            offset = end
+        self._offsets = offsets
+        self._index = index
+        self._items = [None] * len(offsets)
+
+    def _decode(self, i):
+        if self._offsets is None:
+            self._scan()
+        item = self._items[i]
+        if item is None:
+            start, end = self._offsets[i]
+            attribute, _ = berDecodeObject(self._berdecoder, self._content[start:end])
+            item = (attribute[0].value, [x.value for x in attribute[1]])
+            self._items[i] = item
+        return item
+
+    def _edit(self):
+        """
+        Decode all attributes into the list and drop the encoding, so
+        that the list can be used as any other.
+        """
+        if self._content is not None:
+            items = [self._decode(i) for i in range(len(self))]
+            self._content = None
+            self._offsets = None
+            self._index = None
+            self._items = None
+            list.extend(self, items)
+
+    def get(self, key, default=None):
+        """
+        Return the values of the attribute of type key, compared case
+        insensitively, or default if there is no such attribute.
+        """
+        key = to_bytes(key).lower()
+        if self._content is None:
+            for attributeType, values in list.__iter__(self):
+                if to_bytes(attributeType).lower() == key:
+                    return values
+            return default
+        if self._index is None:
+            self._scan()
+        i = self._index.get(key)
+        if i is None:
+            return default
+        return self._decode(i)[1]
+
+    def __len__(self):
+        if self._content is None:
+            return list.__len__(self)
+        if self._offsets is None:
+            self._scan()
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        if self._content is None:
+            return list.__getitem__(self, i)
+        if isinstance(i, slice):
+            return [self._decode(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._decode(i)
+
+    def __iter__(self):
+        if self._content is None:
+            return list.__iter__(self)
+        return (self._decode(i) for i in range(len(self)))
+
+    __setitem__ = _decodesAll(list.__setitem__)
+    __delitem__ = _decodesAll(list.__delitem__)
+    __contains__ = _decodesAll(list.__contains__)
+    __reversed__ = _decodesAll(list.__reversed__)
+    __add__ = _decodesAll(list.__add__)
+    __iadd__ = _decodesAll(list.__iadd__)
+    __mul__ = _decodesAll(list.__mul__)
+    __rmul__ = _decodesAll(list.__rmul__)
+    __imul__ = _decodesAll(list.__imul__)
+    __lt__ = _decodesAll(list.__lt__)
+    __le__ = _decodesAll(list.__le__)
+    __gt__ = _decodesAll(list.__gt__)
+    __ge__ = _decodesAll(list.__ge__)
+    append = _decodesAll(list.append)
+    extend = _decodesAll(list.extend)
+    insert = _decodesAll(list.insert)
+    pop = _decodesAll(list.pop)
+    remove = _decodesAll(list.remove)
+    clear = _decodesAll(list.clear)
+    index = _decodesAll(list.index)
+    count = _decodesAll(list.count)
+    copy = _decodesAll(list.copy)
+    reverse = _decodesAll(list.reverse)
+    sort = _decodesAll(list.sort)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return other + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, LDAPPartialAttributeList):
+            return self.toWire() == other.toWire()
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def encodeInto(self, out):
+        if self._content is None:
+            return BERSequence([_encodeAttribute(x) for x in self]).encodeInto(out)
+        content = self._content
+        if self._items is not None and any(self._items):
+            # Attributes that were accessed are encoded again, as their
+            # values may have been changed in place.
+            content = b"".join(
+                content[start:end] if item is None else _encodeAttribute(item).toWire()
+                for (start, end), item in zip(self._offsets, self._items)
+            )
+        header = bytes((STRUCTURED | BERSequence.tag,)) + int2berlen(len(content))
+        out.append(header)
+        out.append(bytes(content))
+        return len(header) + len(content)
+
+    def toWire(self):
+        out = []
+        self.encodeInto(out)
+        return b"".join(out)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class LDAPSearchResultEntry(LDAPProtocolResponse, BERSequence):
     tag = CLASS_APPLICATION | 0x04
 
     @classmethod
     def fromBER(klass, tag, content, berdecoder=None):
-        l = berDecodeMultiple(
-            content,
+        objectName, used = berDecodeObject(
             LDAPBERDecoderContext_Filter(fallback=berdecoder, inherit=berdecoder),
+            content,
         )
 
-        objectName = l[0].value
-        attributes = []
-        for attr, li in l[1].data:
-            attributes.append((attr.value, [x.value for x in li]))
-        r = klass(objectName=objectName, attributes=attributes, tag=tag)
+        # Keep the attribute list encoded; it is decoded on access.
+        need(content, used + 2)
+        length, lenlen = berDecodeLength(content, offset=used + 1)
+        start = used + 1 + lenlen
+        need(content, start + length)
+        attributes = LDAPPartialAttributeList(
+            content[start : start + length], berdecoder
+        )
+        r = klass(objectName=objectName.value, attributes=attributes, tag=tag)
         return r
 
     def __init__(self, objectName, attributes, tag=None):
@@ -1035,24 +1308,15 @@ class LDAPSearchResultEntry(LDAPProtocolResponse, BERSequence):
         self.objectName = objectName
         self.attributes = attributes
 
-    def toWire(self):
+    def encodeInto(self, out):
+        if isinstance(self.attributes, LDAPPartialAttributeList):
+            attributes = self.attributes
+        else:
+            attributes = BERSequence([_encodeAttribute(x) for x in self.attributes])
         return BERSequence(
-            [
-                BEROctetString(self.objectName),
-                BERSequence(
-                    [
-                        BERSequence(
-                            [
-                                BEROctetString(attr_li[0]),
-                                BERSet([BEROctetString(x) for x in attr_li[1]]),
-                            ]
-                        )
-                        for attr_li in self.attributes
-                    ]
-                ),
-            ],
+            [BEROctetString(self.objectName), attributes],
             tag=self.tag,
-        ).toWire()
+        ).encodeInto(out)
 
     def __repr__(self):
         name = self.objectName
@@ -1114,13 +1378,13 @@ class LDAPControl(BERSequence):
         self.criticality = criticality
         self.controlValue = controlValue
 
-    def toWire(self):
+    def encodeInto(self, out):
         self.data = [LDAPOID(self.controlType)]
         if self.criticality is not None:
             self.data.append(BERBoolean(self.criticality))
         if self.controlValue is not None:
             self.data.append(BEROctetString(self.controlValue))
-        return BERSequence.toWire(self)
+        return BERSequence.encodeInto(self, out)
 
 
 class LDAPBERDecoderContext_LDAPControls(BERDecoderContext):
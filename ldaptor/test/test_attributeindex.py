@@ -0,0 +1,317 @@
+"""
+Test cases for ldaptor.attributeindex module.
+"""
+import datetime
+
+from twisted.trial import unittest
+
+from ldaptor import attributeindex, entry, ldapfilter
+
+
+class TestNormalize(unittest.TestCase):
+    def test_type(self):
+        self.assertEqual("uid", attributeindex.normalizeType(b"UID"))
+        self.assertEqual("uid", attributeindex.normalizeType("Uid"))
+
+    def test_value(self):
+        """
+        Text and its UTF-8 encoding are indexed under the same key,
+        ignoring case.
+        """
+        self.assertEqual(
+            attributeindex.normalizeValue("Jörg"),
+            attributeindex.normalizeValue("jörg".encode("utf-8")),
+        )
+
+    def test_value_binary(self):
+        self.assertEqual(b"\xff\xfe", attributeindex.normalizeValue(b"\xff\xfe"))
+
+
+class TestCandidates(unittest.TestCase):
+    def setUp(self):
+        self.a = entry.BaseLDAPEntry(
+            dn="cn=a,dc=example,dc=com",
+            attributes={"cn": ["a"], "objectClass": ["person"]},
+        )
+        self.b = entry.BaseLDAPEntry(
+            dn="cn=b,dc=example,dc=com",
+            attributes={"cn": ["b", "Alias"], "objectClass": ["person"]},
+        )
+        self.c = entry.BaseLDAPEntry(
+            dn="ou=c,dc=example,dc=com", attributes={"objectClass": ["unit"]}
+        )
+        self.indexes = {
+            "cn": attributeindex.AttributeIndex("cn"),
+            "objectclass": attributeindex.AttributeIndex("objectClass", equality=False),
+        }
+        for e in (self.a, self.b, self.c):
+            for index in self.indexes.values():
+                index.add(e)
+
+    def candidates(self, filterText):
+        found = attributeindex.candidates(
+            self.indexes, ldapfilter.parseFilter(filterText)
+        )
+        if found is None:
+            return None
+        return list(found.values())
+
+    def test_equality(self):
+        self.assertEqual([self.b], self.candidates("(cn=alias)"))
+        self.assertEqual([], self.candidates("(cn=nobody)"))
+
+    def test_equality_notIndexed(self):
+        self.assertIsNone(self.candidates("(sn=a)"))
+        self.assertIsNone(self.candidates("(objectClass=person)"))
+
+    def test_presence(self):
+        self.assertEqual([self.a, self.b], self.candidates("(cn=*)"))
+        self.assertEqual([self.a, self.b, self.c], self.candidates("(objectClass=*)"))
+
+    def test_and(self):
+        self.assertEqual([self.a], self.candidates("(&(sn=x)(cn=*)(cn=a))"))
+        self.assertIsNone(self.candidates("(&(sn=x)(!(cn=a)))"))
+
+    def test_or(self):
+        self.assertEqual([self.a, self.b], self.candidates("(|(cn=a)(cn=b))"))
+        self.assertIsNone(self.candidates("(|(cn=a)(sn=b))"))
+
+    def test_remove(self):
+        self.indexes["cn"].remove(self.b)
+        self.assertEqual([], self.candidates("(cn=alias)"))
+        self.assertEqual([self.a], self.candidates("(cn=*)"))
+        self.assertEqual({"a"}, set(self.indexes["cn"].values))
+
+    def test_selectivity(self):
+        def selectivity(filterText):
+            return attributeindex.selectivity(
+                self.indexes, ldapfilter.parseFilter(filterText)
+            )
+
+        self.assertEqual(1.0, selectivity("(objectClass=*)"))
+        self.assertEqual(2 / 3, selectivity("(cn=*)"))
+        self.assertEqual(1 / 3, selectivity("(cn=ALIAS)"))
+        self.assertEqual(0.0, selectivity("(cn=nobody)"))
+        self.assertIsNone(selectivity("(objectClass=person)"))
+        self.assertIsNone(selectivity("(sn=*)"))
+        self.assertIsNone(selectivity("(cn=a*)"))
+
+
+class TestSubstrings(unittest.TestCase):
+    def setUp(self):
+        self.index = attributeindex.AttributeIndex("cn", substring=True)
+        self.entries = {}
+        for cn in ["John Smith", "Jane Smithers", "Bob Jones", "Joan Nash"]:
+            e = entry.BaseLDAPEntry(
+                dn="cn=%s,dc=example,dc=com" % cn, attributes={"cn": [cn]}
+            )
+            self.entries[cn] = e
+            self.index.add(e)
+
+    def candidates(self, filterText):
+        found = attributeindex.candidates(
+            {"cn": self.index}, ldapfilter.parseFilter(filterText)
+        )
+        if found is None:
+            return None
+        return sorted(value for e in found.values() for value in e["cn"])
+
+    def test_initial(self):
+        self.assertEqual(["Joan Nash", "John Smith"], self.candidates("(cn=jo*)"))
+
+    def test_final(self):
+        self.assertEqual(["Jane Smithers"], self.candidates("(cn=*ERS)"))
+
+    def test_any(self):
+        self.assertEqual(["Jane Smithers", "John Smith"], self.candidates("(cn=*smi*)"))
+        self.assertEqual([], self.candidates("(cn=*xyz*)"))
+
+    def test_any_short(self):
+        """
+        Substrings shorter than a trigram do not narrow the search.
+        """
+        self.assertIsNone(self.candidates("(cn=*sm*)"))
+        self.assertEqual(["John Smith"], self.candidates("(cn=*sm*th)"))
+
+    def test_all(self):
+        self.assertEqual(["John Smith"], self.candidates("(cn=j*n s*ith)"))
+
+    def test_remove(self):
+        self.index.remove(self.entries["John Smith"])
+        self.assertEqual(["Joan Nash"], self.candidates("(cn=jo*)"))
+        self.assertEqual(["Jane Smithers"], self.candidates("(cn=*smi*)"))
+
+    def test_sharedValue(self):
+        """
+        A value stays indexed while an entry still has it.
+        """
+        other = entry.BaseLDAPEntry(
+            dn="cn=other,dc=example,dc=com", attributes={"cn": ["JOHN SMITH"]}
+        )
+        self.index.add(other)
+        self.index.remove(self.entries["John Smith"])
+        self.assertEqual(["JOHN SMITH"], self.candidates("(cn=*smi*h)"))
+
+    def test_binary(self):
+        """
+        Values that are not UTF-8 text are candidates for every substring
+        filter.
+        """
+        e = entry.BaseLDAPEntry(
+            dn="cn=binary,dc=example,dc=com", attributes={"cn": [b"\xff\xfe"]}
+        )
+        self.index.add(e)
+        found = attributeindex.candidates(
+            {"cn": self.index}, ldapfilter.parseFilter("(cn=*ERS)")
+        )
+        self.assertCountEqual([self.entries["Jane Smithers"], e], found.values())
+
+
+class TestOrderingKey(unittest.TestCase):
+    def test_integer(self):
+        key = attributeindex.orderingKey(attributeindex.INTEGER)
+        self.assertLess(key(b"9"), key("10"))
+        self.assertLess(key("-10"), key(b"-9"))
+        self.assertRaises(ValueError, key, "ten")
+
+    def test_generalizedTime(self):
+        key = attributeindex.orderingKey(attributeindex.GENERALIZED_TIME)
+        self.assertEqual(key("20210102030405Z"), key(b"202101020304Z") + 5 * SECOND)
+        self.assertEqual(key("2021010203Z"), key("2021010204+0100"))
+        self.assertEqual(key("2021010203Z"), key("2021010201-02"))
+        self.assertEqual(key("20210102033000Z"), key("2021010203.5Z"))
+        self.assertEqual(key("20210102030430Z"), key("202101020304,5Z"))
+        self.assertLess(key("19991231235959Z"), key("20000101000000Z"))
+        self.assertRaises(ValueError, key, "2021-01-02")
+        self.assertRaises(ValueError, key, "20211302030405Z")
+
+    def test_octetString(self):
+        key = attributeindex.orderingKey(attributeindex.OCTET_STRING)
+        self.assertLess(key("B"), key(b"a"))
+
+    def test_default(self):
+        """
+        Other syntaxes order text ignoring case, and accept the syntax as
+        found in schema, with a length.
+        """
+        key = attributeindex.orderingKey(b"1.3.6.1.4.1.1466.115.121.1.15{32768}")
+        self.assertLess(key("a"), key(b"B"))
+        self.assertRaises(ValueError, key, b"\xff")
+
+    def test_orderingRule(self):
+        self.assertIs(
+            attributeindex.integerKey, attributeindex.orderingRuleKey("2.5.13.15")
+        )
+        self.assertIs(
+            attributeindex.generalizedTimeKey,
+            attributeindex.orderingRuleKey(b"generalizedTimeOrderingMatch"),
+        )
+        self.assertIsNone(attributeindex.orderingRuleKey("caseExactOrderingMatch"))
+
+
+SECOND = datetime.timedelta(seconds=1)
+
+
+class TestRange(unittest.TestCase):
+    def setUp(self):
+        self.index = attributeindex.AttributeIndex(
+            "uidNumber", equality=False, ordering=attributeindex.INTEGER
+        )
+        self.entries = {}
+        for number in ["1", "2", "9", "10", "10", "100", "many"]:
+            e = entry.BaseLDAPEntry(
+                dn="cn=%d,dc=example,dc=com" % len(self.entries),
+                attributes={"uidNumber": [number]},
+            )
+            self.entries.setdefault(number, []).append(e)
+            self.index.add(e)
+
+    def candidates(self, filterText):
+        found = attributeindex.candidates(
+            {"uidnumber": self.index}, ldapfilter.parseFilter(filterText)
+        )
+        if found is None:
+            return None
+        return sorted(int(value) for e in found.values() for value in e["uidNumber"])
+
+    def test_greaterOrEqual(self):
+        self.assertEqual([9, 10, 10, 100], self.candidates("(uidNumber>=9)"))
+        self.assertEqual([], self.candidates("(uidNumber>=101)"))
+
+    def test_lessOrEqual(self):
+        self.assertEqual([1, 2, 9, 10, 10], self.candidates("(uidNumber<=10)"))
+        self.assertEqual([], self.candidates("(uidNumber<=0)"))
+
+    def test_invalidAssertion(self):
+        self.assertEqual([], self.candidates("(uidNumber>=many)"))
+
+    def test_notOrdered(self):
+        index = attributeindex.AttributeIndex("uidNumber")
+        self.assertIsNone(
+            attributeindex.candidates(
+                {"uidnumber": index}, ldapfilter.parseFilter("(uidNumber>=9)")
+            )
+        )
+
+    def test_remove(self):
+        self.index.remove(self.entries["10"][0])
+        self.assertEqual([9, 10, 100], self.candidates("(uidNumber>=9)"))
+        self.index.remove(self.entries["10"][1])
+        self.assertEqual([9, 100], self.candidates("(uidNumber>=9)"))
+
+    def values(self, groups):
+        return [
+            [sorted(int(value) for value in e["uidNumber"]) for e in group]
+            for group in groups
+        ]
+
+    def test_ordered(self):
+        """
+        Entries come in order of their least value, each once, grouped by
+        that value.
+        """
+        self.index.add(
+            entry.BaseLDAPEntry(
+                dn="cn=both,dc=example,dc=com",
+                attributes={"uidNumber": ["5", "1000"]},
+            )
+        )
+        self.assertEqual(
+            [[[1]], [[2]], [[5, 1000]], [[9]], [[10], [10]], [[100]]],
+            self.values(self.index.ordered()),
+        )
+
+    def test_ordered_reverse(self):
+        """
+        In reverse, entries come in reverse order of their greatest value.
+        """
+        self.index.add(
+            entry.BaseLDAPEntry(
+                dn="cn=both,dc=example,dc=com",
+                attributes={"uidNumber": ["5", "1000"]},
+            )
+        )
+        self.assertEqual(
+            [[[5, 1000]], [[100]], [[10], [10]], [[9]], [[2]], [[1]]],
+            self.values(self.index.ordered(reverse=True)),
+        )
+
+    def test_ordered_changed(self):
+        """
+        Values may be added and removed while the entries are taken.
+        """
+        ordered = self.index.ordered()
+        self.assertEqual(self.entries["1"], next(ordered))
+        self.index.remove(self.entries["2"][0])
+        e = entry.BaseLDAPEntry(
+            dn="cn=new,dc=example,dc=com", attributes={"uidNumber": ["50"]}
+        )
+        self.index.add(e)
+        self.assertEqual(
+            [self.entries["9"], self.entries["10"], [e], self.entries["100"]],
+            list(ordered),
+        )
+
+    def test_hasOrderedValue(self):
+        self.assertTrue(self.index.hasOrderedValue(self.entries["1"][0]))
+        self.assertFalse(self.index.hasOrderedValue(self.entries["many"][0]))
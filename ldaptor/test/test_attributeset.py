@@ -178,3 +178,63 @@ class TestLDAPAttributeSet(unittest.TestCase):
         a.update("x")
         self.assertEqual(a, {"a", m1, "x"})
         self.assertEqual(b, {"a", m1})
+
+    def testOnChange(self):
+        """
+        onChange is called with the set after each change of its values.
+        """
+        changed = []
+        a = attributeset.LDAPAttributeSet("k", ["b", "c"])
+        a.onChange = changed.append
+        a.add("d")
+        a.remove("b")
+        a.discard("x")
+        a.update(["e"])
+        a |= {"f"}
+        a -= {"f"}
+        a.intersection_update({"c", "d"})
+        a.pop()
+        a.clear()
+        self.assertEqual([a] * 9, changed)
+
+    def testOnChange_notCopied(self):
+        a = attributeset.LDAPAttributeSet("k", ["b", "c"])
+        a.onChange = self.fail
+        b = a.copy()
+        b.add("d")
+        self.assertIsNone(b.onChange)
+
+    def testNormalized(self):
+        """
+        normalized() has the values lowercased, as text where they are
+        UTF-8 bytes.
+        """
+        a = attributeset.LDAPAttributeSet(
+            "k", ["Foo", "Jörg".encode("utf-8"), b"\xffX", 4]
+        )
+        self.assertEqual({"foo", "jörg", b"\xffx", 4}, a.normalized())
+
+    def testNormalized_cached(self):
+        a = attributeset.LDAPAttributeSet("k", ["Foo"])
+        self.assertIs(a.normalized(), a.normalized())
+
+    def testNormalized_changed(self):
+        """
+        normalized() follows changes of the values.
+        """
+        a = attributeset.LDAPAttributeSet("k", ["Foo"])
+        a.normalized()
+        a.add("Bar")
+        self.assertEqual({"foo", "bar"}, a.normalized())
+        a -= {"Foo"}
+        self.assertEqual({"bar"}, a.normalized())
+        a.clear()
+        self.assertEqual(frozenset(), a.normalized())
+
+    def testNormalized_copy(self):
+        a = attributeset.LDAPAttributeSet("k", ["Foo"])
+        a.normalized()
+        b = a.copy()
+        b.add("Bar")
+        self.assertEqual({"foo"}, a.normalized())
+        self.assertEqual({"foo", "bar"}, b.normalized())
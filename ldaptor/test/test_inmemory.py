@@ -1,11 +1,13 @@
 """
 Test cases for ldaptor.inmemory module.
 """
+import sys
 from io import BytesIO
 
 from twisted.trial import unittest
 
-from ldaptor import inmemory, delta, testutil
+from ldaptor import attributeindex, entryhelpers, inmemory, delta, ldapfilter, testutil
+from ldaptor.protocols import pureldap
 from ldaptor.protocols.ldap import distinguishedname, ldaperrors
 
 
@@ -159,6 +161,14 @@ class TestInMemoryDatabase(unittest.TestCase):
             },
         )
 
+    def test_addChild_Exists_ignoresCase(self):
+        self.assertRaises(
+            ldaperrors.LDAPEntryAlreadyExists,
+            self.meta.addChild,
+            rdn="CN=Foo",
+            attributes={"objectClass": ["a"], "cn": "Foo"},
+        )
+
     def test_addChild_subclass(self):
         """
         Adding child to ReadOnlyInMemoryLDAPEntry subclass instance
@@ -289,6 +299,52 @@ class TestInMemoryDatabase(unittest.TestCase):
         d.addCallback(self.assertEqual, self.bar)
         return d
 
+    def test_lookup_ignoresCase(self):
+        d = self.root.lookup("CN=Bar,ou=MetaSyntactic,dc=example,dc=com")
+        self.assertIs(self.bar, self.successResultOf(d))
+
+    def test_lookup_fail_noParent(self):
+        """
+        Looking up an entry below a missing entry fails with the DN
+        looked up.
+        """
+        dn = distinguishedname.DistinguishedName(
+            "cn=foo,cn=thud,ou=metasyntactic,dc=example,dc=com"
+        )
+        failure = self.failureResultOf(
+            self.root.lookup(dn), ldaperrors.LDAPNoSuchObject
+        )
+        self.assertEqual(failure.value.message, dn)
+
+    def test_lookup_fromChild(self):
+        d = self.meta.lookup("cn=bar,ou=metasyntactic,dc=example,dc=com")
+        self.assertIs(self.bar, self.successResultOf(d))
+        self.assertIs(
+            self.meta,
+            self.successResultOf(
+                self.meta.lookup("ou=metasyntactic,dc=example,dc=com")
+            ),
+        )
+
+    def test_lookup_manyChildren(self):
+        """
+        Children are found by their RDN, without comparing the DN of every
+        sibling.
+        """
+        for i in range(100):
+            self.empty.addChild(rdn="cn=%d" % i, attributes={"objectClass": ["a"]})
+        compared = []
+        contains = distinguishedname.DistinguishedName.contains
+
+        def countingContains(dn, other):
+            compared.append(dn)
+            return contains(dn, other)
+
+        self.patch(distinguishedname.DistinguishedName, "contains", countingContains)
+        e = self.successResultOf(self.root.lookup("cn=99,ou=empty,dc=example,dc=com"))
+        self.assertEqual("cn=99,ou=empty,dc=example,dc=com", e.dn.getText())
+        self.assertEqual([self.root.dn], compared)
+
     def test_delete_root(self):
         newRoot = inmemory.ReadOnlyInMemoryLDAPEntry(
             dn=distinguishedname.DistinguishedName("dc=example,dc=com")
@@ -324,6 +380,13 @@ class TestInMemoryDatabase(unittest.TestCase):
         d.addCallback(lambda actual: self.assertCountEqual(actual, [self.foo]))
         return d
 
+    def test_deleteChild_ignoresCase(self):
+        self.assertIs(self.bar, self.successResultOf(self.meta.deleteChild("CN=BAR")))
+        self.failureResultOf(
+            self.root.lookup("cn=bar,ou=metasyntactic,dc=example,dc=com"),
+            ldaperrors.LDAPNoSuchObject,
+        )
+
     def test_deleteChild_NonExisting(self):
         d = self.root.deleteChild("cn=not-exist")
 
@@ -381,6 +444,66 @@ class TestInMemoryDatabase(unittest.TestCase):
         )
         return d
 
+    def testSearch_sizeLimit(self):
+        """
+        The search stops at the entry after the first sizeLimit matches,
+        and fails with the entries matched until then.
+        """
+        d = self.root.search(filterText="(objectClass=a)", sizeLimit=2)
+        e = self.failureResultOf(d, ldaperrors.LDAPSizeLimitExceeded).value
+        self.assertEqual(2, len(e.results))
+
+    def testSearch_sizeLimit_withCallback(self):
+        got = []
+        d = self.root.search(
+            filterText="(objectClass=a)", sizeLimit=2, callback=got.append
+        )
+        self.failureResultOf(d, ldaperrors.LDAPSizeLimitExceeded)
+        self.assertEqual(2, len(got))
+
+    def testSearch_sizeLimit_notExceeded(self):
+        """
+        Finding exactly sizeLimit entries is not an error.
+        """
+        d = self.root.search(filterText="(objectClass=a)", sizeLimit=6)
+        self.assertEqual(6, len(self.successResultOf(d)))
+
+    def testSearch_timeLimit(self):
+        """
+        The search stops once timeLimit seconds have passed, and fails with
+        the entries matched until then.
+        """
+        clock = iter(range(100))
+        self.patch(entryhelpers, "_seconds", lambda: next(clock))
+        d = self.root.search(filterText="(objectClass=a)", timeLimit=3)
+        e = self.failureResultOf(d, ldaperrors.LDAPTimeLimitExceeded).value
+        # The root entry does not match.
+        self.assertEqual(1, len(e.results))
+
+    def testSearchEntries(self):
+        """
+        searchEntries() matches the entries in scope as it is consumed.
+        """
+        entries = self.root.searchEntries(filterText="(objectClass=a)")
+        self.assertEqual(self.meta, next(entries))
+        self.meta.addChild(rdn="cn=baz", attributes={"objectClass": ["a"]})
+        self.assertEqual(
+            ["cn=foo", "cn=bar", "cn=baz", "ou=empty", "ou=oneChild", "cn=theChild"],
+            [e.dn.split()[0].getText() for e in entries],
+        )
+
+    def testSearchEntries_unmatched(self):
+        """
+        With unmatched, searchEntries() yields None for the entries in
+        scope that do not match.
+        """
+        entries = self.root.searchEntries(
+            filterText="(ou=oneChild)",
+            scope=pureldap.LDAP_SCOPE_singleLevel,
+            unmatched=True,
+        )
+        self.assertEqual([None, None, self.oneChild], list(entries))
+
     def test_move_noChildren_sameSuperior(self):
         d = self.empty.move("ou=moved,dc=example,dc=com")
 
@@ -514,6 +637,481 @@ class TestInMemoryDatabase(unittest.TestCase):
         self.assertTrue(d.called)
 
 
+class TestIterateScope(unittest.TestCase):
+    def setUp(self):
+        self.root = inmemory.ReadOnlyInMemoryLDAPEntry(dn="dc=example,dc=com")
+        self.a = self.root.addChild(rdn="ou=a", attributes={})
+        self.a1 = self.a.addChild(rdn="cn=1", attributes={})
+        self.a2 = self.a.addChild(rdn="cn=2", attributes={})
+        self.b = self.root.addChild(rdn="ou=b", attributes={})
+        self.b1 = self.b.addChild(rdn="cn=1", attributes={})
+
+    def iterate(self, scope):
+        return list(entryhelpers.iterateScope(self.root, scope))
+
+    def test_base(self):
+        self.assertEqual([self.root], self.iterate(pureldap.LDAP_SCOPE_baseObject))
+
+    def test_singleLevel(self):
+        self.assertEqual(
+            [self.a, self.b], self.iterate(pureldap.LDAP_SCOPE_singleLevel)
+        )
+
+    def test_subtree(self):
+        """
+        Each entry comes before the entries below it, and after the
+        subtrees of its preceding siblings.
+        """
+        self.assertEqual(
+            [self.root, self.a, self.a1, self.a2, self.b, self.b1],
+            self.iterate(pureldap.LDAP_SCOPE_wholeSubtree),
+        )
+
+    def test_lazy(self):
+        """
+        Entries added below entries not walked yet are found.
+        """
+        entries = entryhelpers.iterateScope(self.root, pureldap.LDAP_SCOPE_wholeSubtree)
+        self.assertEqual([self.root, self.a], [next(entries), next(entries)])
+        self.a.addChild(rdn="cn=0", attributes={})
+        self.b.addChild(rdn="cn=2", attributes={})
+        self.assertEqual(6, len(list(entries)))
+
+    def test_unknownScope(self):
+        self.assertRaises(ldaperrors.LDAPProtocolError, self.iterate, 42)
+
+    def test_deep(self):
+        """
+        Subtrees deeper than the recursion limit can be searched.
+        """
+        e = self.b1
+        for i in range(sys.getrecursionlimit() + 10):
+            e = e.addChild(rdn="cn=%d" % i, attributes={"objectClass": ["deep"]})
+        results = self.successResultOf(self.root.search("(objectClass=deep)"))
+        self.assertEqual(sys.getrecursionlimit() + 10, len(results))
+        self.assertIs(e, results[-1])
+
+
+class MatchCountingEntry(inmemory.ReadOnlyInMemoryLDAPEntry):
+    """
+    Record the entries matched against a filter.
+    """
+
+    matched = set()
+
+    def match(self, filter):
+        MatchCountingEntry.matched.add(id(self))
+        return super().match(filter)
+
+
+class TestIndexes(unittest.TestCase):
+    def setUp(self):
+        MatchCountingEntry.matched = set()
+        self.root = MatchCountingEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        self.people = self.root.addChild(
+            rdn="ou=People",
+            attributes={"objectClass": ["organizationalUnit"], "ou": ["People"]},
+        )
+        self.root.addIndex("uid")
+        self.root.addIndex("objectClass", equality=False)
+        self.people.addIndex("mail", substring=True)
+        self.users = [
+            self.people.addChild(
+                rdn="uid=user%d" % i,
+                attributes={
+                    "objectClass": ["person"],
+                    "uid": ["user%d" % i],
+                    "mail": ["user%d@example.com" % (i % 5)],
+                },
+            )
+            for i in range(20)
+        ]
+
+    def search(self, filterText, base=None, **kw):
+        if base is None:
+            base = self.root
+        MatchCountingEntry.matched = set()
+        return self.successResultOf(base.search(filterText=filterText, **kw))
+
+    def test_equality(self):
+        """
+        An equality filter on an indexed attribute only matches the entries
+        having the value.
+        """
+        self.assertEqual([self.users[3]], self.search("(uid=user3)"))
+        self.assertEqual(1, len(MatchCountingEntry.matched))
+
+    def test_equality_ignoresCase(self):
+        self.assertEqual([self.users[3]], self.search("(UID=USER3)"))
+        self.assertEqual(1, len(MatchCountingEntry.matched))
+
+    def test_equality_noMatch(self):
+        self.assertEqual([], self.search("(uid=nobody)"))
+        self.assertEqual(0, len(MatchCountingEntry.matched))
+
+    def test_presence(self):
+        self.assertCountEqual(self.users, self.search("(uid=*)"))
+        self.assertEqual(20, len(MatchCountingEntry.matched))
+
+    def test_and(self):
+        """
+        An AND filter matches the entries found by its narrowest indexed
+        term against the whole filter.
+        """
+        self.assertEqual(
+            [self.users[7]],
+            self.search("(&(objectClass=*)(mail=user2@example.com)(uid=user7))"),
+        )
+        self.assertEqual(1, len(MatchCountingEntry.matched))
+
+    def test_and_unindexed(self):
+        self.assertEqual([self.users[3]], self.search("(&(uid=user3)(!(cn=*)))"))
+        self.assertEqual(1, len(MatchCountingEntry.matched))
+
+    def test_or(self):
+        self.assertCountEqual(
+            [self.users[i] for i in (1, 2, 6, 11, 16)],
+            self.search("(|(uid=user1)(mail=user1@example.com)(uid=user2))"),
+        )
+        self.assertEqual(5, len(MatchCountingEntry.matched))
+
+    def test_or_unindexed(self):
+        """
+        An OR filter with a term that is not indexed matches every entry.
+        """
+        self.assertCountEqual(
+            [self.people, self.users[1]], self.search("(|(uid=user1)(ou=People))")
+        )
+        self.assertEqual(22, len(MatchCountingEntry.matched))
+
+    def test_substring(self):
+        self.assertCountEqual(
+            [self.users[i] for i in (2, 7, 12, 17)],
+            self.search("(&(mail=*2@example*)(uid=user*))"),
+        )
+        self.assertEqual(4, len(MatchCountingEntry.matched))
+        self.assertEqual([self.users[12]], self.search("(&(mail=user2*)(uid=user12))"))
+        self.assertEqual(1, len(MatchCountingEntry.matched))
+
+    def test_scope(self):
+        self.assertEqual([], self.search("(uid=user1)", base=self.users[2]))
+        self.assertEqual(
+            [self.users[1]],
+            self.search(
+                "(uid=user1)",
+                base=self.people,
+                scope=pureldap.LDAP_SCOPE_singleLevel,
+            ),
+        )
+        self.assertEqual(
+            [],
+            self.search(
+                "(uid=user1)", base=self.root, scope=pureldap.LDAP_SCOPE_singleLevel
+            ),
+        )
+
+    def test_addChild(self):
+        user = self.people.addChild(
+            rdn="uid=new", attributes={"objectClass": ["person"], "uid": ["new"]}
+        )
+        self.assertEqual([user], self.search("(uid=new)"))
+
+    def test_delete(self):
+        self.successResultOf(self.users[3].delete())
+        self.assertEqual([], self.search("(uid=user3)"))
+        self.assertEqual(0, len(MatchCountingEntry.matched))
+
+    def test_delete_detached(self):
+        """
+        Editing a deleted entry does not add it to the indexes again.
+        """
+        self.successResultOf(self.users[3].delete())
+        self.users[3]["uid"] = ["user3"]
+        self.assertEqual([], self.search("(uid=user3)"))
+
+    def test_deleteChild_subtree(self):
+        self.successResultOf(self.root.deleteChild("ou=People"))
+        self.assertEqual([self.root], self.search("(objectClass=*)"))
+
+    def test_move(self):
+        self.successResultOf(self.users[3].move("uid=moved,dc=example,dc=com"))
+        self.assertEqual([], self.search("(uid=user3)"))
+        self.assertEqual([self.users[3]], self.search("(uid=moved)"))
+        self.assertEqual([], self.search("(uid=moved)", base=self.people))
+        self.assertIs(
+            self.users[3],
+            self.successResultOf(self.root.lookup("uid=moved,dc=example,dc=com")),
+        )
+        self.assertIs(self.root, self.users[3].parent())
+
+    def test_move_existing(self):
+        """
+        Moving an entry onto the RDN of a sibling fails, and changes
+        neither the tree nor the indexes.
+        """
+        dn = self.users[4].dn.getText()
+        self.failureResultOf(self.users[3].move(dn), ldaperrors.LDAPEntryAlreadyExists)
+        self.assertIs(self.users[4], self.successResultOf(self.root.lookup(dn)))
+        self.assertIs(
+            self.users[3],
+            self.successResultOf(self.root.lookup(self.users[3].dn)),
+        )
+        self.assertEqual([self.users[3]], self.search("(uid=user3)"))
+        self.assertEqual([self.users[4]], self.search("(uid=user4)"))
+        self.assertEqual(20, len(self.search("(uid=*)")))
+
+    def test_setitem(self):
+        self.users[3]["uid"] = ["renamed"]
+        self.assertEqual([], self.search("(uid=user3)"))
+        self.assertEqual([self.users[3]], self.search("(uid=renamed)"))
+
+    def test_delitem(self):
+        del self.users[3]["uid"]
+        self.assertEqual([], self.search("(uid=user3)"))
+        self.assertEqual(19, len(self.search("(uid=*)")))
+
+    def test_editValues(self):
+        """
+        Changing the values of an attribute in place updates the indexes.
+        """
+        self.users[3]["uid"].add("alias")
+        self.users[4]["uid"].remove("user4")
+        self.users[5]["uid"] |= {"other"}
+        self.assertEqual([self.users[3]], self.search("(uid=alias)"))
+        self.assertEqual([], self.search("(uid=user4)"))
+        self.assertEqual([self.users[5]], self.search("(uid=other)"))
+
+    def test_modify(self):
+        op = delta.ModifyOp(
+            self.users[3].dn,
+            [
+                delta.Add("uid", ["added"]),
+                delta.Delete("mail", ["user3@example.com"]),
+            ],
+        )
+        self.successResultOf(op.patch(self.root))
+        self.assertEqual([self.users[3]], self.search("(uid=added)"))
+        self.assertCountEqual(
+            [self.users[8], self.users[13], self.users[18]],
+            self.search("(mail=user3@example.com)"),
+        )
+
+    def test_plan(self):
+        """
+        Searches order the terms of AND filters by the selectivity the
+        indexes estimate.
+        """
+        f = ldapfilter.parseFilter("(&(objectClass=*)(mail=*)(uid=user3))")
+        self.assertEqual(
+            "(&(uid=user3)(mail=*)(objectClass=*))",
+            entryhelpers.planFilter(f, self.root._filterSelectivity).asText(),
+        )
+        self.assertEqual([self.users[3]], self.search(f.asText()))
+
+    def test_ordering(self):
+        """
+        An ordering index finds the entries in a range of the order of
+        the syntax of the attribute.
+        """
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", ordering=True)
+        for i, user in enumerate(self.users):
+            user["uidNumber"] = [str(i * 500)]
+        self.assertEqual(
+            self.users[18:], self.search("(uidNumber>=9000)", base=self.people)
+        )
+        self.assertEqual(2, len(MatchCountingEntry.matched))
+        self.assertEqual(
+            self.users[:2], self.search("(uidNumber<=950)", base=self.people)
+        )
+        self.assertEqual(2, len(MatchCountingEntry.matched))
+
+    def test_ordering_generalizedTime(self):
+        self.root.setSyntax("validUntil", attributeindex.GENERALIZED_TIME)
+        self.root.addIndex("validUntil", ordering=True)
+        self.users[3]["validUntil"] = ["20210101120000Z"]
+        self.users[4]["validUntil"] = ["202101011300+0200"]
+        self.users[5]["validUntil"] = ["not a time"]
+        self.assertEqual(
+            [self.users[3]],
+            self.search("(validUntil>=20210101113000Z)", base=self.people),
+        )
+        self.assertEqual(
+            [self.users[4]],
+            self.search("(validUntil<=20210101113000Z)", base=self.people),
+        )
+
+    def test_ordering_unindexed(self):
+        """
+        Ranges compare values in the order of the syntax of the attribute
+        with or without an ordering index.
+        """
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        for i, user in enumerate(self.users):
+            user["uidNumber"] = [str(i * 500)]
+        filters = ["(uidNumber>=9000)", "(uidNumber<=950)", "(uidNumber>=abc)"]
+        unindexed = [self.search(f, base=self.people) for f in filters]
+        self.assertEqual([self.users[18:], self.users[:2], []], unindexed)
+        self.root.addIndex("uidNumber", ordering=True)
+        self.assertEqual(unindexed, [self.search(f, base=self.people) for f in filters])
+
+    def test_ordering_noSyntax(self):
+        """
+        Without a syntax, ranges compare values themselves, and the
+        attribute cannot have an ordering index.
+        """
+        for i, user in enumerate(self.users):
+            user["uidNumber"] = [str(i * 500)]
+        self.assertCountEqual(
+            self.users[:19], self.search("(uidNumber<=950)", base=self.people)
+        )
+        self.assertRaises(ValueError, self.root.addIndex, "uidNumber", ordering=True)
+
+    def test_setSyntax(self):
+        """
+        Setting the syntax of an attribute with an ordering index indexes
+        it again in the order of the new syntax.
+        """
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", ordering=True)
+        for i, user in enumerate(self.users):
+            user["uidNumber"] = [str(i * 500)]
+        self.root.setSyntax("uidNumber", attributeindex.OCTET_STRING)
+        self.assertCountEqual(
+            self.users[:19], self.search("(uidNumber<=950)", base=self.people)
+        )
+
+    def sorted(self, sortKeys, filterText="(objectClass=person)", base=None, **kw):
+        if base is None:
+            base = self.root
+        MatchCountingEntry.matched = set()
+        return base.searchEntries(filterText=filterText, sortKeys=sortKeys, **kw)
+
+    def sortedByIndex(self):
+        numbers = {}
+        for i, user in enumerate(self.users):
+            numbers[user.dn] = i * 7 % 20
+            user["uidNumber"] = [str(numbers[user.dn])]
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", equality=False, ordering=True)
+        return sorted(self.users, key=lambda user: numbers[user.dn])
+
+    def test_sorted(self):
+        """
+        Entries sorted by a key with an ordering index are taken from the
+        index in order, and only matched as they are needed.
+        """
+        expected = self.sortedByIndex()
+        entries = self.sorted([("uidNumber", None, False)])
+        self.assertEqual(expected[:3], [next(entries) for _ in range(3)])
+        self.assertEqual(3, len(MatchCountingEntry.matched))
+        self.assertEqual(expected[3:], list(entries))
+
+    def test_sorted_reverse(self):
+        """
+        Entries without a value of the sort key come last, or first in
+        reverse order.
+        """
+        expected = self.sortedByIndex()
+        del expected[0]["uidNumber"]
+        expected.append(expected.pop(0))
+        self.assertEqual(expected, list(self.sorted([("uidNumber", None, False)])))
+        # The entry without a value is now first.
+        expected.reverse()
+        self.assertEqual(expected, list(self.sorted([("uidNumber", None, True)])))
+
+    def test_sorted_scope(self):
+        expected = self.sortedByIndex()
+        self.people.addChild(
+            rdn="ou=Other",
+            attributes={"objectClass": ["person"], "uidNumber": ["0"]},
+        ).addChild(
+            rdn="uid=other",
+            attributes={"objectClass": ["person"], "uidNumber": ["0"]},
+        )
+        self.assertEqual(
+            expected,
+            [
+                e
+                for e in self.sorted(
+                    [("uidNumber", None, False)],
+                    base=self.people,
+                    scope=pureldap.LDAP_SCOPE_singleLevel,
+                )
+                if e.dn.getText() != "ou=Other,ou=People,dc=example,dc=com"
+            ],
+        )
+
+    def test_sorted_keys(self):
+        """
+        Entries with the same value of the indexed key are ordered by the
+        other keys.
+        """
+        for i, user in enumerate(self.users):
+            user["uidNumber"] = [str(i % 2)]
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", equality=False, ordering=True)
+        byUid = sorted(self.users, key=lambda user: user.dn, reverse=True)
+        expected = [u for u in byUid if self.users.index(u) % 2 == 0] + [
+            u for u in byUid if self.users.index(u) % 2 == 1
+        ]
+        self.assertEqual(
+            expected,
+            list(self.sorted([("uidNumber", None, False), ("uid", None, True)])),
+        )
+
+    def test_sorted_unindexed(self):
+        """
+        Entries sorted by a key without an ordering index, or with another
+        ordering rule, are sorted after being matched.
+        """
+        expected = self.sortedByIndex()
+        entries = self.sorted([("uidNumber", "caseIgnoreOrderingMatch", False)])
+        # Every entry in scope.
+        self.assertEqual(22, len(MatchCountingEntry.matched))
+        self.assertEqual(
+            sorted(expected, key=lambda user: str(expected.index(user))),
+            list(entries),
+        )
+
+    def test_sorted_limit(self):
+        expected = self.sortedByIndex()
+        candidates = self.users[3:6]
+        self.assertEqual(
+            sorted(candidates, key=expected.index)[:2],
+            list(
+                self.sorted(
+                    [("uidNumber", None, False)],
+                    "(|(uid=user3)(uid=user4)(uid=user5))",
+                    limit=2,
+                )
+            ),
+        )
+
+    def test_sorted_candidates(self):
+        """
+        With a limit, entries are taken from the ordering index even if
+        another index finds candidates, unless there are fewer of those
+        than the index would walk.
+        """
+        expected = self.sortedByIndex()
+        entries = self.sorted([("uidNumber", None, False)], "(uid=*)", limit=2)
+        self.assertEqual(expected[:2], [next(entries) for _ in range(2)])
+        self.assertEqual(2, len(MatchCountingEntry.matched))
+
+        entries = self.sorted(
+            [("uidNumber", None, False)], "(|(uid=user3)(uid=user4))", limit=2
+        )
+        self.assertEqual(
+            sorted(self.users[3:5], key=expected.index),
+            [next(entries) for _ in range(2)],
+        )
+        # Only the candidates.
+        self.assertEqual(2, len(MatchCountingEntry.matched))
+
+
 class FromLDIF(unittest.TestCase):
     def test_single(self):
         ldif = BytesIO(
@@ -121,6 +121,26 @@ class SendTests(unittest.TestCase):
         d.addCallback(cb_)
         return d
 
+    def test_response_split_across_reads(self):
+        """
+        A response delivered in several reads is handled once complete.
+        """
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        d = client.send_multiResponse(op, None)
+        (msg_id,) = client.onwire
+        entry = pureldap.LDAPSearchResultEntry(
+            objectName="cn=foo,ou=people,dc=example,dc=org",
+            attributes=[
+                ("member", ["uid=%d,dc=example,dc=org" % i for i in range(50)])
+            ],
+        )
+        resp_bytestring = pureldap.LDAPMessage(entry, id=msg_id).toWire()
+        for i in range(0, len(resp_bytestring), 7):
+            self.assertNoResult(d)
+            client.dataReceived(resp_bytestring[i : i + 7])
+        self.assertEqual(entry.toWire(), self.successResultOf(d).toWire())
+
     def test_unbind(self):
         client, transport = self.create_test_client()
         client.unbind()
@@ -229,6 +249,42 @@ class SendTests(unittest.TestCase):
         client.dataReceived(resp_bytestring)
         self.assertEqual((response.value, response.controls), self.successResultOf(d))
 
+    def test_send_multiResponse_raw(self):
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        responses = []
+
+        def collect_response(envelope):
+            responses.append(envelope)
+            return envelope.tag == pureldap.LDAPSearchResultDone.tag
+
+        client.send_multiResponse_raw(op, collect_response)
+        (msg_id,) = client.onwire
+        entry = pureldap.LDAPMessage(
+            pureldap.LDAPSearchResultEntry("cn=foo,ou=baz,dc=example,dc=net", {}),
+            id=msg_id,
+        ).toWire()
+        done = pureldap.LDAPMessage(
+            pureldap.LDAPSearchResultDone(0),
+            id=msg_id,
+            controls=self.create_paged_search_controls(0, "magic"),
+        ).toWire()
+        client.dataReceived(entry + done)
+
+        self.assertEqual([entry, done], [r.toWire() for r in responses])
+        self.assertEqual({}, client.onwire)
+        self.assertEqual(set(), client.rawResponses)
+
+        # Responses to other requests are still decoded.
+        d = client.send(pureldap.LDAPBindRequest())
+        (msg_id,) = client.onwire
+        client.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPBindResponse(resultCode=0), id=msg_id
+            ).toWire()
+        )
+        self.assertIsInstance(self.successResultOf(d), pureldap.LDAPBindResponse)
+
     def test_send_noResponse(self):
         client, transport = self.create_test_client()
         op = pureldap.LDAPAbandonRequest(id=1)
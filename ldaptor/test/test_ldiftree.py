@@ -1037,6 +1037,14 @@ objectClass: top
         )
         return d
 
+    def testSearch_sizeLimit(self):
+        got = []
+        d = self.example.search(
+            filterText="(objectClass=a)", sizeLimit=3, callback=got.append
+        )
+        self.failureResultOf(d, ldaperrors.LDAPSizeLimitExceeded)
+        self.assertEqual(3, len(got))
+
     def testCompareOtherTypes(self):
         """
         It can't be compared with other types.
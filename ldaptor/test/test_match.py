@@ -1,13 +1,14 @@
 """
 Test cases for ldaptor.protocols.ldap.ldapserver module.
 """
+import collections
 import re
 
 import attr
 from twisted.trial import unittest
-from ldaptor import inmemory
+from ldaptor import attributeindex, entryhelpers, inmemory, ldapfilter
 from ldaptor.protocols import pureldap, pureber
-from ldaptor.protocols.ldap import ldapsyntax
+from ldaptor.protocols.ldap import ldaperrors, ldapsyntax
 
 
 class TestEntryMatch(unittest.TestCase):
@@ -584,5 +585,282 @@ class TestEntryMatch(unittest.TestCase):
         )
 
 
+class TestCompileFilter(unittest.TestCase):
+    def setUp(self):
+        self.entry = inmemory.ReadOnlyInMemoryLDAPEntry(
+            dn="cn=foo,dc=example,dc=com",
+            attributes={
+                "objectClass": ["a"],
+                "cn": ["Foo", "abcXYZd"],
+                "num": ["5"],
+                "raw": [b"Bar"],
+            },
+        )
+
+    def match(self, filterText):
+        return entryhelpers.compileFilter(ldapfilter.parseFilter(filterText))(
+            self.entry
+        )
+
+    def test_cached(self):
+        """
+        Filters with the same encoding share their compiled function.
+        """
+        a = entryhelpers.compileFilter(ldapfilter.parseFilter("(cn=foo)"))
+        b = entryhelpers.compileFilter(
+            pureldap.LDAPFilter_equalityMatch(
+                attributeDesc=pureldap.LDAPAttributeDescription(b"cn"),
+                assertionValue=pureldap.LDAPAssertionValue(b"foo"),
+            )
+        )
+        self.assertIs(a, b)
+        self.assertTrue(b(self.entry))
+
+    def test_cacheSize(self):
+        self.patch(entryhelpers, "COMPILED_FILTERS", 2)
+        self.patch(entryhelpers, "_compiledFilters", collections.OrderedDict())
+        a = entryhelpers.compileFilter(ldapfilter.parseFilter("(cn=a)"))
+        entryhelpers.compileFilter(ldapfilter.parseFilter("(cn=b)"))
+        self.assertIs(a, entryhelpers.compileFilter(ldapfilter.parseFilter("(cn=a)")))
+        entryhelpers.compileFilter(ldapfilter.parseFilter("(cn=c)"))
+        self.assertEqual(2, len(entryhelpers._compiledFilters))
+        self.assertIs(a, entryhelpers.compileFilter(ldapfilter.parseFilter("(cn=a)")))
+
+    def test_bytesAndText(self):
+        """
+        Assertion values and attribute values match whether they are
+        bytes or text.
+        """
+        self.assertTrue(self.match("(raw=bar)"))
+        self.assertTrue(self.match("(raw=b*r)"))
+        self.assertTrue(self.match("(raw>=B)"))
+        self.assertTrue(self.match("(cn=f*)"))
+        f = pureldap.LDAPFilter_substrings(
+            type=b"cn",
+            substrings=[pureldap.LDAPFilter_substrings_final(b"OO")],
+        )
+        self.assertTrue(entryhelpers.compileFilter(f)(self.entry))
+
+    def test_substrings_order(self):
+        """
+        The substrings of a filter match in order, without overlapping,
+        between the initial and final substrings.
+        """
+        self.assertTrue(self.match("(cn=ab*XYZ*d)"))
+        self.assertFalse(self.match("(cn=*xyz*xyz*)"))
+        self.assertFalse(self.match("(cn=abc*cxy*)"))
+        self.assertFalse(self.match("(cn=*yz*zd)"))
+        self.assertFalse(self.match("(cn=foo*oo)"))
+
+    def test_notImplemented_notReached(self):
+        """
+        Terms that cannot be evaluated only raise when they are reached.
+        """
+        self.assertFalse(self.match("(&(cn=bar)(cn~=foo))"))
+        self.assertRaises(
+            ldapsyntax.MatchNotImplemented, self.match, "(&(cn=foo)(cn~=foo))"
+        )
+
+
+class TestPlanFilter(unittest.TestCase):
+    def plan(self, filterText, selectivity=None):
+        return entryhelpers.planFilter(
+            ldapfilter.parseFilter(filterText), selectivity
+        ).asText()
+
+    def test_unchanged(self):
+        f = ldapfilter.parseFilter("(&(a=*)(b=x))")
+        self.assertIs(f, entryhelpers.planFilter(f))
+
+    def test_and_presenceFirst(self):
+        self.assertEqual(
+            "(&(a=*)(b=x)(d=*y*)(c>=5))", self.plan("(&(c>=5)(d=*y*)(b=x)(a=*))")
+        )
+
+    def test_or(self):
+        """
+        The terms of an OR filter start with those most likely to match
+        for their cost.
+        """
+        self.assertEqual("(|(a=*)(c>=5)(b=x))", self.plan("(|(b=x)(c>=5)(a=*))"))
+
+    def test_flatten(self):
+        self.assertEqual(
+            "(&(a=*)(b=x)(|(c=y)(d=z)))",
+            self.plan("(&(|(c=y)(|(d=z)))(&(b=x)(&(a=*))))"),
+        )
+
+    def test_not(self):
+        self.assertEqual("(!(&(a=*)(b=x)))", self.plan("(!(&(b=x)(a=*)))"))
+
+    def test_lowercase(self):
+        f = entryhelpers.planFilter(ldapfilter.parseFilter("(&(cn=John Doe)(sn=x))"))
+        self.assertEqual("(&(cn=john doe)(sn=x))", f.asText())
+
+    def test_unsupportedLast(self):
+        """
+        Filters match() cannot evaluate are kept after the terms which
+        may decide the match without them.
+        """
+        self.assertEqual("(&(a=*)(b~=x))", self.plan("(&(b~=x)(a=*))"))
+        self.assertEqual("(|(a=*)(b~=x))", self.plan("(|(b~=x)(a=*))"))
+
+    def test_selectivity(self):
+        """
+        Known selectivities order the terms, so a presence filter that
+        every entry matches is tested last.
+        """
+
+        def selectivity(f):
+            return {"(objectClass=*)": 1.0, "(uid=a)": 0.001}.get(f.asText())
+
+        self.assertEqual(
+            "(&(uid=a)(cn=b)(objectClass=*))",
+            self.plan("(&(objectClass=*)(cn=b)(uid=a))", selectivity),
+        )
+
+    def test_sameMatches(self):
+        o = inmemory.ReadOnlyInMemoryLDAPEntry(
+            dn="cn=foo,dc=example,dc=com",
+            attributes={"objectClass": ["a"], "cn": ["Foo"], "num": ["5"]},
+        )
+        for text in [
+            "(&(cn=FOO)(num>=4)(objectClass=*))",
+            "(&(cn=foo)(!(num>=6)))",
+            "(|(cn=bar)(&(num<=5)(cn=*o*)))",
+            "(&(cn=bar)(cn~=foo))",
+        ]:
+            f = ldapfilter.parseFilter(text)
+            self.assertEqual(o.match(f), o.match(entryhelpers.planFilter(f)), text)
+
+
 # TODO LDAPFilter_approxMatch
 # TODO LDAPFilter_extensibleMatch
+
+
+class TestSortEntries(unittest.TestCase):
+    def setUp(self):
+        self.entries = [
+            inmemory.ReadOnlyInMemoryLDAPEntry(
+                dn="cn=%s,dc=example,dc=com" % name, attributes=attributes
+            )
+            for name, attributes in [
+                ("b", {"sn": ["Smith", "Adams"], "uidNumber": ["10"]}),
+                ("a", {"sn": ["baker"], "uidNumber": ["9"]}),
+                ("c", {"uidNumber": ["100"]}),
+                ("d", {"sn": ["Baker"], "uidNumber": ["1"]}),
+            ]
+        ]
+
+    def sort(self, sortKeys, limit=0):
+        return [
+            e.dn.split()[0].getText()
+            for e in entryhelpers.sortEntries(self.entries, sortKeys, limit)
+        ]
+
+    def test_ascending(self):
+        """
+        Entries are ordered by their least value ignoring case, and those
+        without a value come last.
+        """
+        self.assertEqual(
+            ["cn=b", "cn=a", "cn=d", "cn=c"], self.sort([("sn", None, False)])
+        )
+
+    def test_reverse(self):
+        """
+        In reverse order, entries are ordered by their greatest value, and
+        those without a value come first.
+        """
+        self.assertEqual(
+            ["cn=c", "cn=b", "cn=a", "cn=d"], self.sort([("sn", None, True)])
+        )
+
+    def test_keys(self):
+        """
+        Later sort keys order the entries the earlier ones do not.
+        """
+        self.assertEqual(
+            ["cn=b", "cn=d", "cn=a", "cn=c"],
+            self.sort([("sn", None, False), ("uidNumber", "2.5.13.15", False)]),
+        )
+        self.assertEqual(
+            ["cn=b", "cn=a", "cn=d", "cn=c"],
+            self.sort([("sn", None, False), ("uidNumber", "2.5.13.15", True)]),
+        )
+
+    def test_orderingRule(self):
+        self.assertEqual(
+            ["cn=d", "cn=a", "cn=b", "cn=c"],
+            self.sort([("uidNumber", "integerOrderingMatch", False)]),
+        )
+        self.assertEqual(
+            ["cn=d", "cn=b", "cn=c", "cn=a"], self.sort([("uidNumber", None, False)])
+        )
+
+    def test_unknownOrderingRule(self):
+        self.assertRaises(
+            ldaperrors.LDAPInappropriateMatching,
+            entryhelpers.sortKey,
+            [("sn", "caseExactOrderingMatch", False)],
+        )
+
+    def test_limit(self):
+        self.assertEqual(["cn=b", "cn=a"], self.sort([("sn", None, False)], limit=2))
+
+
+class TestListView(unittest.TestCase):
+    def setUp(self):
+        self.root = inmemory.ReadOnlyInMemoryLDAPEntry(dn="dc=example,dc=com")
+        for i in range(10):
+            self.root.addChild(
+                rdn="cn=%d" % i, attributes={"uidNumber": [str((i * 3 % 10) * 10)]}
+            )
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", ordering=True)
+
+    def view(self, reverseOrder=False):
+        sortKeys = [("uidNumber", None, reverseOrder)]
+        return entryhelpers.ListView(
+            self.root.searchEntries(filterText="(uidNumber=*)", sortKeys=sortKeys),
+            sortKeys,
+            self.root,
+        )
+
+    def numbers(self, entries):
+        return [int(list(e["uidNumber"])[0]) for e in entries]
+
+    def test_offset(self):
+        view = self.view()
+        self.assertEqual(10, len(view))
+        self.assertEqual(3, view.offset(3))
+        self.assertEqual(11, view.offset(12))
+        self.assertEqual(1, view.offset(1, 100))
+        self.assertEqual(5, view.offset(50, 100))
+        self.assertEqual(10, view.offset(100, 100))
+        self.assertEqual(10, view.offset(200, 100))
+        self.assertRaises(ldaperrors.LDAPOffsetRangeError, view.offset, 0)
+
+    def test_find(self):
+        """
+        Assertion values are ordered as the values of the first sort key,
+        here by the ordering index of the tree.
+        """
+        view = self.view()
+        self.assertEqual(10, view.find(b"90"))
+        self.assertEqual(10, view.find(b"81"))
+        self.assertEqual(1, view.find(b"-1"))
+        self.assertEqual(11, view.find(b"100"))
+
+    def test_find_reverse(self):
+        view = self.view(reverseOrder=True)
+        self.assertEqual(1, view.find(b"100"))
+        self.assertEqual(2, view.find(b"81"))
+        self.assertEqual(11, view.find(b"-1"))
+
+    def test_window(self):
+        view = self.view()
+        self.assertEqual([30, 40, 50], self.numbers(view.window(5, 1, 1)))
+        self.assertEqual([0, 10], self.numbers(view.window(1, 3, 1)))
+        self.assertEqual([80, 90], self.numbers(view.window(11, 2, 4)))
+        self.assertEqual([0], self.numbers(view.window(1, 0, 0)))
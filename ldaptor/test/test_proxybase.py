@@ -57,6 +57,54 @@ class ResponseInterceptingProxy(proxybase.ProxyBase):
         return response
 
 
+class PassThroughProxy(proxybase.ProxyBase):
+    """
+    A test LDAP proxy that passes responses on without decoding them.
+    """
+
+    passThrough = True
+
+
+class InspectingPassThroughProxy(proxybase.ProxyBase):
+    """
+    A test LDAP proxy that asks for pass-through but inspects every
+    response.
+    """
+
+    passThrough = True
+
+    def __init__(self):
+        proxybase.ProxyBase.__init__(self)
+        self.responses = []
+
+    def handleProxiedResponse(self, response, request, controls):
+        self.responses.append(response)
+        return response
+
+
+class FirstResponseDelayingProxy(proxybase.ProxyBase):
+    """
+    A test LDAP proxy that delays the first search result and returns
+    the others synchronously.
+    """
+
+    delayed = False
+
+    def handleProxiedResponse(self, response, request, controls):
+        if isinstance(response, pureldap.LDAPSearchResultEntry) and not self.delayed:
+            self.delayed = True
+            d = defer.Deferred()
+            self.reactor.callLater(3, d.callback, response)
+            return d
+        if getattr(response, "objectName", None) == "cn=fail":
+            raise SillyError()
+        return response
+
+
+class SillyError(Exception):
+    pass
+
+
 class WontConnectError(Exception):
     pass
 
@@ -161,6 +209,70 @@ class ProxyBase(unittest.TestCase):
             ).toWire(),
         )
 
+    def test_search_passThrough(self):
+        """
+        A pass-through proxy writes the responses of the proxied server
+        with their message id replaced by that of the request.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            "cn=foo,dc=example,dc=com", [("a", ["b"])]
+        )
+        server = self.createServer(
+            [pureldap.LDAPBindResponse(resultCode=0)],
+            [
+                entry,
+                pureldap.LDAPSearchResultDone(ldaperrors.Success.resultCode),
+            ],
+            protocol=PassThroughProxy,
+        )
+        server.dataReceived(
+            pureldap.LDAPMessage(pureldap.LDAPBindRequest(), id=2).toWire()
+        )
+        server.dataReceived(
+            pureldap.LDAPMessage(pureldap.LDAPSearchRequest(), id=300).toWire()
+        )
+        server.reactor.advance(1)
+        self.assertEqual(
+            server.transport.value(),
+            pureldap.LDAPMessage(pureldap.LDAPBindResponse(resultCode=0), id=2).toWire()
+            + pureldap.LDAPMessage(entry, id=300).toWire()
+            + pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(ldaperrors.Success.resultCode), id=300
+            ).toWire(),
+        )
+
+    def test_search_passThroughOverridden(self):
+        """
+        A proxy which overrides handleProxiedResponse() is given the
+        decoded responses of the proxied server even with passThrough
+        set.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            "cn=foo,dc=example,dc=com", [("a", ["b"])]
+        )
+        done = pureldap.LDAPSearchResultDone(ldaperrors.Success.resultCode)
+        server = self.createServer(
+            [pureldap.LDAPBindResponse(resultCode=0)],
+            [entry, done],
+            protocol=InspectingPassThroughProxy,
+        )
+        server.dataReceived(
+            pureldap.LDAPMessage(pureldap.LDAPBindRequest(), id=2).toWire()
+        )
+        server.dataReceived(
+            pureldap.LDAPMessage(pureldap.LDAPSearchRequest(), id=3).toWire()
+        )
+        server.reactor.advance(1)
+        self.assertEqual(
+            [pureldap.LDAPBindResponse(resultCode=0), entry, done], server.responses
+        )
+        self.assertEqual(
+            server.transport.value(),
+            pureldap.LDAPMessage(pureldap.LDAPBindResponse(resultCode=0), id=2).toWire()
+            + pureldap.LDAPMessage(entry, id=3).toWire()
+            + pureldap.LDAPMessage(done, id=3).toWire(),
+        )
+
     def test_unbind_clientUnbinds(self):
         """
         The server disconnects from the client gracefully when the
@@ -313,6 +425,52 @@ class ProxyBase(unittest.TestCase):
             ).toWire(),
         )
 
+    def test_delayed_search_response_keeps_order(self):
+        """
+        Responses which follow one whose interception is still pending
+        are held back and then written in order.
+        A response for which interception fails is logged and skipped.
+        """
+        entries = [
+            pureldap.LDAPSearchResultEntry(
+                "cn=%s,dc=example,dc=com" % name, [("cn", [name])]
+            )
+            for name in ("foo", "bar", "baz")
+        ]
+        server = self.createServer(
+            [pureldap.LDAPBindResponse(resultCode=0)],
+            [
+                entries[0],
+                entries[1],
+                pureldap.LDAPSearchResultEntry("cn=fail", []),
+                entries[2],
+                pureldap.LDAPSearchResultDone(ldaperrors.Success.resultCode),
+            ],
+            protocol=FirstResponseDelayingProxy,
+        )
+        server.dataReceived(
+            pureldap.LDAPMessage(pureldap.LDAPBindRequest(), id=2).toWire()
+        )
+        server.dataReceived(
+            pureldap.LDAPMessage(pureldap.LDAPSearchRequest(), id=3).toWire()
+        )
+        server.reactor.advance(1)
+        bindResponse = pureldap.LDAPMessage(
+            pureldap.LDAPBindResponse(resultCode=0), id=2
+        ).toWire()
+        self.assertEqual(server.transport.value(), bindResponse)
+
+        server.reactor.advance(3)
+        self.assertEqual(
+            server.transport.value(),
+            bindResponse
+            + b"".join(pureldap.LDAPMessage(entry, id=3).toWire() for entry in entries)
+            + pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(ldaperrors.Success.resultCode), id=3
+            ).toWire(),
+        )
+        self.assertEqual(1, len(self.flushLoggedErrors(SillyError)))
+
     def test_cannot_connect_to_proxied_server_no_pending_requests(self):
         """
         When making a request and the proxy cannot connect to the proxied server, the
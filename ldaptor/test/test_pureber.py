@@ -142,6 +142,62 @@ class BERDecoderContextRepr(unittest.TestCase):
         )
 
 
+class OtherContext(pureber.BERDecoderContext):
+    Identities = {
+        pureber.BERInteger.tag: pureber.BEREnumerated,
+        0x42: pureber.BERNull,
+    }
+
+
+class LookupOverridingContext:
+    def lookup_id(self, id):
+        if id == 0x43:
+            return pureber.BERBoolean
+        return None
+
+
+class BERDecoderContextLookup(unittest.TestCase):
+    """
+    Tests for looking up tags through a chain of contexts.
+    """
+
+    def testFallbackChain(self):
+        """
+        A context decodes a tag with its own class for it, or else with
+        the class its fallback chain has for it.
+        """
+        context = OtherContext(fallback=pureber.BERDecoderContext())
+
+        self.assertIs(pureber.BEREnumerated, context.lookup_id(0x02))
+        self.assertIs(pureber.BERNull, context.lookup_id(0x42))
+        self.assertIs(pureber.BEROctetString, context.lookup_id(0x04))
+        self.assertIsNone(context.lookup_id(0x43))
+        self.assertIsNone(context.lookup_id(0x1234))
+
+    def testSharedTables(self):
+        """
+        Contexts of the same class with the same fallback share their
+        dispatch table.
+        """
+        fallback = pureber.BERDecoderContext()
+        first = OtherContext(fallback=fallback)
+        second = OtherContext(fallback=fallback)
+        first.lookup_id(0x02)
+        second.lookup_id(0x02)
+
+        self.assertIs(first._dispatch, second._dispatch)
+
+    def testOverriddenLookup(self):
+        """
+        A fallback which overrides lookup_id() is asked for each tag.
+        """
+        context = OtherContext(fallback=LookupOverridingContext())
+
+        self.assertIs(pureber.BERBoolean, context.lookup_id(0x43))
+        self.assertIs(pureber.BERNull, context.lookup_id(0x42))
+        self.assertIsNone(context.lookup_id(0x04))
+
+
 class BERIntegerKnownValues(unittest.TestCase):
     knownValues = (
         (0, [0x02, 0x01, 0]),
@@ -159,6 +215,13 @@ class BERIntegerKnownValues(unittest.TestCase):
         (-129, [0x02, 0x02, 256 - 1, 256 - 129]),
         (128, [0x02, 0x02, 0, 128]),
         (256, [0x02, 0x02, 1, 0]),
+        (1023, [0x02, 0x02, 3, 255]),
+        (1024, [0x02, 0x02, 4, 0]),
+        (32767, [0x02, 0x02, 127, 255]),
+        (32768, [0x02, 0x03, 0, 128, 0]),
+        (-32768, [0x02, 0x02, 128, 0]),
+        (-32769, [0x02, 0x03, 255, 127, 255]),
+        (2 ** 63, [0x02, 0x09, 0, 128] + 7 * [0]),
     )
 
     def testToBERIntegerKnownValues(self):
@@ -561,3 +624,219 @@ class TestBERSequence(unittest.TestCase):
         self.assertEqual(
             (None, 0), pureber.berDecodeObject(pureber.BERDecoderContext(), "")
         )
+
+
+class TestMemoryViewDecoding(unittest.TestCase):
+    """
+    Tests for decoding from a memoryview.
+    """
+
+    def testNestedSequence(self):
+        """
+        Nested objects decoded from a memoryview match those decoded
+        from bytes and their values are not views into the buffer.
+        """
+        encoded = pureber.BERSequence(
+            [
+                pureber.BERInteger(-300),
+                pureber.BERSequence(
+                    [pureber.BEROctetString(b"foo"), pureber.BERBoolean(True)]
+                ),
+                pureber.BERSet([pureber.BERNull(), pureber.BEREnumerated(3)]),
+            ]
+        ).toWire()
+
+        result, used = pureber.berDecodeObject(
+            pureber.BERDecoderContext(), memoryview(encoded)
+        )
+
+        self.assertEqual(len(encoded), used)
+        self.assertEqual(encoded, result.toWire())
+        self.assertEqual(-300, result[0].value)
+        self.assertIs(type(result[1][0].value), bytes)
+        self.assertEqual(b"foo", result[1][0].value)
+
+    def testPartial(self):
+        """
+        A truncated memoryview raises BERExceptionInsufficientData.
+        """
+        encoded = pureber.BERSequence([pureber.BEROctetString(b"foo")]).toWire()
+
+        for i in range(1, len(encoded)):
+            self.assertRaises(
+                pureber.BERExceptionInsufficientData,
+                pureber.berDecodeObject,
+                pureber.BERDecoderContext(),
+                memoryview(encoded)[:i],
+            )
+
+    def testCustomFromBER(self):
+        """
+        A fromBER() defined outside of ldaptor is given its content as
+        bytes, even when decoding from a memoryview.
+        """
+
+        class Greeting(pureber.BEROctetString):
+            tag = 0x80
+
+            @classmethod
+            def fromBER(klass, tag, content, berdecoder=None):
+                assert content.startswith(b"hello")
+                assert content[0] == ord("h")
+                return klass(value=content.decode("ascii").upper(), tag=tag)
+
+        class GreetingContext(pureber.BERDecoderContext):
+            Identities = {Greeting.tag: Greeting}
+
+        encoded = pureber.BERSequence([Greeting(b"hello world")]).toWire()
+
+        result, _ = pureber.berDecodeObject(
+            GreetingContext(fallback=pureber.BERDecoderContext()),
+            memoryview(encoded),
+        )
+
+        self.assertEqual("HELLO WORLD", result[0].value)
+
+
+class TestBERFramer(unittest.TestCase):
+    """
+    Tests for splitting a byte stream into complete BER objects.
+    """
+
+    def testCompleteObjects(self):
+        """
+        Complete objects fed at once are returned in order.
+        """
+        first = pureber.BERInteger(42).toWire()
+        second = pureber.BEROctetString(b"x" * 300).toWire()
+        sut = pureber.BERFramer()
+
+        sut.feed(first + second)
+
+        self.assertEqual([first, second], list(sut))
+        self.assertEqual(0, len(sut))
+
+    def testChunkedDelivery(self):
+        """
+        An object is only returned once all of its announced length
+        has been received, even when its long form length octets are
+        split between reads.
+        """
+        encoded = pureber.BERSequence(
+            [pureber.BEROctetString(b"v" * 1000) for _ in range(70)]
+        ).toWire()
+        self.assertEqual(0x83, encoded[1])
+        sut = pureber.BERFramer()
+
+        result = []
+        for i in range(len(encoded)):
+            sut.feed(encoded[i : i + 1])
+            result.extend(sut)
+            if i < len(encoded) - 1:
+                self.assertEqual([], result)
+
+        self.assertEqual([encoded], result)
+
+    def testTrailingPartialObject(self):
+        """
+        Data following a complete object is kept until it is complete.
+        """
+        first = pureber.BERInteger(1).toWire()
+        second = pureber.BERInteger(4000).toWire()
+        sut = pureber.BERFramer()
+
+        sut.feed(first + second[:2])
+
+        self.assertEqual([first], list(sut))
+        self.assertEqual(2, len(sut))
+        sut.feed(second[2:])
+        self.assertEqual([second], list(sut))
+
+
+class TestCachedWire(unittest.TestCase):
+    """
+    Tests for BER objects whose encoding is computed once.
+    """
+
+    def testCached(self):
+        """
+        The wrapped object is encoded once, and the wrapper compares
+        and hashes like it.
+        """
+        o = pureber.BERSequence([pureber.BEROctetString(b"foo")])
+        cached = pureber.CachedWire(o)
+
+        self.assertIs(cached.toWire(), cached.toWire())
+        self.assertEqual(o.toWire(), cached.toWire())
+        self.assertEqual(len(o), len(cached))
+        self.assertEqual(o, cached)
+        self.assertEqual(cached, o)
+        self.assertEqual(hash(o), hash(cached))
+
+    def testInvalidate(self):
+        """
+        Modifying the wrapped object is only seen after invalidate().
+        """
+        inner = pureber.BEROctetString(b"foo")
+        cached = pureber.CachedWire(pureber.BERSequence([inner]))
+        before = cached.toWire()
+
+        inner.value = b"bar"
+        self.assertIs(before, cached.toWire())
+        cached.invalidate()
+
+        self.assertEqual(
+            pureber.BERSequence([pureber.BEROctetString(b"bar")]).toWire(),
+            cached.toWire(),
+        )
+
+    def testEncodeInto(self):
+        """
+        A wrapped object encoded as part of another adds its cached
+        encoding.
+        """
+        cached = pureber.CachedWire(pureber.BERInteger(5))
+        o = pureber.BERSequence([cached, pureber.BERNull()])
+
+        self.assertEqual(
+            pureber.BERSequence([pureber.BERInteger(5), pureber.BERNull()]).toWire(),
+            o.toWire(),
+        )
+
+    def testAttributes(self):
+        """
+        The wrapper has the tag and attributes of the wrapped object.
+        """
+        o = pureber.BERInteger(5, tag=0x42)
+        cached = pureber.CachedWire(o)
+
+        self.assertEqual(0x42, cached.tag)
+        self.assertEqual(0x42, cached.identification())
+        self.assertEqual(5, cached.value)
+        self.assertEqual("CachedWire(BERInteger(value=5, tag=66))", repr(cached))
+
+
+class TestEncodeInto(unittest.TestCase):
+    """
+    Tests for encoding into a list of chunks.
+    """
+
+    def testSameAsToWire(self):
+        """
+        Joining the chunks gives the bytes toWire() returns.
+        """
+        o = pureber.BERSequence(
+            [
+                pureber.BERInteger(5),
+                pureber.BERSet([pureber.BEROctetString(b"x" * 300)]),
+                ObjectWithToWireMethod(),
+                pureber.BERSequence([]),
+            ]
+        )
+        out = [b"before"]
+
+        length = o.encodeInto(out)
+
+        self.assertEqual(b"before", out[0])
+        self.assertEqual(o.toWire(), b"".join(out[1:]))
+        self.assertEqual(len(o.toWire()), length)
@@ -1,6 +1,9 @@
 """
 Test cases for ldaptor.protocols.pureldap module.
 """
+import copy
+import pickle
+
 from twisted.trial import unittest
 
 from ldaptor.protocols import pureldap, pureber
@@ -779,6 +782,23 @@ class KnownValues(unittest.TestCase):
                 repr(shouldBe),
             )
 
+    def testFromLDAPMemoryView(self):
+        """
+        Decoding from a memoryview gives the same objects as decoding
+        from bytes, with leaf values materialized as bytes.
+        """
+        for klass, args, kwargs, decoder, encoded in self.knownValues:
+            if decoder is None:
+                decoder = pureldap.LDAPBERDecoderContext(
+                    fallback=pureber.BERDecoderContext()
+                )
+            m = s(*encoded)
+            fromBytes, _ = pureber.berDecodeObject(decoder, m)
+            result, bytes = pureber.berDecodeObject(decoder, memoryview(m))
+            self.assertEqual(bytes, len(m))
+            self.assertEqual(fromBytes.toWire(), result.toWire())
+            self.assertEqual(repr(fromBytes), repr(result))
+
     def testPartial(self):
         """LDAPClass(encoded="...") with too short input should throw BERExceptionInsufficientData"""
         for klass, args, kwargs, decoder, encoded in self.knownValues:
@@ -835,6 +855,374 @@ class TestEquality(unittest.TestCase):
                     y = j_class(*j_args)
                     self.assertNotEqual(x, y)
 
+    def testModifiedFilter(self):
+        """
+        A request compares by its current value after a filter inside
+        it was modified.
+        """
+        filt = pureldap.LDAPFilter_equalityMatch(
+            attributeDesc=pureldap.LDAPAttributeDescription(value="cn"),
+            assertionValue=pureldap.LDAPAssertionValue(value="foo"),
+        )
+        x = pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com", filter=filt)
+        y = pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com", filter=filt)
+        self.assertEqual(x, y)
+        filt.assertionValue.value = "bar"
+        z = pureldap.LDAPSearchRequest(
+            baseObject="dc=example,dc=com",
+            filter=pureldap.LDAPFilter_equalityMatch(
+                attributeDesc=pureldap.LDAPAttributeDescription(value="cn"),
+                assertionValue=pureldap.LDAPAssertionValue(value="bar"),
+            ),
+        )
+        self.assertEqual(z, x)
+        self.assertEqual(hash(z), hash(y))
+
+    def testModifiedControl(self):
+        """
+        A sequence compares by its current value after a control in it,
+        which assigns to itself while it is encoded, was modified.
+        """
+        control = pureldap.LDAPControl(b"1.2.3.4", criticality=False)
+        x = pureldap.LDAPControls([control])
+        x.toWire()
+        x.toWire()
+        control.criticality = True
+        x.toWire()
+        x.toWire()
+        control.controlValue = b"value"
+        self.assertEqual(
+            pureldap.LDAPControls(
+                [pureldap.LDAPControl(b"1.2.3.4", True, b"value")]
+            ).toWire(),
+            x.toWire(),
+        )
+
+    def testModifiedAttributeList(self):
+        """
+        A request compares by its current value after the list of
+        attributes it asks for was changed in place.
+        """
+        x = pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com", attributes=[])
+        x.toWire()
+        self.assertEqual(x, pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com"))
+        x.attributes.append("cn")
+        self.assertEqual(
+            pureldap.LDAPSearchRequest(
+                baseObject="dc=example,dc=com", attributes=["cn"]
+            ).toWire(),
+            x.toWire(),
+        )
+
+
+class TestEncodeInto(unittest.TestCase):
+    """
+    Encoding LDAP messages into a list of chunks.
+    """
+
+    def tlv(self, tag, *content):
+        content = b"".join(content)
+        return bytes((tag,)) + pureber.int2berlen(len(content)) + content
+
+    def encode(self, o):
+        out = []
+        length = o.encodeInto(out)
+        self.assertEqual(len(b"".join(out)), length)
+        return b"".join(out)
+
+    def testMessages(self):
+        """
+        The chunks of a message join to the same bytes as before.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            objectName="cn=foo,dc=example,dc=com",
+            attributes=[("member", ["uid=%d" % i for i in range(200)]), ("cn", [])],
+        )
+        messages = [
+            (
+                pureldap.LDAPMessage(entry, id=1),
+                self.tlv(
+                    0x30,
+                    s(0x02, 1, 1),
+                    self.tlv(
+                        0x64,
+                        s(0x04, 24, b"cn=foo,dc=example,dc=com"),
+                        self.tlv(
+                            0x30,
+                            self.tlv(
+                                0x30,
+                                s(0x04, 6, b"member"),
+                                self.tlv(
+                                    0x31,
+                                    *[
+                                        self.tlv(0x04, b"uid=%d" % i)
+                                        for i in range(200)
+                                    ],
+                                ),
+                            ),
+                            self.tlv(0x30, s(0x04, 2, b"cn"), s(0x31, 0)),
+                        ),
+                    ),
+                ),
+            ),
+            (
+                pureldap.LDAPMessage(
+                    pureldap.LDAPSearchResultDone(0),
+                    controls=[(b"1.2.3", True, b"x"), (b"4.5", None, None)],
+                    id=2,
+                ),
+                s(
+                    0x30,
+                    36,
+                    s(0x02, 1, 2),
+                    s(0x65, 7, 0x0A, 1, 0, 0x04, 0, 0x04, 0),
+                    s(
+                        0xA0,
+                        22,
+                        s(0x30, 13, 0x04, 5, b"1.2.3", 0x01, 1, 0xFF, 0x04, 1, b"x"),
+                        s(0x30, 5, 0x04, 3, b"4.5"),
+                    ),
+                ),
+            ),
+        ]
+        for message, expected in messages:
+            self.assertEqual(expected, self.encode(message))
+            self.assertEqual(expected, message.toWire())
+
+    def testDecodedEntry(self):
+        """
+        A decoded entry encodes to the bytes it was decoded from.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            objectName="cn=foo,dc=example,dc=com",
+            attributes=[("cn", ["foo"])],
+        )
+        decoder = pureldap.LDAPBERDecoderContext(fallback=pureber.BERDecoderContext())
+        result, _ = pureber.berDecodeObject(decoder, entry.toWire())
+
+        self.assertEqual(entry.toWire(), self.encode(result))
+
+
+class TestLDAPMessageEnvelope(unittest.TestCase):
+    """
+    Tests for passing on encoded LDAP messages.
+    """
+
+    def test_envelope(self):
+        """
+        The message id and the tag of the protocolOp are decoded.
+        """
+        envelope = pureldap.LDAPMessageEnvelope(
+            pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=300).toWire()
+        )
+
+        self.assertEqual(300, envelope.id)
+        self.assertEqual(pureldap.LDAPSearchResultDone.tag, envelope.tag)
+
+    def test_withId(self):
+        """
+        withId() replaces only the message id, whatever its length.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            objectName="cn=foo,dc=example,dc=com",
+            attributes=[("cn", ["foo" * 50])],
+        )
+        controls = [(b"1.2.3", None, b"x")]
+        envelope = pureldap.LDAPMessageEnvelope(
+            pureldap.LDAPMessage(entry, controls=controls, id=300).toWire()
+        )
+
+        for id in (1, 300, 70000):
+            self.assertEqual(
+                pureldap.LDAPMessage(entry, controls=controls, id=id).toWire(),
+                envelope.withId(id),
+            )
+
+    def test_partial(self):
+        """
+        A truncated message header raises BERExceptionInsufficientData.
+        """
+        wire = pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=300).toWire()
+
+        for i in range(6):
+            self.assertRaises(
+                pureber.BERExceptionInsufficientData,
+                pureldap.LDAPMessageEnvelope,
+                wire[:i],
+            )
+
+
+class TestLDAPSearchResultEntryDecoding(unittest.TestCase):
+    """
+    Decoded search result entries decode their attributes on demand.
+    """
+
+    def decode(self, entry):
+        decoder = pureldap.LDAPBERDecoderContext(fallback=pureber.BERDecoderContext())
+        result, _ = pureber.berDecodeObject(decoder, memoryview(entry.toWire()))
+        return result
+
+    def test_objectName(self):
+        """
+        The DN is available without decoding any attribute.
+        """
+        result = self.decode(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("cn", ["foo"])],
+            )
+        )
+
+        self.assertEqual(b"cn=foo,dc=example,dc=com", result.objectName)
+        self.assertIsInstance(result.attributes, pureldap.LDAPPartialAttributeList)
+        self.assertIsNone(result.attributes._offsets)
+
+    def test_listInterface(self):
+        """
+        The attributes behave as a list of (type, [values]) tuples.
+        """
+        result = self.decode(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("objectClass", ["top", "person"]), ("cn", ["foo"])],
+            )
+        )
+        attributes = result.attributes
+
+        self.assertEqual(2, len(attributes))
+        self.assertEqual((b"cn", [b"foo"]), attributes[1])
+        self.assertEqual((b"cn", [b"foo"]), attributes[-1])
+        self.assertEqual([(b"cn", [b"foo"])], attributes[1:])
+        self.assertRaises(IndexError, lambda: attributes[2])
+        self.assertEqual(
+            [(b"objectClass", [b"top", b"person"]), (b"cn", [b"foo"])],
+            attributes,
+        )
+        self.assertEqual(
+            "[(b'objectClass', [b'top', b'person']), (b'cn', [b'foo'])]",
+            repr(attributes),
+        )
+
+    def test_get(self):
+        """
+        An attribute looked up by type is decoded on its own.
+        """
+        result = self.decode(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[
+                    ("objectClass", ["top", "person"]),
+                    ("mail", ["foo@example.com"]),
+                ],
+            )
+        )
+        attributes = result.attributes
+
+        self.assertEqual([b"foo@example.com"], attributes.get("MAIL"))
+        self.assertEqual([None, (b"mail", [b"foo@example.com"])], attributes._items)
+        self.assertIsNone(attributes.get("cn"))
+        self.assertEqual([], attributes.get(b"cn", []))
+
+    def test_toWire(self):
+        """
+        An entry which was not modified encodes to its original bytes.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            objectName="cn=foo,dc=example,dc=com",
+            attributes=[("cn", ["foo"]), ("member", ["x" * 200] * 3)],
+        )
+        result = self.decode(entry)
+
+        self.assertEqual(entry.toWire(), result.toWire())
+        result.attributes = [("cn", ["bar"])]
+        self.assertEqual(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("cn", ["bar"])],
+            ).toWire(),
+            result.toWire(),
+        )
+
+    def test_modify(self):
+        """
+        The attributes can be modified like a list, in place or through
+        their values, and encode to the modified entry.
+        """
+        result = self.decode(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("cn", ["foo"]), ("sn", ["bar"])],
+            )
+        )
+        attributes = result.attributes
+
+        attributes.get("sn").append(b"baz")
+        self.assertEqual(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("cn", ["foo"]), ("sn", ["bar", "baz"])],
+            ).toWire(),
+            result.toWire(),
+        )
+
+        attributes.append(("mail", ["foo@example.com"]))
+        del attributes[0]
+        self.assertEqual(
+            [(b"sn", [b"bar", b"baz"]), ("mail", ["foo@example.com"])],
+            attributes,
+        )
+        self.assertEqual(["foo@example.com"], attributes.get("MAIL"))
+        self.assertEqual(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("sn", ["bar", "baz"]), ("mail", ["foo@example.com"])],
+            ).toWire(),
+            result.toWire(),
+        )
+
+    def test_list(self):
+        """
+        The attributes are a list, and list operations decode them.
+        """
+        result = self.decode(
+            pureldap.LDAPSearchResultEntry(
+                objectName="cn=foo,dc=example,dc=com",
+                attributes=[("cn", ["foo"]), ("sn", ["bar"])],
+            )
+        )
+        attributes = result.attributes
+
+        self.assertIsInstance(attributes, list)
+        self.assertEqual(
+            [(b"cn", [b"foo"]), (b"sn", [b"bar"]), ("mail", [])],
+            attributes + [("mail", [])],
+        )
+        self.assertEqual(
+            [("mail", []), (b"cn", [b"foo"]), (b"sn", [b"bar"])],
+            [("mail", [])] + attributes,
+        )
+        self.assertIn((b"sn", [b"bar"]), attributes)
+        self.assertEqual("[(b'cn', [b'foo']), (b'sn', [b'bar'])]", str(attributes))
+
+    def test_copy(self):
+        """
+        An entry decoded from a memoryview can be deep-copied and
+        pickled, and its attributes are then a plain list.
+        """
+        entry = pureldap.LDAPSearchResultEntry(
+            objectName="cn=foo,dc=example,dc=com",
+            attributes=[("cn", ["foo"]), ("sn", ["bar"])],
+        )
+        expected = [(b"cn", [b"foo"]), (b"sn", [b"bar"])]
+
+        for copied in [
+            copy.deepcopy(self.decode(entry)),
+            pickle.loads(pickle.dumps(self.decode(entry))),
+        ]:
+            self.assertIs(type(copied.attributes), list)
+            self.assertEqual(expected, copied.attributes)
+            self.assertEqual(entry.toWire(), copied.toWire())
+
 
 class Substrings(unittest.TestCase):
     def test_length(self):
@@ -2,14 +2,23 @@
 Test cases for ldaptor.protocols.ldap.ldapserver module.
 """
 import base64
+import threading
 import types
 
-from twisted.internet import address, protocol, testing
-from twisted.python import components, log
+from twisted.internet import address, defer, protocol, reactor, task, testing
+from twisted.python import components, log, threadable, threadpool
 from twisted.test import proto_helpers
 from twisted.trial import unittest
 
-from ldaptor import inmemory, interfaces, schema, delta, entry
+from ldaptor import (
+    attributeindex,
+    inmemory,
+    interfaces,
+    schema,
+    delta,
+    entry,
+    entryhelpers,
+)
 from ldaptor.protocols.ldap import ldapserver, ldapclient, ldaperrors, fetchschema
 from ldaptor.protocols import pureldap, pureber
 from ldaptor.test import util, test_schema
@@ -569,6 +578,91 @@ class LDAPServerTest(unittest.TestCase):
             ]
         )
 
+    def test_search_sizeLimit(self):
+        """
+        The entries found before the size limit was exceeded are returned,
+        and then sizeLimitExceeded.
+        """
+        self.makeSearch(baseObject="ou=stuff,dc=example,dc=com", sizeLimit=2)
+        responses = self._makeResultList(self.server.transport.value())
+        self.assertEqual(3, len(responses))
+        self.assertEqual(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPSizeLimitExceeded.resultCode
+                ),
+                id=2,
+            ).toWire(),
+            responses[-1],
+        )
+
+    def test_search_sizeLimit_server(self):
+        """
+        LDAPServer.sizeLimit applies to searches without a size limit.
+        """
+        self.server.sizeLimit = 1
+        self.makeSearch(baseObject="ou=stuff,dc=example,dc=com")
+        responses = self._makeResultList(self.server.transport.value())
+        self.assertEqual(2, len(responses))
+        self.assertEqual(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPSizeLimitExceeded.resultCode
+                ),
+                id=2,
+            ).toWire(),
+            responses[-1],
+        )
+
+    def test_search_sizeLimit_notExceeded(self):
+        self.server.sizeLimit = 5
+        self.makeSearch(baseObject="ou=stuff,dc=example,dc=com", sizeLimit=3)
+        self.assertSearchResults(
+            [
+                {
+                    "objectName": "ou=stuff,dc=example,dc=com",
+                    "attributes": [
+                        ("objectClass", ["a", "b"]),
+                        ("ou", ["stuff"]),
+                    ],
+                },
+                {
+                    "objectName": "cn=another,ou=stuff,dc=example,dc=com",
+                    "attributes": [
+                        ("objectClass", ["a", "b"]),
+                        ("cn", ["another"]),
+                    ],
+                },
+                {
+                    "objectName": "cn=thingie,ou=stuff,dc=example,dc=com",
+                    "attributes": [
+                        ("objectClass", ["a", "b"]),
+                        ("cn", ["thingie"]),
+                    ],
+                },
+            ]
+        )
+
+    def test_search_timeLimit_server(self):
+        """
+        LDAPServer.timeLimit applies to searches with a longer time limit.
+        """
+        clock = iter(range(100))
+        self.patch(entryhelpers, "_seconds", lambda: next(clock))
+        self.server.timeLimit = 2
+        self.makeSearch(baseObject="ou=stuff,dc=example,dc=com", timeLimit=60)
+        responses = self._makeResultList(self.server.transport.value())
+        self.assertEqual(2, len(responses))
+        self.assertEqual(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPTimeLimitExceeded.resultCode
+                ),
+                id=2,
+            ).toWire(),
+            responses[-1],
+        )
+
     def test_rootDSE(self):
         """Searching for a root object"""
         self.makeSearch(
@@ -587,6 +681,14 @@ class LDAPServerTest(unittest.TestCase):
                             "supportedExtension",
                             [pureldap.LDAPPasswordModifyRequest.oid],
                         ),
+                        (
+                            "supportedControl",
+                            [
+                                ldapserver.PAGED_RESULTS_OID,
+                                ldapserver.SORT_REQUEST_OID,
+                                ldapserver.LIST_VIEW_REQUEST_OID,
+                            ],
+                        ),
                     ],
                 }
             ]
@@ -960,6 +1062,1038 @@ class LDAPServerTest(unittest.TestCase):
         )
 
 
+def pagedControl(size, cookie=b""):
+    value = pureber.BERSequence(
+        [pureber.BERInteger(size), pureber.BEROctetString(cookie)]
+    )
+    return (ldapserver.PAGED_RESULTS_OID, None, value.toWire())
+
+
+def sortControl(attributeType):
+    value = pureber.BERSequence(
+        [pureber.BERSequence([pureber.BEROctetString(attributeType)])]
+    )
+    return (ldapserver.SORT_REQUEST_OID, None, value.toWire())
+
+
+def listViewControl(beforeCount, afterCount, offset):
+    value = pureber.BERSequence(
+        [
+            pureber.BERInteger(beforeCount),
+            pureber.BERInteger(afterCount),
+            pureber.BERSequence(
+                [pureber.BERInteger(offset), pureber.BERInteger(0)],
+                tag=pureber.CLASS_CONTEXT,
+            ),
+        ]
+    )
+    return (ldapserver.LIST_VIEW_REQUEST_OID, None, value.toWire())
+
+
+class CooperativeSearchTest(unittest.TestCase):
+    """
+    Searches run a slice at a time by LDAPServer.searchCooperator.
+    """
+
+    def setUp(self):
+        self.patch(entryhelpers, "COOPERATE_ENTRIES", 2)
+        self.root = inmemory.ReadOnlyInMemoryLDAPEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        for i in range(5):
+            self.root.addChild(rdn="cn=%d" % i, attributes={"objectClass": ["person"]})
+        self.clock = task.Clock()
+        server = ldapserver.LDAPServer()
+        # One slice of each task per tick of the clock.
+        server.searchCooperator = task.Cooperator(
+            terminationPredicateFactory=lambda: lambda: True,
+            scheduler=lambda f: self.clock.callLater(1, f),
+        )
+        server.factory = self.root
+        server.transport = proto_helpers.StringTransport()
+        server.connectionMade()
+        self.server = server
+
+    def search(self, id=2, sizeLimit=None, controls=None):
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(
+                    baseObject="dc=example,dc=com",
+                    sizeLimit=sizeLimit,
+                    filter=pureldap.LDAPFilter_equalityMatch(
+                        attributeDesc=pureldap.LDAPAttributeDescription("objectClass"),
+                        assertionValue=pureldap.LDAPAssertionValue("person"),
+                    ),
+                ),
+                controls=controls,
+                id=id,
+            ).toWire()
+        )
+
+    def messages(self):
+        framer = pureber.BERFramer()
+        framer.feed(self.server.transport.value())
+        return [
+            pureber.berDecodeObject(ldapserver.BaseLDAPServer.berdecoder, pdu)[0]
+            for pdu in framer
+        ]
+
+    def responses(self):
+        return [m.value for m in self.messages()]
+
+    def entries(self):
+        return [
+            r for r in self.responses() if isinstance(r, pureldap.LDAPSearchResultEntry)
+        ]
+
+    def tick(self, times=1):
+        for _ in range(times):
+            self.clock.advance(1)
+
+    def test_producer(self):
+        self.assertIs(self.server, self.server.transport.producer)
+        self.assertTrue(self.server.transport.streaming)
+
+    def test_slices(self):
+        """
+        Each slice matches COOPERATE_ENTRIES entries.
+        """
+        self.search()
+        self.assertEqual([], self.responses())
+        self.tick()
+        self.assertEqual(1, len(self.entries()))
+        self.tick()
+        self.assertEqual(3, len(self.entries()))
+        self.tick(3)
+        responses = self.responses()
+        self.assertEqual(6, len(responses))
+        self.assertEqual(pureldap.LDAPSearchResultDone(resultCode=0), responses[-1])
+
+    def test_interleaved(self):
+        """
+        Searches of the same and other connections are interleaved.
+        """
+        self.search(id=2)
+        self.search(id=3)
+        self.tick(2)
+        self.assertEqual([2, 3], [m.id for m in self.messages()])
+        self.tick(10)
+        self.assertEqual(10, len(self.entries()))
+        self.assertEqual(12, len(self.responses()))
+
+    def test_paused(self):
+        """
+        No more entries are matched while the transport is paused.
+        """
+        self.search()
+        self.tick()
+        self.server.pauseProducing()
+        self.tick()
+        self.assertEqual(2, len(self.entries()))
+        self.tick(5)
+        self.assertEqual(2, len(self.entries()))
+        self.server.resumeProducing()
+        self.tick(5)
+        self.assertEqual(6, len(self.responses()))
+
+    def test_sizeLimit(self):
+        """
+        A search stops in the slice in which it exceeds its size limit.
+        """
+        self.search(sizeLimit=2)
+        self.tick(2)
+        responses = self.responses()
+        self.assertEqual(3, len(responses))
+        self.assertEqual(
+            pureldap.LDAPSearchResultDone(
+                resultCode=ldaperrors.LDAPSizeLimitExceeded.resultCode
+            ),
+            responses[-1],
+        )
+
+    def test_notCooperative(self):
+        """
+        Without a cooperator, searches complete at once.
+        """
+        self.server.searchCooperator = None
+        self.search()
+        self.assertEqual(6, len(self.responses()))
+
+    def test_paged(self):
+        """
+        The pages of a paged search are sent a slice at a time.
+        """
+        self.search(controls=[pagedControl(3)])
+        self.assertEqual([], self.responses())
+        self.tick()
+        self.assertEqual(1, len(self.entries()))
+        self.tick(3)
+        messages = self.messages()
+        self.assertEqual(4, len(messages))
+        ((_, _, value),) = messages[-1].controls
+        control, _ = pureber.berDecodeObject(pureber.BERDecoderContext(), value)
+        self.server.transport.clear()
+        self.search(controls=[pagedControl(3, control[1].value)])
+        self.assertEqual([], self.responses())
+        self.tick(3)
+        self.assertEqual(2, len(self.entries()))
+        self.assertEqual(3, len(self.responses()))
+
+    def test_sortedPaused(self):
+        """
+        The entries of a sorted search are sent a slice at a time, and
+        not while the transport is paused.
+        """
+        self.search(controls=[sortControl(b"cn")])
+        self.tick()
+        self.assertEqual(2, len(self.entries()))
+        self.server.pauseProducing()
+        self.tick(5)
+        self.assertEqual(2, len(self.entries()))
+        self.server.resumeProducing()
+        self.tick(5)
+        self.assertEqual(6, len(self.responses()))
+
+    def test_sortedSizeLimit(self):
+        self.search(sizeLimit=2, controls=[sortControl(b"cn")])
+        self.tick(3)
+        responses = self.responses()
+        self.assertEqual(3, len(responses))
+        self.assertEqual(
+            ldaperrors.LDAPSizeLimitExceeded.resultCode, responses[-1].resultCode
+        )
+
+
+class ThreadedSearchTest(unittest.TestCase):
+    """
+    Searches run in LDAPServer.searchThreadPool.
+    """
+
+    def setUp(self):
+        self.root = inmemory.ReadOnlyInMemoryLDAPEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        for i in range(5):
+            self.root.addChild(
+                rdn="cn=%d" % i, attributes={"objectClass": ["person"], "cn": [str(i)]}
+            )
+        self.patch(NotWalkingEntry, "searched", [])
+        self.pool = threadpool.ThreadPool(1, 1)
+        self.pool.start()
+        self.addCleanup(self.pool.stop)
+        server = ldapserver.LDAPServer()
+        server.searchThreadPool = self.pool
+        server.searchBatchSize = 2
+        server.factory = self.root
+        server.transport = proto_helpers.StringTransport()
+        server.connectionMade()
+        self.server = server
+        self.responses = []
+        self.threads = set()
+
+    def reply(self, response, controls=None):
+        self.threads.add(threadable.isInIOThread())
+        self.responses.append(response)
+        self.controls = controls
+
+    def search(self, sizeLimit=0, controls=None):
+        """
+        Return the Deferred of a search, whose responses are added to
+        self.responses, and the controls of the last one to
+        self.controls.
+        """
+        d = self.server.handle_LDAPSearchRequest(
+            pureldap.LDAPSearchRequest(
+                baseObject="dc=example,dc=com",
+                sizeLimit=sizeLimit,
+                filter=pureldap.LDAPFilter_equalityMatch(
+                    attributeDesc=pureldap.LDAPAttributeDescription("objectClass"),
+                    assertionValue=pureldap.LDAPAssertionValue("person"),
+                ),
+            ),
+            controls,
+            self.reply,
+        )
+
+        def _done(response):
+            if response is not None:
+                self.reply(response)
+
+        d.addCallback(_done)
+        return d
+
+    def wire(self, responses):
+        return [pureldap.LDAPMessage(r, id=2).toWire() for r in responses]
+
+    def test_producer(self):
+        self.assertIs(self.server, self.server.transport.producer)
+        self.assertTrue(self.server.transport.streaming)
+
+    def test_search(self):
+        """
+        The entries are encoded in the thread and sent by the reactor
+        thread, as searching in the reactor thread sends them.
+        """
+        self.server.searchThreadPool = None
+        self.successResultOf(self.search())
+        expected = self.wire(self.responses)
+        self.assertEqual(6, len(expected))
+        del self.responses[:]
+        self.server.searchThreadPool = self.pool
+
+        def _searched(_):
+            self.assertEqual(expected, self.wire(self.responses))
+            self.assertEqual({True}, self.threads)
+
+        return self.search().addCallback(_searched)
+
+    def test_sizeLimit(self):
+        """
+        The entries found before the size limit is exceeded are sent.
+        """
+
+        def _searched(_):
+            self.assertEqual(4, len(self.responses))
+            self.assertEqual(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPSizeLimitExceeded.resultCode
+                ),
+                self.responses[-1],
+            )
+
+        return self.search(sizeLimit=3).addCallback(_searched)
+
+    def test_paused(self):
+        """
+        No more entries are matched while the transport is paused.
+        """
+        self.server.pauseProducing()
+        firstBatch = defer.Deferred()
+        reply = self.reply
+
+        def _reply(response):
+            reply(response)
+            if len(self.responses) == 2:
+                firstBatch.callback(None)
+
+        self.reply = _reply
+        d = self.search()
+
+        def _gotFirstBatch(_):
+            # Give the search thread a chance to go on.
+            return task.deferLater(reactor, 0.01, lambda: None)
+
+        def _stillPaused(_):
+            self.assertEqual(2, len(self.responses))
+            # No thread waits for the transport.
+            self.assertEqual([], self.pool.working)
+            self.server.resumeProducing()
+            return d
+
+        def _searched(_):
+            self.assertEqual(6, len(self.responses))
+
+        firstBatch.addCallback(_gotFirstBatch)
+        firstBatch.addCallback(_stillPaused)
+        firstBatch.addCallback(_searched)
+        return firstBatch
+
+    def test_pagedSorted(self):
+        """
+        The entries of paged and sorted searches are encoded in the
+        thread too, a page at a time.
+        """
+        controls = [sortControl(b"cn"), pagedControl(3)]
+
+        def _firstPage(_):
+            entries = self.responses[:-1]
+            self.assertEqual(3, len(entries))
+            for e in entries:
+                self.assertIsInstance(e, ldapserver._EncodedResponse)
+            self.assertEqual([b"0", b"1", b"2"], [self.cn(e) for e in entries])
+            (cookie,) = [c for c in self.controls if c[0] == controls[1][0]]
+            value, _ = pureber.berDecodeObject(pureber.BERDecoderContext(), cookie[2])
+            del self.responses[:]
+            return self.search(controls=[controls[0], pagedControl(3, value[1].value)])
+
+        def _secondPage(_):
+            entries = self.responses[:-1]
+            self.assertEqual([b"3", b"4"], [self.cn(e) for e in entries])
+
+        d = self.search(controls=controls)
+        d.addCallback(_firstPage)
+        d.addCallback(_secondPage)
+        return d
+
+    def cn(self, response):
+        (message,) = self.wire([response])
+        decoded, _ = pureber.berDecodeObject(
+            ldapserver.BaseLDAPServer.berdecoder, message
+        )
+        return dict(decoded.value.attributes)[b"cn"][0]
+
+    def test_listView(self):
+        """
+        The entries of a virtual list view are sorted in the thread.
+        """
+        threads = []
+
+        class ListView(entryhelpers.ListView):
+            def __init__(self, *a, **kw):
+                threads.append(threading.current_thread())
+                super().__init__(*a, **kw)
+
+        self.patch(entryhelpers, "ListView", ListView)
+
+        def _searched(_):
+            self.assertEqual(1, len(threads))
+            self.assertIsNot(threading.current_thread(), threads[0])
+            self.assertEqual(3, len(self.responses))
+
+        d = self.search(controls=[sortControl(b"cn"), listViewControl(0, 1, 2)])
+        return d.addCallback(_searched)
+
+    def test_notWalking(self):
+        """
+        Backends that cannot walk their scope synchronously are searched
+        in the reactor thread.
+        """
+        root = NotWalkingEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        for i in range(5):
+            root.addChild(rdn="cn=%d" % i, attributes={"objectClass": ["person"]})
+        self.server.factory = root
+
+        def _searched(_):
+            self.assertEqual(6, len(self.responses))
+            self.assertEqual([True], NotWalkingEntry.searched)
+
+        return self.search().addCallback(_searched)
+
+
+class NotWalkingEntry(inmemory.ReadOnlyInMemoryLDAPEntry):
+    searched = []
+
+    def _iterateScope(self, scope):
+        return None
+
+    def search(self, *a, **kw):
+        NotWalkingEntry.searched.append(threadable.isInIOThread())
+        return super().search(*a, **kw)
+
+
+class MatchCountingEntry(inmemory.ReadOnlyInMemoryLDAPEntry):
+    matched = 0
+
+    def match(self, filter):
+        MatchCountingEntry.matched += 1
+        return super().match(filter)
+
+
+class PagedSearchTest(unittest.TestCase):
+    """
+    LDAPServer supports the paged results control of RFC 2696.
+    """
+
+    def setUp(self):
+        self.patch(MatchCountingEntry, "matched", 0)
+        self.root = MatchCountingEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        for i in range(5):
+            self.root.addChild(rdn="cn=%d" % i, attributes={"objectClass": ["person"]})
+        server = ldapserver.LDAPServer()
+        server.factory = self.root
+        server.transport = proto_helpers.StringTransport()
+        server.connectionMade()
+        self.server = server
+
+    def search(self, size, cookie=b"", filter="person", sizeLimit=None, critical=None):
+        """
+        Request a page of a search, and return the names of the entries
+        and the result code and cookie that it got.
+        """
+        self.server.transport.clear()
+        value = pureber.BERSequence(
+            [pureber.BERInteger(size), pureber.BEROctetString(cookie)]
+        )
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(
+                    baseObject="dc=example,dc=com",
+                    sizeLimit=sizeLimit,
+                    filter=pureldap.LDAPFilter_equalityMatch(
+                        attributeDesc=pureldap.LDAPAttributeDescription("objectClass"),
+                        assertionValue=pureldap.LDAPAssertionValue(filter),
+                    ),
+                ),
+                controls=[(ldapserver.PAGED_RESULTS_OID, critical, value.toWire())],
+                id=2,
+            ).toWire()
+        )
+        framer = pureber.BERFramer()
+        framer.feed(self.server.transport.value())
+        messages = [
+            pureber.berDecodeObject(ldapserver.BaseLDAPServer.berdecoder, pdu)[0]
+            for pdu in framer
+        ]
+        done = messages.pop()
+        self.assertIsInstance(done.value, pureldap.LDAPSearchResultDone)
+        names = [m.value.objectName for m in messages]
+        if done.controls is None:
+            return names, done.value.resultCode, None
+        ((controlType, _, controlValue),) = done.controls
+        self.assertEqual(ldapserver.PAGED_RESULTS_OID, controlType)
+        control, _ = pureber.berDecodeObject(pureber.BERDecoderContext(), controlValue)
+        return names, done.value.resultCode, control[1].value
+
+    def test_pages(self):
+        """
+        Each page has the requested number of entries, and the cookie to
+        ask for the next page with, until the last one.
+        """
+        names, resultCode, cookie = self.search(2)
+        self.assertEqual([b"cn=0,dc=example,dc=com", b"cn=1,dc=example,dc=com"], names)
+        self.assertEqual(0, resultCode)
+        self.assertNotEqual(b"", cookie)
+        names, resultCode, cookie = self.search(2, cookie)
+        self.assertEqual([b"cn=2,dc=example,dc=com", b"cn=3,dc=example,dc=com"], names)
+        names, resultCode, cookie = self.search(2, cookie)
+        self.assertEqual([b"cn=4,dc=example,dc=com"], names)
+        self.assertEqual((0, b""), (resultCode, cookie))
+
+    def test_resumed(self):
+        """
+        Each page resumes the search where the previous page stopped,
+        instead of matching the entries before it again.
+        """
+        _, _, cookie = self.search(1)
+        while cookie:
+            _, _, cookie = self.search(1, cookie)
+        self.assertEqual(6, MatchCountingEntry.matched)
+
+    def test_critical(self):
+        names, resultCode, cookie = self.search(5, critical=True)
+        self.assertEqual(5, len(names))
+        self.assertEqual(0, resultCode)
+
+    def test_abandon(self):
+        """
+        A page of size 0 ends the search of its cookie.
+        """
+        _, _, cookie = self.search(2)
+        self.assertEqual(([], 0, b""), self.search(0, cookie))
+        self.assertEqual(
+            ldaperrors.LDAPUnwillingToPerform.resultCode, self.search(2, cookie)[1]
+        )
+
+    def test_unknownCookie(self):
+        self.assertEqual(
+            ([], ldaperrors.LDAPUnwillingToPerform.resultCode, None),
+            self.search(2, b"42"),
+        )
+
+    def test_otherRequest(self):
+        """
+        A cookie cannot continue a different search.
+        """
+        _, _, cookie = self.search(2)
+        self.assertEqual(
+            ldaperrors.LDAPUnwillingToPerform.resultCode,
+            self.search(2, cookie, filter="dcObject")[1],
+        )
+
+    def test_cap(self):
+        """
+        Starting more paged searches than LDAPServer.pagedSearches drops the
+        least recently used ones.
+        """
+        self.server.pagedSearches = 2
+        _, _, first = self.search(1)
+        _, _, second = self.search(1)
+        _, _, second = self.search(1, second)
+        _, _, third = self.search(1)
+        self.assertEqual(
+            ldaperrors.LDAPUnwillingToPerform.resultCode, self.search(1, first)[1]
+        )
+        self.assertEqual([b"cn=2,dc=example,dc=com"], self.search(1, second)[0])
+        self.assertEqual([b"cn=1,dc=example,dc=com"], self.search(1, third)[0])
+
+    def test_expired(self):
+        """
+        A cookie expires LDAPServer.pagedSearchTimeout seconds after its page.
+        """
+        now = [0]
+        self.patch(ldapserver, "_seconds", lambda: now[0])
+        _, _, cookie = self.search(1)
+        now[0] = self.server.pagedSearchTimeout - 1
+        _, _, cookie = self.search(1, cookie)
+        now[0] += self.server.pagedSearchTimeout
+        self.assertEqual(
+            ldaperrors.LDAPUnwillingToPerform.resultCode, self.search(1, cookie)[1]
+        )
+
+    def test_sizeLimit(self):
+        """
+        The size limit applies to the entries of all pages.
+        """
+        _, _, cookie = self.search(2, sizeLimit=3)
+        names, resultCode, cookie = self.search(2, cookie, sizeLimit=3)
+        self.assertEqual(1, len(names))
+        self.assertEqual(ldaperrors.LDAPSizeLimitExceeded.resultCode, resultCode)
+
+    def test_connectionLost(self):
+        self.search(2)
+        self.server.connectionLost()
+        self.assertEqual({}, dict(self.server._pagedSearches))
+
+    def test_invalidControl(self):
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com"),
+                controls=[(ldapserver.PAGED_RESULTS_OID, None, b"junk")],
+                id=2,
+            ).toWire()
+        )
+        self.assertEqual(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPProtocolError.resultCode
+                ),
+                id=2,
+            ).toWire(),
+            self.server.transport.value(),
+        )
+
+
+class SortedSearchTest(unittest.TestCase):
+    """
+    LDAPServer supports the server side sorting control of RFC 2891.
+    """
+
+    def setUp(self):
+        self.root = inmemory.ReadOnlyInMemoryLDAPEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        for i, sn in enumerate(["Smith", "adams", "Jones", "baker"]):
+            self.root.addChild(
+                rdn="cn=%d" % i,
+                attributes={
+                    "objectClass": ["person"],
+                    "sn": [sn],
+                    "uidNumber": [str((5 - i) * 10 ** i)],
+                },
+            )
+        server = ldapserver.LDAPServer()
+        server.factory = self.root
+        server.transport = proto_helpers.StringTransport()
+        server.connectionMade()
+        self.server = server
+
+    def search(self, sortKeys, critical=None, paged=None):
+        """
+        Send a sorted search, and return the names of the entries, the
+        result code and the response controls.
+        """
+        self.server.transport.clear()
+        keys = []
+        for attributeType, orderingRule, reverseOrder in sortKeys:
+            key = [pureber.BEROctetString(attributeType)]
+            if orderingRule is not None:
+                key.append(
+                    pureber.BEROctetString(orderingRule, tag=pureber.CLASS_CONTEXT)
+                )
+            if reverseOrder:
+                key.append(pureber.BERBoolean(True, tag=pureber.CLASS_CONTEXT | 0x01))
+            keys.append(pureber.BERSequence(key))
+        controls = [
+            (
+                ldapserver.SORT_REQUEST_OID,
+                critical,
+                pureber.BERSequence(keys).toWire(),
+            )
+        ]
+        if paged is not None:
+            size, cookie = paged
+            controls.append(
+                (
+                    ldapserver.PAGED_RESULTS_OID,
+                    None,
+                    pureber.BERSequence(
+                        [pureber.BERInteger(size), pureber.BEROctetString(cookie)]
+                    ).toWire(),
+                )
+            )
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(
+                    baseObject="dc=example,dc=com",
+                    scope=pureldap.LDAP_SCOPE_singleLevel,
+                ),
+                controls=controls,
+                id=2,
+            ).toWire()
+        )
+        framer = pureber.BERFramer()
+        framer.feed(self.server.transport.value())
+        messages = [
+            pureber.berDecodeObject(ldapserver.BaseLDAPServer.berdecoder, pdu)[0]
+            for pdu in framer
+        ]
+        done = messages.pop()
+        self.assertIsInstance(done.value, pureldap.LDAPSearchResultDone)
+        names = [m.value.objectName for m in messages]
+        responseControls = {}
+        for controlType, _, controlValue in done.controls or ():
+            control, _ = pureber.berDecodeObject(
+                pureber.BERDecoderContext(), controlValue
+            )
+            responseControls[controlType] = [c.value for c in control]
+        return names, done.value.resultCode, responseControls
+
+    def assertSorted(self, expected, *args, **kwargs):
+        names, resultCode, controls = self.search(*args, **kwargs)
+        self.assertEqual(
+            [b"cn=%d,dc=example,dc=com" % i for i in expected],
+            names,
+        )
+        self.assertEqual(0, resultCode)
+        self.assertEqual([0], controls[ldapserver.SORT_RESPONSE_OID])
+        return controls
+
+    def test_sorted(self):
+        self.assertSorted([1, 3, 2, 0], [(b"sn", None, False)])
+
+    def test_reverse(self):
+        self.assertSorted([0, 2, 3, 1], [(b"sn", None, True)])
+
+    def test_orderingRule(self):
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", ordering=True)
+        self.assertSorted([0, 1, 2, 3], [(b"uidNumber", None, False)])
+        self.assertSorted([3, 2, 1, 0], [(b"uidNumber", b"2.5.13.15", True)])
+        self.assertSorted([3, 2, 1, 0], [(b"uidNumber", b"2.5.13.3", False)])
+
+    def test_unknownOrderingRule(self):
+        """
+        Without a known ordering rule, the entries are returned unsorted,
+        with inappropriateMatching in the response control.
+        """
+        names, resultCode, controls = self.search([(b"sn", b"1.2.3.4", False)])
+        self.assertEqual(4, len(names))
+        self.assertEqual(0, resultCode)
+        self.assertEqual(
+            [ldaperrors.LDAPInappropriateMatching.resultCode],
+            controls[ldapserver.SORT_RESPONSE_OID],
+        )
+
+    def test_unknownOrderingRule_critical(self):
+        self.assertEqual(
+            (
+                [],
+                ldaperrors.LDAPUnavailableCriticalExtension.resultCode,
+                {},
+            ),
+            self.search([(b"sn", b"1.2.3.4", False)], critical=True),
+        )
+
+    def test_paged(self):
+        """
+        The pages of a sorted search follow each other in order.
+        """
+        controls = self.assertSorted([1, 3], [(b"sn", None, False)], paged=(2, b""))
+        _, cookie = controls[ldapserver.PAGED_RESULTS_OID]
+        controls = self.assertSorted([2, 0], [(b"sn", None, False)], paged=(2, cookie))
+
+    def test_invalidControl(self):
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com"),
+                controls=[(ldapserver.SORT_REQUEST_OID, None, b"0\x00")],
+                id=2,
+            ).toWire()
+        )
+        self.assertEqual(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPProtocolError.resultCode
+                ),
+                id=2,
+            ).toWire(),
+            self.server.transport.value(),
+        )
+
+
+class ListViewTest(unittest.TestCase):
+    """
+    LDAPServer supports the virtual list view control.
+    """
+
+    def setUp(self):
+        self.root = inmemory.ReadOnlyInMemoryLDAPEntry(
+            dn="dc=example,dc=com", attributes={"objectClass": ["dcObject"]}
+        )
+        # uidNumber 3 to 60, in another order than the names.
+        for i in range(20):
+            self.root.addChild(
+                rdn="cn=%d" % i,
+                attributes={
+                    "objectClass": ["person"],
+                    "uidNumber": [str((i * 7 % 20 + 1) * 3)],
+                },
+            )
+        self.root.setSyntax("uidNumber", attributeindex.INTEGER)
+        self.root.addIndex("uidNumber", ordering=True)
+        server = ldapserver.LDAPServer()
+        server.factory = self.root
+        server.transport = proto_helpers.StringTransport()
+        server.connectionMade()
+        self.server = server
+
+    def search(
+        self,
+        beforeCount,
+        afterCount,
+        target,
+        contextID=None,
+        reverseOrder=False,
+        sort=True,
+        paged=False,
+        filter=None,
+    ):
+        """
+        Send a search for a window of a virtual list view ordered by
+        uidNumber, and return the uidNumbers of the entries, the result
+        code and the response controls.
+
+        @param target: An (offset, contentCount) tuple, or the assertion
+            value to find.
+        """
+        self.server.transport.clear()
+        if isinstance(target, tuple):
+            offset, contentCount = target
+            target = pureber.BERSequence(
+                [pureber.BERInteger(offset), pureber.BERInteger(contentCount)],
+                tag=pureber.CLASS_CONTEXT,
+            )
+        else:
+            target = pureber.BEROctetString(target, tag=pureber.CLASS_CONTEXT | 0x01)
+        value = [
+            pureber.BERInteger(beforeCount),
+            pureber.BERInteger(afterCount),
+            target,
+        ]
+        if contextID is not None:
+            value.append(pureber.BEROctetString(contextID))
+        controls = [
+            (
+                ldapserver.LIST_VIEW_REQUEST_OID,
+                True,
+                pureber.BERSequence(value).toWire(),
+            )
+        ]
+        if sort:
+            key = [pureber.BEROctetString(b"uidNumber")]
+            if reverseOrder:
+                key.append(pureber.BERBoolean(True, tag=pureber.CLASS_CONTEXT | 0x01))
+            controls.append(
+                (
+                    ldapserver.SORT_REQUEST_OID,
+                    True,
+                    pureber.BERSequence([pureber.BERSequence(key)]).toWire(),
+                )
+            )
+        if paged:
+            controls.append(
+                (
+                    ldapserver.PAGED_RESULTS_OID,
+                    None,
+                    pureber.BERSequence(
+                        [pureber.BERInteger(2), pureber.BEROctetString(b"")]
+                    ).toWire(),
+                )
+            )
+        request = pureldap.LDAPSearchRequest(
+            baseObject="dc=example,dc=com",
+            scope=pureldap.LDAP_SCOPE_singleLevel,
+        )
+        if filter is not None:
+            request.filter = filter
+        self.server.dataReceived(
+            pureldap.LDAPMessage(request, controls=controls, id=2).toWire()
+        )
+        framer = pureber.BERFramer()
+        framer.feed(self.server.transport.value())
+        messages = [
+            pureber.berDecodeObject(ldapserver.BaseLDAPServer.berdecoder, pdu)[0]
+            for pdu in framer
+        ]
+        done = messages.pop()
+        self.assertIsInstance(done.value, pureldap.LDAPSearchResultDone)
+        numbers = [int(dict(m.value.attributes)[b"uidNumber"][0]) for m in messages]
+        responseControls = {}
+        for controlType, _, controlValue in done.controls or ():
+            control, _ = pureber.berDecodeObject(
+                pureber.BERDecoderContext(), controlValue
+            )
+            responseControls[controlType] = [c.value for c in control]
+        return numbers, done.value.resultCode, responseControls
+
+    def assertWindow(self, expected, position, count, *args, **kwargs):
+        """
+        Assert that a search returns the entries with the expected
+        uidNumbers around position, and return its context id.
+        """
+        numbers, resultCode, controls = self.search(*args, **kwargs)
+        self.assertEqual(expected, numbers)
+        self.assertEqual(0, resultCode)
+        self.assertEqual([0], controls[ldapserver.SORT_RESPONSE_OID])
+        targetPosition, contentCount, result, contextID = controls[
+            ldapserver.LIST_VIEW_RESPONSE_OID
+        ]
+        self.assertEqual((position, count, 0), (targetPosition, contentCount, result))
+        return contextID
+
+    def test_offset(self):
+        self.assertWindow([12, 15, 18, 21], 5, 20, 1, 2, (5, 0))
+        self.assertWindow([3, 6], 1, 20, 3, 1, (1, 0))
+
+    def test_offset_reverse(self):
+        self.assertWindow([54, 51, 48], 4, 20, 1, 1, (4, 0), reverseOrder=True)
+
+    def test_offset_contentCount(self):
+        """
+        An offset is scaled to the actual number of entries from the
+        number the client estimates.
+        """
+        self.assertWindow([57, 60], 20, 20, 1, 1, (10, 10))
+        self.assertWindow([3, 6], 1, 20, 0, 1, (1, 10))
+        self.assertWindow([27], 9, 20, 0, 0, (5, 10))
+        self.assertWindow([60], 20, 20, 0, 0, (100, 10))
+
+    def test_offset_past(self):
+        """
+        An offset past the last entry targets the position after it.
+        """
+        self.assertWindow([57, 60], 21, 20, 2, 5, (30, 0))
+
+    def test_offsetRangeError(self):
+        numbers, resultCode, controls = self.search(1, 1, (0, 0))
+        self.assertEqual([], numbers)
+        self.assertEqual(ldaperrors.LDAPOffsetRangeError.resultCode, resultCode)
+        self.assertEqual(
+            [0, 20, ldaperrors.LDAPOffsetRangeError.resultCode],
+            controls[ldapserver.LIST_VIEW_RESPONSE_OID][:3],
+        )
+
+    def test_assertionValue(self):
+        """
+        An assertion value targets the first entry whose value of the
+        first sort key is it, or follows it.
+        """
+        self.assertWindow([12, 15, 18], 5, 20, 1, 1, b"15")
+        self.assertWindow([15, 18], 5, 20, 0, 1, b"13")
+        self.assertWindow([60], 21, 20, 1, 3, b"61")
+        self.assertWindow([12, 9], 17, 20, 0, 1, b"13", reverseOrder=True)
+
+    def test_contextID(self):
+        """
+        A request with the context id of the previous window of the same
+        search takes its window from the same entries, even if the tree
+        has changed since.
+        """
+        contextID = self.assertWindow([3], 1, 20, 0, 0, (1, 0))
+        self.root.addChild(
+            rdn="cn=new", attributes={"objectClass": ["person"], "uidNumber": ["1"]}
+        )
+        contextID = self.assertWindow([3], 1, 20, 0, 0, (1, 0), contextID)
+        self.assertWindow([1], 1, 21, 0, 0, (1, 0))
+        # Another search does not take the entries of the context.
+        self.assertWindow(
+            [1],
+            1,
+            1,
+            0,
+            0,
+            (1, 0),
+            contextID,
+            filter=pureldap.LDAPFilter_equalityMatch(
+                attributeDesc=pureldap.LDAPAttributeDescription("uidNumber"),
+                assertionValue=pureldap.LDAPAssertionValue("1"),
+            ),
+        )
+
+    def test_contextID_expired(self):
+        now = [0]
+        self.patch(ldapserver, "_seconds", lambda: now[0])
+        contextID = self.assertWindow([3], 1, 20, 0, 0, (1, 0))
+        self.root.addChild(
+            rdn="cn=new", attributes={"objectClass": ["person"], "uidNumber": ["1"]}
+        )
+        now[0] = self.server.listViewTimeout
+        self.assertWindow([1], 1, 21, 0, 0, (1, 0), contextID)
+
+    def test_listViews(self):
+        """
+        Only the LDAPServer.listViews most recently used views are kept.
+        """
+        self.server.listViews = 1
+        first = self.assertWindow([3], 1, 20, 0, 0, (1, 0))
+        self.assertWindow([3], 1, 20, 0, 0, (1, 0))
+        self.assertEqual(1, len(self.server._listViews))
+        self.root.addChild(
+            rdn="cn=new", attributes={"objectClass": ["person"], "uidNumber": ["1"]}
+        )
+        self.assertWindow([1], 1, 21, 0, 0, (1, 0), first)
+
+    def test_sizeLimit(self):
+        self.server.sizeLimit = 2
+        numbers, resultCode, controls = self.search(1, 2, (5, 0))
+        self.assertEqual([12, 15], numbers)
+        self.assertEqual(ldaperrors.LDAPSizeLimitExceeded.resultCode, resultCode)
+        self.assertEqual(
+            [5, 20, ldaperrors.LDAPSizeLimitExceeded.resultCode],
+            controls[ldapserver.LIST_VIEW_RESPONSE_OID][:3],
+        )
+
+    def test_sortControlMissing(self):
+        numbers, resultCode, controls = self.search(1, 1, (1, 0), sort=False)
+        self.assertEqual([], numbers)
+        self.assertEqual(ldaperrors.LDAPSortControlMissing.resultCode, resultCode)
+        self.assertEqual(
+            [0, 0, ldaperrors.LDAPSortControlMissing.resultCode],
+            controls[ldapserver.LIST_VIEW_RESPONSE_OID],
+        )
+
+    def test_paged(self):
+        self.assertEqual(
+            ([], ldaperrors.LDAPUnwillingToPerform.resultCode, {}),
+            self.search(1, 1, (1, 0), paged=True),
+        )
+
+    def test_invalidControl(self):
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(baseObject="dc=example,dc=com"),
+                controls=[
+                    (ldapserver.LIST_VIEW_REQUEST_OID, None, b"0\x00"),
+                    (ldapserver.SORT_REQUEST_OID, None, b"0\x030\x01\x04"),
+                ],
+                id=2,
+            ).toWire()
+        )
+        self.assertEqual(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultDone(
+                    resultCode=ldaperrors.LDAPProtocolError.resultCode
+                ),
+                id=2,
+            ).toWire(),
+            self.server.transport.value(),
+        )
+
+
 class TestSchema(unittest.TestCase):
     def setUp(self):
         db = inmemory.ReadOnlyInMemoryLDAPEntry("", {})
@@ -0,0 +1,383 @@
+"""
+Test cases for ldaptor.workers module.
+"""
+import os
+import socket
+from io import BytesIO
+
+from twisted.internet import defer, error, task
+from twisted.python import failure
+from twisted.test import proto_helpers
+from twisted.trial import unittest
+
+from ldaptor import inmemory, workers
+from ldaptor.protocols import pureber, pureldap
+from ldaptor.protocols.ldap import ldaperrors, ldifprotocol
+
+SNAPSHOT = b"""\
+dn: dc=example,dc=com
+objectClass: dcObject
+dc: example
+
+dn: cn=bob,dc=example,dc=com
+objectClass: person
+cn: bob
+sn: Roberts
+
+"""
+
+CHANGES = b"""\
+dn: cn=alice,dc=example,dc=com
+changetype: add
+objectClass: person
+cn: alice
+sn: Smith
+
+dn: cn=bob,dc=example,dc=com
+changetype: modify
+replace: sn
+sn: Bobson
+-
+
+"""
+
+
+# Where the second change starts.
+SECOND = CHANGES.index(b"dn: cn=bob")
+
+
+def loadSnapshot():
+    return inmemory.fromLDIFFile(BytesIO(SNAPSHOT)).result
+
+
+class ChangeFeedTests(unittest.TestCase):
+    def setUp(self):
+        self.root = loadSnapshot()
+        self.feed = workers.ChangeFeed(self.root)
+
+    def names(self):
+        return sorted(e.dn.getText() for e in self.root.subtree().result)
+
+    def test_changes(self):
+        self.feed.dataReceived(CHANGES)
+        self.assertEqual(2, self.feed.applied)
+        self.assertEqual(
+            [
+                "cn=alice,dc=example,dc=com",
+                "cn=bob,dc=example,dc=com",
+                "dc=example,dc=com",
+            ],
+            self.names(),
+        )
+        bob = self.successResultOf(self.root.lookup("cn=bob,dc=example,dc=com"))
+        self.assertEqual({b"Bobson"}, set(bob["sn"]))
+
+    def test_partial(self):
+        """
+        A change is applied once its record is complete.
+        """
+        self.feed.dataReceived(CHANGES[:20])
+        self.assertEqual(0, self.feed.applied)
+        self.feed.dataReceived(CHANGES[20 : SECOND + 20])
+        self.assertEqual(1, self.feed.applied)
+        self.feed.dataReceived(CHANGES[SECOND + 20 :])
+        self.assertEqual(2, self.feed.applied)
+
+    def test_failed(self):
+        """
+        A change that fails is logged, and the next ones are applied.
+        """
+        self.feed.dataReceived(
+            b"dn: cn=nobody,dc=example,dc=com\nchangetype: delete\n\n" + CHANGES
+        )
+        self.assertEqual(1, len(self.flushLoggedErrors(ldaperrors.LDAPNoSuchObject)))
+        self.assertEqual(2, self.feed.applied)
+
+    def test_malformed(self):
+        """
+        A record that cannot be parsed is logged and skipped, and the
+        next ones are applied.
+        """
+        self.feed.dataReceived(
+            b"dn: cn=bob,dc=example,dc=com\n"
+            b"changetype: modrdn\n"
+            b"newrdn: cn=robert\n"
+            b"\n"
+            b" continued\n"
+            b" more\n"
+            b"\n"
+            b"dn: cn=bob,dc=example,dc=com\n"
+            b"changetype: modify\n"
+            b"no colon\n"
+            b"\n" + CHANGES
+        )
+        self.assertEqual(
+            3,
+            len(
+                self.flushLoggedErrors(NotImplementedError, ldifprotocol.LDIFParseError)
+            ),
+        )
+        self.assertEqual(2, self.feed.applied)
+        bob = self.successResultOf(self.root.lookup("cn=bob,dc=example,dc=com"))
+        self.assertEqual({b"Bobson"}, set(bob["sn"]))
+
+
+class FollowFileTests(unittest.TestCase):
+    def setUp(self):
+        self.path = self.mktemp()
+        self.received = proto_helpers.AccumulatingProtocol()
+        self.received.data = b""
+        self.follower = workers.FollowFile(self.path, self.received)
+        self.addCleanup(self.follower.close)
+
+    def test_appended(self):
+        self.follower.poll()
+        self.assertEqual(b"", self.received.data)
+        with open(self.path, "wb") as f:
+            f.write(b"first\n")
+        self.follower.poll()
+        self.assertEqual(b"first\n", self.received.data)
+        with open(self.path, "ab") as f:
+            f.write(b"second\n")
+        self.follower.poll()
+        self.follower.poll()
+        self.assertEqual(b"first\nsecond\n", self.received.data)
+
+
+class SnapshotLDAPServerTests(unittest.TestCase):
+    def setUp(self):
+        self.server = workers.SnapshotServerFactory(loadSnapshot()).buildProtocol(None)
+        self.server.transport = proto_helpers.StringTransport()
+        self.server.connectionMade()
+
+    def test_refused(self):
+        for request, response in [
+            (
+                pureldap.LDAPAddRequest(
+                    entry="cn=x,dc=example,dc=com",
+                    attributes=[
+                        (
+                            pureldap.LDAPAttributeDescription("objectClass"),
+                            pureber.BERSet(
+                                value=[pureldap.LDAPAttributeValue("person")]
+                            ),
+                        )
+                    ],
+                ),
+                pureldap.LDAPAddResponse,
+            ),
+            (
+                pureldap.LDAPDelRequest(entry="cn=bob,dc=example,dc=com"),
+                pureldap.LDAPDelResponse,
+            ),
+        ]:
+            self.server.transport.clear()
+            self.server.dataReceived(pureldap.LDAPMessage(request, id=2).toWire())
+            self.assertEqual(
+                pureldap.LDAPMessage(
+                    response(
+                        resultCode=ldaperrors.LDAPUnwillingToPerform.resultCode,
+                        errorMessage=b"This server is read-only",
+                    ),
+                    id=2,
+                ).toWire(),
+                self.server.transport.value(),
+            )
+
+    def test_search(self):
+        self.server.dataReceived(
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchRequest(baseObject="cn=bob,dc=example,dc=com"),
+                id=2,
+            ).toWire()
+        )
+        self.assertIn(b"Roberts", self.server.transport.value())
+
+
+class FakePort:
+    def stopListening(self):
+        return defer.succeed(None)
+
+
+class AdoptingClock(task.Clock):
+    def __init__(self):
+        super().__init__()
+        self.adopted = []
+        self.stopped = False
+
+    def adoptStreamPort(self, fd, addressFamily, factory):
+        self.adopted.append((fd, addressFamily, factory))
+        return FakePort()
+
+    def stop(self):
+        self.stopped = True
+
+
+class WorkerServiceTests(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = self.mktemp()
+        with open(self.snapshot, "wb") as f:
+            f.write(SNAPSHOT)
+        self.changes = self.mktemp()
+        with open(self.changes, "wb") as f:
+            f.write(CHANGES[:SECOND])
+        self.reactor = AdoptingClock()
+        self.port = workers.listen(0, "127.0.0.1")
+        self.addCleanup(self.port.close)
+        self.fd = os.dup(self.port.fileno())
+
+    def test_serve(self):
+        """
+        The changes already in the feed are applied before the socket is
+        adopted, and those appended later every interval.
+        """
+        service = workers.WorkerService(
+            self.snapshot,
+            self.fd,
+            changes=self.changes,
+            interval=2,
+            indexes=["cn"],
+            reactor=self.reactor,
+        )
+        service.startService()
+        [(fd, addressFamily, factory)] = self.reactor.adopted
+        self.assertEqual((self.fd, socket.AF_INET), (fd, addressFamily))
+        self.assertIs(service.root, factory.root)
+        self.assertEqual(1, service.feed.applied)
+        self.assertIn("cn", service.root._indexes)
+
+        with open(self.changes, "ab") as f:
+            f.write(CHANGES[SECOND:])
+        self.reactor.advance(2)
+        self.assertEqual(2, service.feed.applied)
+
+        self.successResultOf(service.stopService())
+        self.assertEqual([], self.reactor.getDelayedCalls())
+
+    def test_malformed(self):
+        """
+        The feed is still followed after a record that cannot be parsed.
+        """
+        with open(self.changes, "wb") as f:
+            f.write(b"dn: cn=bob,dc=example,dc=com\nbroken\n\n")
+        service = workers.WorkerService(
+            self.snapshot, self.fd, changes=self.changes, reactor=self.reactor
+        )
+        service.startService()
+        self.assertEqual(1, len(self.flushLoggedErrors(ldifprotocol.LDIFParseError)))
+        with open(self.changes, "ab") as f:
+            f.write(CHANGES)
+        self.reactor.advance(1)
+        self.assertEqual(2, service.feed.applied)
+        self.successResultOf(service.stopService())
+
+    def test_failed(self):
+        with open(self.snapshot, "wb") as f:
+            f.write(b"dn: dc=example,dc=com\nbroken\n\n")
+        service = workers.WorkerService(self.snapshot, self.fd, reactor=self.reactor)
+        self.addCleanup(os.close, self.fd)
+        service.startService()
+        self.assertTrue(self.reactor.stopped)
+        self.assertEqual([], self.reactor.adopted)
+        self.assertEqual(1, len(self.flushLoggedErrors()))
+
+
+class FakeProcess:
+    def __init__(self):
+        self.signals = []
+        self.ended = False
+
+    def signalProcess(self, signal):
+        if self.ended:
+            raise error.ProcessExitedAlready()
+        self.signals.append(signal)
+
+
+class ProcessClock(task.Clock):
+    def __init__(self):
+        super().__init__()
+        self.spawned = []
+
+    def spawnProcess(self, processProtocol, executable, args, env, childFDs):
+        process = FakeProcess()
+        self.spawned.append((processProtocol, process, executable, args, childFDs))
+        return process
+
+    def end(self, i):
+        processProtocol, process = self.spawned[i][:2]
+        process.ended = True
+        processProtocol.processEnded(failure.Failure(error.ProcessTerminated(1)))
+
+
+class WorkerMonitorTests(unittest.TestCase):
+    def setUp(self):
+        self.reactor = ProcessClock()
+        self.port = workers.listen(0, "127.0.0.1")
+        self.addCleanup(self.port.close)
+        self.monitor = workers.WorkerMonitor(
+            ["python", "worker"], 2, self.port, reactor=self.reactor
+        )
+
+    def test_start(self):
+        self.monitor.startService()
+        self.assertEqual(2, len(self.reactor.spawned))
+        fd = self.port.fileno()
+        for _, _, executable, args, childFDs in self.reactor.spawned:
+            self.assertEqual("python", executable)
+            self.assertEqual(["python", "worker"], args)
+            self.assertEqual({0: "w", 1: 1, 2: 2, fd: fd}, childFDs)
+
+    def test_restart(self):
+        """
+        A worker that exits is restarted at once, or after a delay that
+        doubles while it keeps exiting right after starting.
+        """
+        self.monitor.startService()
+        self.reactor.advance(10)
+        self.reactor.end(0)
+        self.reactor.advance(0)
+        self.assertEqual(3, len(self.reactor.spawned))
+
+        self.reactor.end(2)
+        self.reactor.advance(0.5)
+        self.assertEqual(3, len(self.reactor.spawned))
+        self.reactor.advance(0.5)
+        self.assertEqual(4, len(self.reactor.spawned))
+
+        self.reactor.end(3)
+        self.reactor.advance(1)
+        self.assertEqual(4, len(self.reactor.spawned))
+        self.reactor.advance(1)
+        self.assertEqual(5, len(self.reactor.spawned))
+
+    def test_stop(self):
+        """
+        Stopping terminates the workers, kills those still running after
+        killTime, and closes the socket once they have all exited.
+        """
+        self.monitor.startService()
+        d = self.monitor.stopService()
+        processes = [process for _, process, _, _, _ in self.reactor.spawned]
+        self.assertEqual([["TERM"], ["TERM"]], [p.signals for p in processes])
+        self.reactor.end(0)
+        self.reactor.advance(self.monitor.killTime)
+        self.assertEqual([["TERM"], ["TERM", "KILL"]], [p.signals for p in processes])
+        self.assertNoResult(d)
+        self.reactor.end(1)
+        self.successResultOf(d)
+        self.assertEqual(-1, self.port.fileno())
+        # No worker is restarted.
+        self.assertEqual([], self.reactor.getDelayedCalls())
+        self.assertEqual(2, len(self.reactor.spawned))
+
+    def test_stop_restarting(self):
+        """
+        Stopping cancels the restart of a worker waiting for its delay.
+        """
+        self.monitor.startService()
+        self.reactor.end(0)
+        d = self.monitor.stopService()
+        self.reactor.end(1)
+        self.successResultOf(d)
+        self.assertEqual([], self.reactor.getDelayedCalls())
+        self.assertEqual(2, len(self.reactor.spawned))
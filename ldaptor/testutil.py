@@ -6,6 +6,7 @@ from twisted.trial import unittest
 from twisted.test import proto_helpers
 from ldaptor import config
 from ldaptor._encoder import to_bytes
+from ldaptor.protocols import pureldap
 
 
 def mustRaise(dummy):
@@ -109,6 +110,15 @@ class LDAPClientTestDriver:
     def send_multiResponse_ex(self, op, controls, handler, *args, **kwargs):
         return self.send_multiResponse_(op, controls, True, handler, *args, **kwargs)
 
+    def send_multiResponse_raw(self, op, handler, *args, **kwargs):
+        def rawHandler(response, *args, **kwargs):
+            envelope = pureldap.LDAPMessageEnvelope(
+                pureldap.LDAPMessage(response).toWire()
+            )
+            return handler(envelope, *args, **kwargs)
+
+        return self.send_multiResponse_(op, None, False, rawHandler, *args, **kwargs)
+
     def send_noResponse(self, op):
         if len(self.responses) == 0:
             msg = "Ran out of responses"
@@ -0,0 +1,364 @@
+"""
+Serve a snapshot of a directory from several worker processes.
+
+A supervisor listens on a TCP port and starts worker processes which
+all adopt its listening socket, so that the kernel spreads connections
+over them and each decodes, matches and encodes on its own CPU. Every
+worker loads its own in-memory copy of the snapshot from LDIF, refuses
+changes from its clients, and follows a change feed: an LDIF change
+file, only ever appended to, whose changes it applies as they appear.
+
+Workers apply the feed independently, so a change is seen by each of
+them within the poll interval of being appended. To compact the feed,
+write a new snapshot with it applied, e.g. with ldaptor-ldifpatch, and
+restart the supervisor with an empty feed.
+
+This needs a POSIX platform, for reactor.adoptStreamPort() and the
+childFDs of reactor.spawnProcess().
+"""
+
+import os
+import socket
+
+from twisted.application import service
+from twisted.internet import defer, error, protocol, task
+from twisted.python import components, log
+
+from ldaptor import inmemory, interfaces
+from ldaptor.protocols.ldap import ldaperrors, ldapserver, ldifdelta, ldifprotocol
+
+
+def family(interface):
+    """
+    Return the address family of the socket for interface.
+    """
+    if ":" in interface:
+        return socket.AF_INET6
+    return socket.AF_INET
+
+
+def listen(port, interface="", backlog=50):
+    """
+    Return a listening TCP socket for workers to adopt.
+    """
+    sock = socket.socket(family(interface), socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((interface, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+# The mode of a ChangeFeed skipping the rest of a record it cannot parse.
+SKIP_RECORD = b"SKIP_RECORD"
+
+
+class ChangeFeed(ldifdelta.LDIFDelta):
+    """
+    Apply the change records of LDIF data to a tree as they are received.
+
+    Each change is applied once the previous one has been. A change that
+    cannot be parsed or fails is logged and skipped, since every worker
+    following the same feed fails it the same way.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.applied = 0
+        self._last = defer.succeed(None)
+
+    def lineReceived(self, line):
+        try:
+            super().lineReceived(line)
+        except ldifprotocol.LDIFEntryStartsWithSpaceError:
+            if self.mode != SKIP_RECORD:
+                log.err(None, "Cannot parse change")
+                self._skip(line)
+
+    def logicalLineReceived(self, line):
+        try:
+            super().logicalLineReceived(line)
+        except Exception:
+            log.err(None, "Cannot parse change %r" % (self.dn,))
+            self._skip(line)
+
+    def _skip(self, line):
+        self.dn = None
+        self.data = None
+        if line == b"":
+            self.mode = ldifprotocol.WAIT_FOR_DN
+        else:
+            self.mode = SKIP_RECORD
+
+    def state_SKIP_RECORD(self, line):
+        if line == b"":
+            self.mode = ldifprotocol.WAIT_FOR_DN
+
+    def gotEntry(self, change):
+        def _apply(_):
+            return change.patch(self.root)
+
+        def _applied(_):
+            self.applied += 1
+
+        self._last.addCallback(_apply)
+        self._last.addCallbacks(
+            _applied, log.err, errbackArgs=("Cannot apply change %r" % change,)
+        )
+
+
+class FollowFile:
+    """
+    Pass the data appended to a file to a protocol, such as a ChangeFeed,
+    each time it is polled. The file need not exist yet.
+    """
+
+    def __init__(self, path, protocol):
+        self.path = path
+        self.protocol = protocol
+        self._file = None
+
+    def poll(self):
+        if self._file is None:
+            try:
+                self._file = open(self.path, "rb")
+            except FileNotFoundError:
+                return
+        data = self._file.read()
+        if data:
+            self.protocol.dataReceived(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SnapshotLDAPServer(ldapserver.LDAPServer):
+    """
+    An LDAPServer for a snapshot which only its change feed changes: it
+    refuses the requests of its clients to change it.
+    """
+
+    def _refuse(self, request, controls, reply):
+        raise ldaperrors.LDAPUnwillingToPerform(b"This server is read-only")
+
+    handle_LDAPAddRequest = _refuse
+    handle_LDAPDelRequest = _refuse
+    handle_LDAPModifyRequest = _refuse
+    handle_LDAPModifyDNRequest = _refuse
+
+    def extendedRequest_LDAPPasswordModifyRequest(self, data, reply):
+        raise ldaperrors.LDAPUnwillingToPerform(b"This server is read-only")
+
+    extendedRequest_LDAPPasswordModifyRequest.oid = (
+        ldapserver.LDAPServer.extendedRequest_LDAPPasswordModifyRequest.oid
+    )
+    extendedRequest_LDAPPasswordModifyRequest.berdecoder = (
+        ldapserver.LDAPServer.extendedRequest_LDAPPasswordModifyRequest.berdecoder
+    )
+
+
+class SnapshotServerFactory(protocol.ServerFactory):
+    protocol = SnapshotLDAPServer
+
+    def __init__(self, root):
+        self.root = root
+
+
+components.registerAdapter(
+    lambda factory: factory.root, SnapshotServerFactory, interfaces.IConnectedLDAPEntry
+)
+
+
+class WorkerService(service.Service):
+    """
+    Serve a snapshot loaded from LDIF, and kept up to date by a change
+    feed, on a listening socket inherited from the supervisor.
+
+    @ivar root: The tree served, once loaded.
+    @ivar feed: The ChangeFeed applying changes to root, if any.
+    """
+
+    root = None
+    feed = None
+    _port = None
+    _poll = None
+
+    def __init__(
+        self,
+        snapshot,
+        fd,
+        addressFamily=socket.AF_INET,
+        changes=None,
+        interval=1.0,
+        indexes=(),
+        reactor=None,
+    ):
+        """
+        @param snapshot: The path of the LDIF file to load.
+
+        @param fd: The file descriptor of the listening socket, which
+            is closed once adopted.
+
+        @param changes: The path of the LDIF change file to follow, if
+            any. The changes already in it are applied before the
+            socket is adopted.
+
+        @param interval: How many seconds to wait between reads of the
+            change file.
+
+        @param indexes: The attribute types to index the equality of.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self.snapshot = snapshot
+        self.fd = fd
+        self.addressFamily = addressFamily
+        self.changes = changes
+        self.interval = interval
+        self.indexes = indexes
+        self.reactor = reactor
+
+    def startService(self):
+        super().startService()
+        with open(self.snapshot, "rb") as f:
+            d = defer.maybeDeferred(inmemory.fromLDIFFile, f)
+        d.addCallback(self._serve)
+        d.addErrback(self._failed)
+
+    def _serve(self, root):
+        self.root = root
+        for attributeType in self.indexes:
+            root.addIndex(attributeType)
+        if self.changes is not None:
+            self.feed = ChangeFeed(root)
+            follower = FollowFile(self.changes, self.feed)
+            self._poll = task.LoopingCall(follower.poll)
+            self._poll.clock = self.reactor
+            d = self._poll.start(self.interval)
+            d.addErrback(log.err, "Cannot follow %s" % self.changes)
+            d.addBoth(lambda _: follower.close())
+        self._port = self.reactor.adoptStreamPort(
+            self.fd, self.addressFamily, SnapshotServerFactory(root)
+        )
+        os.close(self.fd)
+
+    def _failed(self, reason):
+        log.err(reason, "Cannot load %s" % self.snapshot)
+        self.reactor.stop()
+
+    def stopService(self):
+        super().stopService()
+        if self._poll is not None and self._poll.running:
+            self._poll.stop()
+        if self._port is not None:
+            return self._port.stopListening()
+
+
+class _WorkerProtocol(protocol.ProcessProtocol):
+    def __init__(self, monitor, index):
+        self.monitor = monitor
+        self.index = index
+        self.ended = defer.Deferred()
+
+    def processEnded(self, reason):
+        self.ended.callback(None)
+        self.monitor._workerEnded(self.index, reason)
+
+
+class WorkerMonitor(service.Service):
+    """
+    Start worker processes sharing a listening socket, and restart those
+    that exit while the service is running.
+
+    A worker that exits within threshold seconds of starting is restarted
+    after a delay, which doubles from minRestartDelay up to
+    maxRestartDelay each time it does so again. When the service stops,
+    workers are sent SIGTERM, then SIGKILL if they have not exited
+    killTime seconds later, and the socket is closed once they have.
+    """
+
+    threshold = 1
+    minRestartDelay = 1
+    maxRestartDelay = 60
+    killTime = 5
+
+    def __init__(self, args, workers, port, reactor=None):
+        """
+        @param args: The command running a worker, whose first element
+            is the executable. Workers have the same file descriptor for
+            port, and a pipe from the supervisor as their stdin, which is
+            closed when the supervisor exits.
+
+        @param workers: How many workers to run.
+
+        @param port: The listening socket, as from listen().
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self.args = args
+        self.workers = workers
+        self.port = port
+        self.reactor = reactor
+        self.processes = {}
+        self._protocols = {}
+        self._started = {}
+        self._delays = {}
+        self._restarts = {}
+
+    def startService(self):
+        super().startService()
+        for index in range(self.workers):
+            self._start(index)
+
+    def _start(self, index):
+        self._restarts.pop(index, None)
+        proto = _WorkerProtocol(self, index)
+        fd = self.port.fileno()
+        self._protocols[index] = proto
+        self._started[index] = self.reactor.seconds()
+        self.processes[index] = self.reactor.spawnProcess(
+            proto,
+            self.args[0],
+            self.args,
+            env=os.environ,
+            childFDs={0: "w", 1: 1, 2: 2, fd: fd},
+        )
+
+    def _workerEnded(self, index, reason):
+        del self.processes[index]
+        del self._protocols[index]
+        if not self.running:
+            return
+        log.msg("Worker %d ended: %s" % (index, reason.getErrorMessage()))
+        delay = 0
+        if self.reactor.seconds() - self._started[index] < self.threshold:
+            delay = self._delays.get(index, 0) * 2 or self.minRestartDelay
+            delay = min(delay, self.maxRestartDelay)
+        self._delays[index] = delay
+        self._restarts[index] = self.reactor.callLater(delay, self._start, index)
+
+    def stopService(self):
+        super().stopService()
+        for call in self._restarts.values():
+            call.cancel()
+        self._restarts.clear()
+        ended = []
+        for index, process in list(self.processes.items()):
+            proto = self._protocols[index]
+            ended.append(proto.ended)
+            self._signal(process, "TERM")
+            kill = self.reactor.callLater(self.killTime, self._signal, process, "KILL")
+            proto.ended.addCallback(
+                lambda _, kill=kill: kill.active() and kill.cancel()
+            )
+        d = defer.gatherResults(ended)
+        d.addCallback(lambda _: self.port.close())
+        return d
+
+    def _signal(self, process, signal):
+        try:
+            process.signalProcess(signal)
+        except error.ProcessExitedAlready:
+            pass